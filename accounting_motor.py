@@ -0,0 +1,214 @@
+### Motor contable: aplica las plantillas de transaction_accounting_templates
+
+"""
+
+Cada plantilla se compila una sola vez en arreglos de índices:
+
+codigos: Código PUC de cada línea del asiento.
+
+es_debe: True si la línea va al debe, False si va al haber.
+
+indice_variable: Posición de la variable que da el valor de la línea.
+
+Con eso un lote de N asientos del mismo tipo se contabiliza en una sola
+operación: los valores de las variables se apilan en una matriz, se toman las
+filas que indica indice_variable y las K x N líneas resultantes se registran de
+una vez en el Ledger.
+
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ledger import Ledger, ledger_por_defecto
+from transaction_accounting_templates import accounting_templates_1
+
+
+class PlantillaCompilada:
+    """
+    Representación en arreglos de una plantilla contable.
+    """
+
+    def __init__(self, nombre: str, plantilla: Dict):
+        """
+        Compila una plantilla con la estructura de accounting_templates_1.
+
+        :param nombre: Nombre de la plantilla (p. ej. "compra_materia_prima").
+        :param plantilla: Diccionario con las listas "debe" y "haber" de tuplas
+                          (codigo_cuenta, nombre_variable).
+        """
+        lineas = [(codigo, variable, True) for codigo, variable in plantilla["debe"]]
+        lineas += [(codigo, variable, False) for codigo, variable in plantilla["haber"]]
+        if not lineas:
+            raise ValueError(f"La plantilla '{nombre}' no tiene líneas.")
+
+        self.nombre = nombre
+        self.variables: Tuple[str, ...] = tuple(
+            dict.fromkeys(variable for _, variable, _ in lineas)
+        )
+        posiciones = {variable: i for i, variable in enumerate(self.variables)}
+
+        self.codigos = np.array([codigo for codigo, _, _ in lineas], dtype=np.int64)
+        self.es_debe = np.array([lado for _, _, lado in lineas], dtype=bool)
+        self.indice_variable = np.array(
+            [posiciones[variable] for _, variable, _ in lineas], dtype=np.intp
+        )
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+
+class MotorContable:
+    """
+    Clase para contabilizar lotes de transacciones a partir de plantillas.
+    """
+
+    def __init__(
+        self,
+        plantillas: Optional[Dict] = None,
+        ledger: Optional[Ledger] = None,
+        plantillas_cuentas: Optional[Dict] = None,
+        tolerancia: float = 1e-6,
+    ):
+        """
+        Inicializa el motor y compila todas las plantillas.
+
+        :param plantillas: Diccionario de plantillas; por defecto accounting_templates_1.
+        :param ledger: Libro mayor donde se contabiliza. Si es None se usa el libro
+                       mayor por defecto.
+        :param plantillas_cuentas: Plan de cuentas (como el que devuelve
+                                   cargar_plantillas_cuentas). Si se da, se valida
+                                   que las plantillas solo usen sus códigos.
+        :param tolerancia: Diferencia relativa admitida entre debe y haber.
+        """
+        plantillas = plantillas if plantillas is not None else accounting_templates_1
+        self.ledger = ledger if ledger is not None else ledger_por_defecto()
+        self.tolerancia = tolerancia
+        self.plantillas: Dict[str, PlantillaCompilada] = {
+            nombre: PlantillaCompilada(nombre, plantilla)
+            for nombre, plantilla in plantillas.items()
+        }
+
+        if plantillas_cuentas is not None:
+            conocidos = {int(codigo) for codigo in plantillas_cuentas}
+            for compilada in self.plantillas.values():
+                faltantes = set(compilada.codigos.tolist()) - conocidos
+                if faltantes:
+                    raise ValueError(
+                        f"La plantilla '{compilada.nombre}' usa cuentas que no están "
+                        f"en el plan de cuentas: {sorted(faltantes)}."
+                    )
+
+    def compilada(self, plantilla: str) -> PlantillaCompilada:
+        try:
+            return self.plantillas[plantilla]
+        except KeyError:
+            raise ValueError(
+                f"No existe la plantilla contable '{plantilla}'."
+            ) from None
+
+    def calcular_lineas(
+        self, plantilla: str, variables: Dict[str, np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula el debe y el haber de cada línea de un lote de asientos.
+
+        :param plantilla: Nombre de la plantilla.
+        :param variables: Valores de las variables que usa la plantilla; cada uno
+                          es un escalar o un arreglo con un valor por asiento.
+        :return: Una tupla (debe, haber) de matrices de forma (asientos, líneas).
+        :raises ValueError: Si faltan variables o algún asiento no cuadra.
+        """
+        compilada = self.compilada(plantilla)
+        faltantes = [v for v in compilada.variables if v not in variables]
+        if faltantes:
+            raise ValueError(
+                f"Faltan variables para la plantilla '{plantilla}': {faltantes}."
+            )
+
+        valores = np.stack(
+            np.broadcast_arrays(
+                *(
+                    np.asarray(variables[v], dtype=np.float64)
+                    for v in compilada.variables
+                )
+            ),
+            axis=-1,
+        )
+        valores = np.atleast_2d(valores)
+        montos = valores[:, compilada.indice_variable]
+
+        debe = np.where(compilada.es_debe, montos, 0.0)
+        haber = np.where(compilada.es_debe, 0.0, montos)
+
+        # Partida doble: cada asiento del lote debe cuadrar
+        total_debe = debe.sum(axis=1)
+        total_haber = haber.sum(axis=1)
+        escala = np.maximum(np.maximum(np.abs(total_debe), np.abs(total_haber)), 1.0)
+        # NaN e infinitos nunca cuadran (con infinitos la escala también lo es)
+        diferencia = total_debe - total_haber
+        cuadrados = np.isfinite(diferencia) & (
+            np.abs(diferencia) <= self.tolerancia * escala
+        )
+        descuadrados = np.flatnonzero(~cuadrados)
+        if descuadrados.size:
+            i = descuadrados[0]
+            raise ValueError(
+                f"{descuadrados.size} asiento(s) de '{plantilla}' no cuadran; "
+                f"el primero (posición {i}) tiene debe {total_debe[i]} "
+                f"y haber {total_haber[i]}."
+            )
+
+        return debe, haber
+
+    def contabilizar(
+        self,
+        plantilla: str,
+        agentes,
+        variables: Dict[str, np.ndarray],
+        ledger: Optional[Ledger] = None,
+    ) -> np.ndarray:
+        """
+        Contabiliza un lote de asientos del mismo tipo en una sola operación.
+
+        :param plantilla: Nombre de la plantilla (p. ej. "venta_mercancia_producida").
+        :param agentes: Identificador de agente (agente_id) de cada asiento, o un
+                        escalar si todos son del mismo agente.
+        :param variables: Valores de las variables de la plantilla (precio_total,
+                          monto_iva, costo_total, ...), escalares o arreglos.
+        :param ledger: Libro mayor donde contabilizar; por defecto el del motor.
+        :return: El identificador de asiento de cada transacción del lote.
+        :raises ValueError: Si faltan variables o algún asiento no cuadra.
+        """
+        ledger = ledger if ledger is not None else self.ledger
+        compilada = self.compilada(plantilla)
+        debe, haber = self.calcular_lineas(plantilla, variables)
+
+        n_asientos, n_lineas = debe.shape
+        agentes = np.asarray(agentes, dtype=np.int32)
+        if agentes.ndim == 0:
+            agentes = np.full(n_asientos, agentes, dtype=np.int32)
+        elif n_asientos == 1 and agentes.size > 1:
+            # Variables escalares para varios agentes
+            n_asientos = agentes.size
+            debe = np.broadcast_to(debe, (n_asientos, n_lineas))
+            haber = np.broadcast_to(haber, (n_asientos, n_lineas))
+        elif agentes.size != n_asientos:
+            raise ValueError(
+                f"Se recibieron {agentes.size} agentes para {n_asientos} asientos."
+            )
+
+        primera = ledger.nueva_transaccion(n_asientos)
+        transacciones = np.arange(primera, primera + n_asientos, dtype=np.int64)
+
+        # Las líneas de cada asiento quedan contiguas en el libro mayor
+        ledger.registrar_lote(
+            np.repeat(agentes, n_lineas),
+            np.tile(compilada.codigos, n_asientos),
+            debe.ravel(),
+            haber.ravel(),
+            np.repeat(transacciones, n_lineas),
+            plantilla=plantilla,
+        )
+        return transacciones
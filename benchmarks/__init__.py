@@ -0,0 +1,2 @@
+### Benchmarks del modelo. Ejecutar desde la raíz del repositorio, p. ej.:
+### python -m benchmarks.bench_inventario
@@ -0,0 +1,132 @@
+### Benchmark de consumo de lotes del inventario
+
+"""
+
+Compara Inventory (lotes en deque) con la implementación anterior basada en
+listas, que retiraba lotes FIFO con list.pop(0). Cada bien recibe N lotes
+pequeños que luego se venden por completo en ventas de tamaño fijo.
+
+Uso: python -m benchmarks.bench_inventario [--lotes 100000] [--venta 3]
+
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from model import BienGravado, Inventory
+
+
+class LoteLista:
+    def __init__(self, good, quantity, unit_cost):
+        self.good = good
+        self.quantity = quantity
+        self.unit_cost = unit_cost
+
+
+class InventarioLista:
+    """Réplica de la versión anterior de Inventory (listas y pop(0))."""
+
+    def __init__(self):
+        self.lotes = {}
+        self.costing_methods = {}
+
+    def set_costing_method(self, good_name, method):
+        self.costing_methods[good_name] = method
+
+    def add_lote(self, good, quantity, unit_cost):
+        if good.name not in self.lotes:
+            self.lotes[good.name] = []
+        self.lotes[good.name].append(LoteLista(good, quantity, unit_cost))
+
+    def remove_lote(self, good_name, quantity):
+        lotes = self.lotes[good_name]
+        method = self.costing_methods.get(good_name, "FIFO")
+        total_cost = 0.0
+        quantity_to_remove = quantity
+
+        if method == "WeightedAverage":
+            total_quantity = sum(lote.quantity for lote in lotes)
+            average_cost = (
+                sum(lote.quantity * lote.unit_cost for lote in lotes) / total_quantity
+            )
+            total_cost = quantity * average_cost
+            while quantity_to_remove > 0 and lotes:
+                if lotes[0].quantity <= quantity_to_remove:
+                    quantity_to_remove -= lotes[0].quantity
+                    lotes.pop(0)
+                else:
+                    lotes[0].quantity -= quantity_to_remove
+                    quantity_to_remove = 0
+            return total_cost
+
+        posicion = 0 if method == "FIFO" else -1
+        while quantity_to_remove > 0 and lotes:
+            lote = lotes[posicion]
+            if lote.quantity <= quantity_to_remove:
+                total_cost += lote.quantity * lote.unit_cost
+                quantity_to_remove -= lote.quantity
+                lotes.pop(posicion)
+            else:
+                total_cost += quantity_to_remove * lote.unit_cost
+                lote.quantity -= quantity_to_remove
+                quantity_to_remove = 0
+        return total_cost
+
+
+def _correr(inventario, bien, metodo: str, n_lotes: int, venta: float):
+    inventario.set_costing_method(bien.name, metodo)
+    for i in range(n_lotes):
+        inventario.add_lote(bien, 2.0, 1.0 + (i % 97) / 10)
+
+    n_ventas = int(n_lotes * 2.0 // venta)
+    # La referencia recorre todos los lotes en cada venta WeightedAverage
+    if metodo == "WeightedAverage":
+        n_ventas = min(n_ventas, 200)
+
+    inicio = time.perf_counter()
+    costo = 0.0
+    for _ in range(n_ventas):
+        costo += inventario.remove_lote(bien.name, venta)
+    return time.perf_counter() - inicio, n_ventas, costo
+
+
+def _memoria_por_lote(clase_inventario, bien, n_lotes: int) -> float:
+    tracemalloc.start()
+    inventario = clase_inventario()
+    for i in range(n_lotes):
+        inventario.add_lote(bien, 2.0, 1.0 + i)
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return memoria / n_lotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lotes", type=int, default=100_000)
+    parser.add_argument("--venta", type=float, default=3.0)
+    args = parser.parse_args()
+
+    bien = BienGravado("insumo", price=10.0, iva_rate=0.19, tariff=0.0)
+    print(f"{args.lotes} lotes por bien, ventas de {args.venta} unidades")
+    print(
+        f"Memoria por lote: deque {_memoria_por_lote(Inventory, bien, args.lotes):.0f}"
+        f" B | lista {_memoria_por_lote(InventarioLista, bien, args.lotes):.0f} B"
+    )
+    for metodo in ("FIFO", "LIFO", "WeightedAverage"):
+        t_nuevo, n, costo_nuevo = _correr(
+            Inventory(), bien, metodo, args.lotes, args.venta
+        )
+        t_lista, _, costo_lista = _correr(
+            InventarioLista(), bien, metodo, args.lotes, args.venta
+        )
+        igual = abs(costo_nuevo - costo_lista) <= 1e-9 * max(abs(costo_lista), 1.0)
+        print(
+            f"{metodo:>15}: {n} ventas | deque {t_nuevo:.3f} s | "
+            f"lista {t_lista:.3f} s | x{t_lista / t_nuevo:.1f} | "
+            f"costos iguales: {igual}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+### Suite de benchmarks de los caminos críticos del modelo
+
+"""
+
+Mide el rendimiento de:
+
+cuenta_registrar / cuenta_calcular_totales: Account.registrar_transaccion y
+Account.calcular_totales con 10^6 movimientos en una cuenta.
+
+remove_lote_<metodo>: Inventory.remove_lote con FIFO, LIFO y WeightedAverage
+sobre pilas profundas de lotes.
+
+agente_construccion: Construcción de agentes ZF con el PUC completo.
+
+plantilla_lote:<nombre> / plantilla_individual:<nombre>: Contabilización de
+cada plantilla de accounting_templates_1 con MotorContable, en lote y con un
+asiento por llamada.
+
+planificador_procesos_<n>: PlanificadorPeriodos.ejecutar_fase con 1 y con
+PROCESOS_PLANIFICADOR procesos sobre mercados independientes (agentes que solo
+comercian dentro de su mercado). El cociente entre ambos es la aceleración del
+backend de procesos; solo aparece con varios núcleos.
+
+importar_modelo: Importación de las clases del modelo (Account, Good,
+Inventory, Agent, Transaction) en un intérprete nuevo. Su umbral es el
+presupuesto de tiempo de importación; además falla si la importación carga
+pandas u openpyxl, que solo deben cargarse al leer o escribir Excel.
+
+Los datos se generan con una semilla fija, de modo que las corridas son
+reproducibles. Los resultados se escriben en JSON (operaciones por segundo de
+cada benchmark) y se comparan con umbrales mínimos y, opcionalmente, con una
+corrida anterior: el proceso termina con código 1 si algún benchmark cae por
+debajo de su umbral o pierde más de --tolerancia frente a la línea base.
+
+Uso: python -m benchmarks.suite [--escala 1.0] [--salida resultados.json]
+     [--linea-base anterior.json] [--tolerancia 0.25] [--solo cuenta]
+
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from accounting_motor import MotorContable
+from ledger import Ledger
+from model import NCT, ZF, Account, BienGravado, Inventory, Transaction
+from planificador import PlanificadorPeriodos
+from transaction_accounting_templates import accounting_templates_1
+from utils import cargar_plantillas_cuentas
+
+VERSION_RESULTADOS = 1
+SEMILLA = 20240601
+
+# Operaciones por segundo mínimas aceptadas, con holgura para máquinas lentas
+UMBRALES = {
+    "cuenta_registrar": 50_000,
+    "cuenta_calcular_totales": 50_000,
+    "remove_lote_FIFO": 50_000,
+    "remove_lote_LIFO": 50_000,
+    "remove_lote_WeightedAverage": 50_000,
+    "agente_construccion": 1_000,
+    "plantilla_lote": 200_000,
+    "plantilla_individual": 1_000,
+    "importar_modelo": 4,  # Importaciones por segundo: a lo sumo 250 ms cada una
+}
+
+# Procesos del planificador que se comparan con un solo proceso
+PROCESOS_PLANIFICADOR = 4
+AGENTES_POR_MERCADO = 20
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Dependencias que no deben cargarse al importar el modelo
+MODULOS_PESADOS = ("pandas", "openpyxl")
+
+PROGRAMA_IMPORTACION = """
+import json, sys, time
+inicio = time.perf_counter()
+from model import Account, Agent, Good, Inventory, Transaction
+segundos = time.perf_counter() - inicio
+print(json.dumps({"segundos": segundos, "modulos": sorted(sys.modules)}))
+"""
+
+
+# Generadores de datos sintéticos
+
+
+def generar_montos(generador: np.random.Generator, n: int) -> np.ndarray:
+    """Montos positivos con dos decimales y distribución log-normal."""
+    return np.round(generador.lognormal(mean=4.0, sigma=1.0, size=n), 2)
+
+
+def generar_movimientos(generador: np.random.Generator, n: int):
+    """Pares (debe, haber) donde cada movimiento tiene un solo lado distinto de cero."""
+    montos = generar_montos(generador, n)
+    es_debe = generador.random(n) < 0.5
+    return np.where(es_debe, montos, 0.0), np.where(es_debe, 0.0, montos)
+
+
+def generar_lotes(generador: np.random.Generator, n: int):
+    """Cantidades y costos unitarios de n lotes de inventario."""
+    cantidades = generador.integers(1, 10, size=n).astype(np.float64)
+    costos = np.round(generador.uniform(1.0, 20.0, size=n), 2)
+    return cantidades, costos
+
+
+def generar_variables(generador: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """Variables de plantilla consistentes entre sí, para que los asientos cuadren."""
+    precio_total = generar_montos(generador, n)
+    monto_iva = np.round(precio_total * 0.19, 2)
+    costo_total = np.round(precio_total * generador.uniform(0.4, 0.9, size=n), 2)
+    costo_total_materiales = np.round(costo_total * 0.8, 2)
+    return {
+        "precio_total": precio_total,
+        "monto_iva": monto_iva,
+        "precio_con_iva": precio_total + monto_iva,
+        "costo_total": costo_total,
+        "costo_total_materiales": costo_total_materiales,
+        "costo_indirecto": costo_total - costo_total_materiales,
+    }
+
+
+# Benchmarks: cada uno devuelve (operaciones, segundos)
+
+
+def _cronometrar(funcion: Callable[[], int]):
+    inicio = time.perf_counter()
+    operaciones = funcion()
+    return operaciones, time.perf_counter() - inicio
+
+
+def bench_cuenta(n: int) -> Dict[str, tuple]:
+    generador = np.random.default_rng(SEMILLA)
+    debe, haber = generar_movimientos(generador, n)
+    debe, haber = debe.tolist(), haber.tolist()
+    cuenta = Account("CAJA", 1, codigo=1105, ledger=Ledger(capacidad_inicial=n))
+
+    def registrar():
+        for d, h in zip(debe, haber):
+            cuenta.registrar_transaccion(debe=d, haber=h)
+        return n
+
+    def calcular_totales():
+        repeticiones = 100_000
+        for _ in range(repeticiones):
+            cuenta.calcular_totales()
+        return repeticiones
+
+    return {
+        "cuenta_registrar": _cronometrar(registrar),
+        "cuenta_calcular_totales": _cronometrar(calcular_totales),
+    }
+
+
+def bench_remove_lote(n: int) -> Dict[str, tuple]:
+    generador = np.random.default_rng(SEMILLA)
+    cantidades, costos = generar_lotes(generador, n)
+    bien = BienGravado("insumo", price=10.0, iva_rate=0.19, tariff=0.0)
+    venta = 3.0
+    resultados = {}
+    for metodo in ("FIFO", "LIFO", "WeightedAverage"):
+        inventario = Inventory()
+        inventario.set_costing_method(bien.name, metodo)
+        for cantidad, costo in zip(cantidades.tolist(), costos.tolist()):
+            inventario.add_lote(bien, cantidad, costo)
+
+        def retirar():
+            n_ventas = int(inventario.get_total_quantity(bien.name) // venta)
+            for _ in range(n_ventas):
+                inventario.remove_lote(bien.name, venta)
+            return n_ventas
+
+        resultados[f"remove_lote_{metodo}"] = _cronometrar(retirar)
+    return resultados
+
+
+def bench_agentes(n: int) -> Dict[str, tuple]:
+    plantillas_cuentas = cargar_plantillas_cuentas()
+    bienes = [BienGravado(f"bien_{i}", 10.0, 0.19, 0.1) for i in range(5)]
+    ledger = Ledger()
+
+    def construir():
+        for i in range(n):
+            ZF(f"agente_{i}", plantillas_cuentas, bienes, bienes, ledger=ledger)
+        return n
+
+    return {"agente_construccion": _cronometrar(construir)}
+
+
+def bench_planificador(n_transacciones: int) -> Dict[str, tuple]:
+    plantillas_cuentas = cargar_plantillas_cuentas()
+    bien = BienGravado("insumo", price=10.0, iva_rate=0.19, tariff=0.05)
+    n_agentes = max(n_transacciones // 20, 2 * AGENTES_POR_MERCADO)
+    generador = np.random.default_rng(SEMILLA)
+    # Vendedor y comprador del mismo mercado: los mercados son independientes
+    mercados = generador.integers(0, n_agentes // AGENTES_POR_MERCADO, n_transacciones)
+    pares = mercados[:, None] * AGENTES_POR_MERCADO + generador.integers(
+        0, AGENTES_POR_MERCADO, size=(n_transacciones, 2)
+    )
+    pares = pares[pares[:, 0] != pares[:, 1]].tolist()
+
+    resultados = {}
+    for procesos in (1, PROCESOS_PLANIFICADOR):
+        ledger = Ledger()
+        agentes = [
+            (ZF if i % 3 == 0 else NCT)(
+                f"agente_{i}", plantillas_cuentas, [], [], ledger=ledger
+            )
+            for i in range(n_agentes)
+        ]
+        for agente in agentes:
+            agente.purchase_good(bien, 1_000_000.0, 8.0)
+        transacciones = [
+            Transaction(agentes[i], agentes[j], bien, 1.0, 0) for i, j in pares
+        ]
+        planificador = PlanificadorPeriodos(MotorContable(ledger=ledger), procesos)
+
+        def ejecutar_fase():
+            planificador.ejecutar_fase(transacciones)
+            return len(transacciones)
+
+        resultados[f"planificador_procesos_{procesos}"] = _cronometrar(ejecutar_fase)
+    return resultados
+
+
+def bench_importacion(repeticiones: int) -> Dict[str, tuple]:
+    segundos = 0.0
+    for _ in range(repeticiones):
+        # Cada importación en un intérprete nuevo, sin los módulos ya cargados
+        salida = subprocess.run(
+            [sys.executable, "-c", PROGRAMA_IMPORTACION],
+            cwd=RAIZ,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        medicion = json.loads(salida.stdout)
+        pesados = [m for m in MODULOS_PESADOS if m in medicion["modulos"]]
+        if pesados:
+            raise RuntimeError(
+                f"Importar el modelo carga {', '.join(pesados)}; deben cargarse "
+                "solo al usar Excel."
+            )
+        segundos += medicion["segundos"]
+    return {"importar_modelo": (repeticiones, segundos)}
+
+
+def bench_plantillas(n_lote: int, n_individual: int) -> Dict[str, tuple]:
+    generador = np.random.default_rng(SEMILLA)
+    variables = generar_variables(generador, n_lote)
+    individuales = [
+        {nombre: valores[i] for nombre, valores in variables.items()}
+        for i in range(n_individual)
+    ]
+    motor = MotorContable(ledger=Ledger(capacidad_inicial=8 * n_lote))
+    agentes = np.arange(n_lote) % 1000
+    motor.ledger.nuevos_agentes(1000)
+
+    resultados = {}
+    for nombre in accounting_templates_1:
+
+        def lote():
+            motor.contabilizar(nombre, agentes, variables)
+            return n_lote
+
+        def individual():
+            for i, valores in enumerate(individuales):
+                motor.contabilizar(nombre, i % 1000, valores)
+            return n_individual
+
+        resultados[f"plantilla_lote:{nombre}"] = _cronometrar(lote)
+        resultados[f"plantilla_individual:{nombre}"] = _cronometrar(individual)
+    return resultados
+
+
+def ejecutar(escala: float = 1.0, solo: Optional[str] = None) -> List[Dict]:
+    """
+    Ejecuta la suite y devuelve un registro por benchmark.
+
+    :param escala: Multiplica el tamaño de todos los benchmarks (1.0 = 10^6
+                   movimientos en la cuenta).
+    :param solo: Si se da, solo se ejecutan los grupos cuyo nombre empieza así.
+    """
+    grupos = {
+        "cuenta": lambda: bench_cuenta(int(1_000_000 * escala)),
+        "remove_lote": lambda: bench_remove_lote(int(200_000 * escala)),
+        "agente": lambda: bench_agentes(max(int(2_000 * escala), 1)),
+        "plantilla": lambda: bench_plantillas(
+            int(1_000_000 * escala), max(int(10_000 * escala), 1)
+        ),
+        "planificador": lambda: bench_planificador(max(int(200_000 * escala), 1)),
+        "importar": lambda: bench_importacion(max(int(10 * escala), 1)),
+    }
+    registros = []
+    for grupo, funcion in grupos.items():
+        if solo is not None and not grupo.startswith(solo):
+            continue
+        for nombre, (operaciones, segundos) in funcion().items():
+            registros.append(
+                {
+                    "nombre": nombre,
+                    "operaciones": operaciones,
+                    "segundos": segundos,
+                    "ops_por_segundo": operaciones / segundos if segundos else None,
+                    "umbral": UMBRALES.get(nombre.split(":")[0]),
+                }
+            )
+    return registros
+
+
+def regresiones(
+    registros: List[Dict], linea_base: Optional[Dict] = None, tolerancia: float = 0.25
+) -> List[str]:
+    """
+    Lista de benchmarks por debajo de su umbral o más lentos que la línea base.
+    """
+    anteriores = {}
+    if linea_base is not None:
+        anteriores = {r["nombre"]: r for r in linea_base["resultados"]}
+
+    problemas = []
+    for registro in registros:
+        nombre, velocidad = registro["nombre"], registro["ops_por_segundo"]
+        if velocidad is None:
+            continue
+        if registro["umbral"] is not None and velocidad < registro["umbral"]:
+            problemas.append(
+                f"{nombre}: {velocidad:,.0f} ops/s < umbral {registro['umbral']:,}"
+            )
+        anterior = anteriores.get(nombre, {}).get("ops_por_segundo")
+        if anterior and velocidad < anterior * (1 - tolerancia):
+            problemas.append(
+                f"{nombre}: {velocidad:,.0f} ops/s vs {anterior:,.0f} en la línea base"
+            )
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--escala", type=float, default=1.0)
+    parser.add_argument("--salida", help="Archivo JSON de resultados.")
+    parser.add_argument("--linea-base", help="Resultados JSON de una corrida anterior.")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument("--solo", help="Prefijo del grupo a ejecutar.")
+    args = parser.parse_args()
+
+    registros = ejecutar(args.escala, args.solo)
+    for registro in registros:
+        print(
+            f"{registro['nombre']:>55}: {registro['operaciones']:>9} ops "
+            f"{registro['segundos']:8.3f} s {registro['ops_por_segundo']:>14,.0f} ops/s"
+        )
+
+    resultados = {
+        "version": VERSION_RESULTADOS,
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "escala": args.escala,
+        "resultados": registros,
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo, indent=1)
+
+    linea_base = None
+    if args.linea_base:
+        with open(args.linea_base, encoding="utf-8") as archivo:
+            linea_base = json.load(archivo)
+    problemas = regresiones(registros, linea_base, args.tolerancia)
+    for problema in problemas:
+        print(f"REGRESIÓN {problema}")
+    sys.exit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
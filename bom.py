@@ -0,0 +1,248 @@
+### Resolución de listas de materiales (insumos de varios niveles)
+
+"""
+
+El grafo de bienes se compila en una matriz dispersa de requerimientos
+directos A en formato CSR: la fila i tiene las unidades de cada insumo que
+consume una unidad del bien i (Good.insumos).
+
+Los requerimientos totales de un bien (todos los niveles, a la Leontief) son
+T[i] = sum_j A[i, j] * (e_j + T[j]). Se calculan en orden topológico, se guardan
+en cache por bien y solo se invalidan cuando cambian los insumos de ese bien o
+de alguno de los que consume.
+
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from model import Good, ultima_version_insumos
+
+
+class ResolutorInsumos:
+    """
+    Clase para resolver los requerimientos de insumos de un conjunto de bienes.
+    """
+
+    def __init__(self, bienes: Iterable[Good]):
+        """
+        :param bienes: Bienes del modelo. Los insumos que se nombran pero no están
+                       en la lista se tratan como materias primas sin insumos.
+        """
+        self.bienes: Dict[str, Good] = {}
+        for bien in bienes:
+            self.bienes[bien.name] = bien
+        self._compilar()
+
+    def agregar(self, bien: Good) -> None:
+        """Agrega (o reemplaza) un bien y recompila el grafo."""
+        self.bienes[bien.name] = bien
+        self._compilar()
+
+    def _compilar(self, cambiados: Optional[List[str]] = None) -> None:
+        nombres = list(self.bienes)
+        conocidos = set(nombres)
+        for bien in self.bienes.values():
+            for insumo in bien.insumos:
+                if insumo not in conocidos:
+                    conocidos.add(insumo)
+                    nombres.append(insumo)
+        indices = {nombre: i for i, nombre in enumerate(nombres)}
+
+        # Matriz CSR de requerimientos directos
+        indptr = [0]
+        columnas: List[int] = []
+        datos: List[float] = []
+        for nombre in nombres:
+            bien = self.bienes.get(nombre)
+            if bien is not None:
+                for insumo, cantidad in bien.insumos.items():
+                    columnas.append(indices[insumo])
+                    datos.append(float(cantidad))
+            indptr.append(len(columnas))
+
+        conservar = cambiados is not None and getattr(self, "nombres", None) == nombres
+        self.nombres = nombres
+        self.indices = indices
+        self.indptr = np.array(indptr, dtype=np.intp)
+        self.columnas = np.array(columnas, dtype=np.intp)
+        self.datos = np.array(datos, dtype=np.float64)
+        self.orden = self._orden_topologico()
+        self._posicion = np.empty(len(nombres), dtype=np.intp)
+        self._posicion[self.orden] = np.arange(len(self.orden))
+
+        if conservar:
+            # Solo se invalidan los bienes cambiados y los que los consumen
+            for nombre in self._consumidores(cambiados):
+                self._totales.pop(indices[nombre], None)
+        else:
+            self._totales: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+        self._versiones = {
+            nombre: bien.version_insumos for nombre, bien in self.bienes.items()
+        }
+        self._version_global = ultima_version_insumos()
+
+    def _orden_topologico(self) -> np.ndarray:
+        """Ordena los bienes de modo que cada insumo aparezca antes que su producto."""
+        n = len(self.nombres)
+        # Un bien queda listo cuando todos sus insumos ya se ordenaron
+        pendientes = np.diff(self.indptr).copy()
+        filas = np.repeat(np.arange(n), np.diff(self.indptr))
+        consumidores = [[] for _ in range(n)]
+        for fila, columna in zip(filas.tolist(), self.columnas.tolist()):
+            consumidores[columna].append(fila)
+
+        listos = [i for i in range(n) if pendientes[i] == 0]
+        orden = []
+        while listos:
+            i = listos.pop()
+            orden.append(i)
+            for consumidor in consumidores[i]:
+                pendientes[consumidor] -= 1
+                if pendientes[consumidor] == 0:
+                    listos.append(consumidor)
+
+        if len(orden) < n:
+            ciclo = sorted(self.nombres[i] for i in np.flatnonzero(pendientes > 0))
+            raise ValueError(f"Los insumos de estos bienes forman un ciclo: {ciclo}.")
+        self._lista_consumidores = consumidores
+        return np.array(orden, dtype=np.intp)
+
+    def _consumidores(self, nombres: List[str]) -> set:
+        """Bienes dados y todos los que los usan directa o indirectamente."""
+        visitados = set()
+        pila = [self.indices[nombre] for nombre in nombres]
+        while pila:
+            i = pila.pop()
+            if i in visitados:
+                continue
+            visitados.add(i)
+            pila.extend(self._lista_consumidores[i])
+        return {self.nombres[i] for i in visitados}
+
+    def _verificar(self) -> None:
+        """Recompila si algún bien cambió sus insumos desde la última consulta."""
+        if ultima_version_insumos() == self._version_global:
+            return
+        cambiados = [
+            nombre
+            for nombre, bien in self.bienes.items()
+            if bien.version_insumos != self._versiones.get(nombre)
+        ]
+        if cambiados:
+            self._compilar(cambiados)
+        else:
+            self._version_global = ultima_version_insumos()
+
+    def orden_topologico(self) -> List[str]:
+        """Nombres de los bienes con los insumos antes que sus productos."""
+        self._verificar()
+        return [self.nombres[i] for i in self.orden]
+
+    def matriz_requerimientos(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Matriz de requerimientos directos en formato CSR.
+
+        :return: Una tupla (indptr, columnas, datos); las filas y columnas siguen el
+                 orden de self.nombres.
+        """
+        self._verificar()
+        return self.indptr, self.columnas, self.datos
+
+    def _vector_totales(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        cache = self._totales.get(i)
+        if cache is not None:
+            return cache
+
+        # Se resuelven primero los insumos que aún no están en cache
+        pila = [i]
+        por_resolver = []
+        vistos = set()
+        while pila:
+            j = pila.pop()
+            if j in vistos or j in self._totales:
+                continue
+            vistos.add(j)
+            por_resolver.append(j)
+            pila.extend(self.columnas[self.indptr[j] : self.indptr[j + 1]].tolist())
+
+        for j in sorted(por_resolver, key=lambda k: self._posicion[k]):
+            inicio, fin = self.indptr[j], self.indptr[j + 1]
+            partes_indices = [self.columnas[inicio:fin]]
+            partes_valores = [self.datos[inicio:fin]]
+            for insumo, cantidad in zip(
+                self.columnas[inicio:fin].tolist(), self.datos[inicio:fin].tolist()
+            ):
+                indices, valores = self._totales[insumo]
+                partes_indices.append(indices)
+                partes_valores.append(valores * cantidad)
+            indices, inversos = np.unique(
+                np.concatenate(partes_indices), return_inverse=True
+            )
+            valores = np.bincount(
+                inversos, weights=np.concatenate(partes_valores), minlength=len(indices)
+            )
+            self._totales[j] = (indices, valores)
+        return self._totales[i]
+
+    def _indice(self, nombre: str) -> int:
+        try:
+            return self.indices[nombre]
+        except KeyError:
+            raise ValueError(f"El bien {nombre} no está en el resolutor.") from None
+
+    def requerimientos_directos(self, nombre: str, cantidad: float = 1.0) -> Dict:
+        self._verificar()
+        i = self._indice(nombre)
+        inicio, fin = self.indptr[i], self.indptr[i + 1]
+        return {
+            self.nombres[j]: v * cantidad
+            for j, v in zip(
+                self.columnas[inicio:fin].tolist(), self.datos[inicio:fin].tolist()
+            )
+        }
+
+    def requerimientos_totales(self, nombre: str, cantidad: float = 1.0) -> Dict:
+        """
+        Unidades de cada insumo, de todos los niveles, que consumen `cantidad`
+        unidades del bien.
+        """
+        self._verificar()
+        indices, valores = self._vector_totales(self._indice(nombre))
+        return {
+            self.nombres[j]: v * cantidad
+            for j, v in zip(indices.tolist(), valores.tolist())
+        }
+
+    def es_materia_prima(self, nombre: str) -> bool:
+        i = self._indice(nombre)
+        return self.indptr[i] == self.indptr[i + 1]
+
+    def materias_primas(self, nombre: str, cantidad: float = 1.0) -> Dict:
+        """Como requerimientos_totales, pero solo con los bienes sin insumos."""
+        return {
+            insumo: valor
+            for insumo, valor in self.requerimientos_totales(nombre, cantidad).items()
+            if self.es_materia_prima(insumo)
+        }
+
+    def requerimientos_lote(self, nombres: Iterable[str], cantidades) -> np.ndarray:
+        """
+        Requerimientos totales de un lote de órdenes de producción.
+
+        :param nombres: Bien producido en cada orden.
+        :param cantidades: Unidades producidas en cada orden.
+        :return: Arreglo con las unidades de cada bien (orden de self.nombres).
+        """
+        self._verificar()
+        total = np.zeros(len(self.nombres), dtype=np.float64)
+        por_bien: Dict[int, float] = {}
+        for nombre, cantidad in zip(nombres, np.asarray(cantidades).tolist()):
+            i = self._indice(nombre)
+            por_bien[i] = por_bien.get(i, 0.0) + cantidad
+        for i, cantidad in por_bien.items():
+            indices, valores = self._vector_totales(i)
+            total[indices] += valores * cantidad
+        return total
@@ -0,0 +1,270 @@
+### Catálogo de bienes con atributos en arreglos paralelos
+
+"""
+
+Cada bien (BienGravado, BienExento, BienExcluido) es una vista sobre una fila
+del catálogo: su precio, tasa de IVA, arancel y estado de IVA viven en arreglos
+NumPy paralelos indexados por el id de la fila, en lugar de en el __dict__ de
+cada objeto.
+
+Los nombres se internan aparte: cada nombre distinto recibe un sku entero, que
+es la clave de los inventarios. Varias filas pueden compartir un sku, p. ej. la
+copia de un bien con otra tarifa en un escenario: son el mismo bien para los
+inventarios pero cada una tiene sus propios atributos.
+
+Las filas también se internan: los bienes con el mismo nombre y los mismos
+atributos comparten una fila, y cada fila lleva la cuenta de los bienes que la
+usan. Cambiar un atributo de un bien cuya fila es compartida le da una fila
+propia (copia al escribir), y la fila que ningún bien usa se reutiliza. Así la
+memoria del catálogo crece con las combinaciones distintas de atributos y no
+con el número de bienes o de copias.
+
+Con los atributos en arreglos los impuestos de muchos bienes se calculan de una
+vez (atributos(ids)) y un catálogo de 10^5 bienes ocupa unas decenas de bytes
+por bien además del objeto Python.
+
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Estados de IVA que conoce el catálogo; la posición es su código
+ESTADOS_IVA = ("gravado", "exento", "excluido")
+
+
+class CatalogoBienes:
+    """
+    Catálogo de bienes: nombres internados a skus y atributos por fila.
+    """
+
+    def __init__(self, capacidad_inicial: int = 1024):
+        """
+        :param capacidad_inicial: Número de filas para las que se reserva memoria.
+        """
+        capacidad = max(int(capacidad_inicial), 1)
+        self._precio = np.empty(capacidad, dtype=np.float64)
+        self._iva_rate = np.empty(capacidad, dtype=np.float64)
+        self._tariff = np.empty(capacidad, dtype=np.float64)
+        self._estado = np.empty(capacidad, dtype=np.int8)
+        self._sku = np.empty(capacidad, dtype=np.int64)
+        self._referencias = np.zeros(capacidad, dtype=np.int64)
+        self._n = 0
+
+        self.nombres: List[str] = []  # Sku -> nombre
+        self._skus: Dict[str, int] = {}  # Nombre -> sku
+
+        self._filas: Dict[Tuple, int] = {}  # (sku, atributos) -> fila
+        self._libres: List[int] = []  # Filas sin bienes, para reutilizar
+        # Filas liberadas por bienes que se destruyeron; se procesan en la
+        # siguiente operación porque la liberación puede ocurrir en medio de otra
+        self._por_liberar: List[int] = []
+
+    def __len__(self) -> int:
+        """Número de filas en uso."""
+        self._recoger()
+        return self._n - len(self._libres)
+
+    @property
+    def n_skus(self) -> int:
+        return len(self.nombres)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria reservada por los arreglos de atributos, en bytes."""
+        return sum(
+            columna.nbytes
+            for columna in (
+                self._precio,
+                self._iva_rate,
+                self._tariff,
+                self._estado,
+                self._sku,
+                self._referencias,
+            )
+        )
+
+    def sku(self, nombre: str) -> Optional[int]:
+        """Sku de un nombre, o None si el catálogo no lo conoce."""
+        return self._skus.get(nombre)
+
+    def fila_en_uso(self, sku: int) -> Optional[int]:
+        """Primera fila en uso de un sku, o None si ningún bien lo usa."""
+        self._recoger()
+        filas = np.flatnonzero(
+            (self._sku[: self._n] == sku) & (self._referencias[: self._n] > 0)
+        )
+        return int(filas[0]) if filas.size else None
+
+    def internar(self, nombre: str) -> int:
+        """Sku de un nombre, asignándole uno nuevo si no lo tiene."""
+        sku = self._skus.get(nombre)
+        if sku is None:
+            sku = len(self.nombres)
+            self._skus[nombre] = sku
+            self.nombres.append(nombre)
+        return sku
+
+    def registrar(
+        self, nombre: str, precio: float, iva_rate: float, tariff: float, estado: str
+    ) -> int:
+        """
+        Fila con los atributos de un bien: la existente si ya hay una igual o una
+        nueva. Suma una referencia a la fila; el bien la devuelve con liberar().
+
+        :return: El id de la fila.
+        """
+        self._recoger()
+        clave = (
+            self.internar(nombre),
+            float(precio),
+            float(iva_rate),
+            float(tariff),
+            ESTADOS_IVA.index(estado),
+        )
+        return self._fila(clave)
+
+    def retener(self, fila: int) -> int:
+        """Suma una referencia a una fila, p. ej. para la copia de un bien."""
+        self._referencias[fila] += 1
+        return fila
+
+    def liberar(self, fila: int) -> None:
+        """
+        Resta una referencia a una fila; sin referencias la fila queda libre.
+
+        Se puede llamar desde el __del__ de un bien: solo encola la fila.
+        """
+        self._por_liberar.append(fila)
+
+    def modificar(self, fila: int, **atributos) -> int:
+        """
+        Cambia atributos (nombre, precio, iva_rate, tariff o estado) de la fila
+        de un bien. Con otro nombre la fila pasa al sku de ese nombre.
+
+        Si la fila es compartida el bien pasa a una fila propia (o a la fila que
+        ya tenga los atributos nuevos) y la original no cambia.
+
+        :return: La fila que debe usar el bien desde ahora.
+        """
+        self._recoger()
+        sku, precio, iva_rate, tariff, estado = self._clave(fila)
+        if "nombre" in atributos:
+            sku = self.internar(atributos.pop("nombre"))
+        if "estado" in atributos:
+            estado = ESTADOS_IVA.index(atributos.pop("estado"))
+        precio = float(atributos.pop("precio", precio))
+        iva_rate = float(atributos.pop("iva_rate", iva_rate))
+        tariff = float(atributos.pop("tariff", tariff))
+        if atributos:
+            raise TypeError(f"Atributos desconocidos: {', '.join(atributos)}.")
+
+        clave = (sku, precio, iva_rate, tariff, estado)
+        anterior = self._clave(fila)
+        if clave == anterior:
+            return fila
+        if self._referencias[fila] == 1 and clave not in self._filas:
+            # La fila es solo de este bien: se modifica en su lugar
+            del self._filas[anterior]
+            self._escribir(fila, clave)
+            self._filas[clave] = fila
+            return fila
+        nueva = self._fila(clave)
+        self._soltar(fila)
+        return nueva
+
+    def _clave(self, fila: int) -> Tuple:
+        return (
+            int(self._sku[fila]),
+            float(self._precio[fila]),
+            float(self._iva_rate[fila]),
+            float(self._tariff[fila]),
+            int(self._estado[fila]),
+        )
+
+    def _escribir(self, fila: int, clave: Tuple) -> None:
+        (
+            self._sku[fila],
+            self._precio[fila],
+            self._iva_rate[fila],
+            self._tariff[fila],
+            self._estado[fila],
+        ) = clave
+
+    def _fila(self, clave: Tuple) -> int:
+        fila = self._filas.get(clave)
+        if fila is None:
+            if self._libres:
+                fila = self._libres.pop()
+            else:
+                if self._n == len(self._precio):
+                    self._crecer(2 * self._n)
+                fila = self._n
+                self._n += 1
+                self._referencias[fila] = 0
+            self._escribir(fila, clave)
+            self._filas[clave] = fila
+        self._referencias[fila] += 1
+        return fila
+
+    def _soltar(self, fila: int) -> None:
+        self._referencias[fila] -= 1
+        if self._referencias[fila] == 0:
+            del self._filas[self._clave(fila)]
+            self._libres.append(fila)
+
+    def _recoger(self) -> None:
+        while self._por_liberar:
+            self._soltar(self._por_liberar.pop())
+
+    def _crecer(self, capacidad: int) -> None:
+        for atributo in (
+            "_precio",
+            "_iva_rate",
+            "_tariff",
+            "_estado",
+            "_sku",
+            "_referencias",
+        ):
+            anterior = getattr(self, atributo)
+            nueva = np.empty(capacidad, dtype=anterior.dtype)
+            nueva[: self._n] = anterior[: self._n]
+            setattr(self, atributo, nueva)
+
+    def atributos(self, ids=None) -> Dict[str, np.ndarray]:
+        """
+        Atributos de varias filas a la vez (copias), para cálculos vectorizados.
+
+        :param ids: Ids de las filas; por defecto las que usa algún bien (las
+                    libres conservan los valores de su último bien).
+        :return: Arreglos id, precio, iva_rate, tariff, estado_iva (código en
+                 ESTADOS_IVA) y sku.
+        """
+        if ids is None:
+            self._recoger()
+            ids = np.flatnonzero(self._referencias[: self._n] > 0)
+        else:
+            ids = np.asarray(ids, dtype=np.intp)
+            if ids.size and (ids.min() < 0 or ids.max() >= self._n):
+                raise IndexError("Id de bien fuera del catálogo.")
+        return {
+            "id": ids.copy(),
+            "precio": self._precio[ids].copy(),
+            "iva_rate": self._iva_rate[ids].copy(),
+            "tariff": self._tariff[ids].copy(),
+            "estado_iva": self._estado[ids].copy(),
+            "sku": self._sku[ids].copy(),
+        }
+
+
+_catalogo_por_defecto: Optional[CatalogoBienes] = None
+
+
+def catalogo_por_defecto() -> CatalogoBienes:
+    """
+    Devuelve el catálogo compartido que usan los bienes creados sin uno explícito.
+    """
+    global _catalogo_por_defecto
+    if _catalogo_por_defecto is None:
+        _catalogo_por_defecto = CatalogoBienes()
+    return _catalogo_por_defecto
@@ -0,0 +1,218 @@
+### Cierre de periodos y estados financieros de todos los agentes
+
+"""
+
+CierrePeriodos calcula, para un conjunto de agentes y en una sola operación
+matricial, los estados de cada periodo a partir de los totales acumulados del
+libro mayor:
+
+Balance por clase y grupo: Las cuentas se agregan por clase PUC (el
+codigo_tipo_cuenta de la plantilla) y por grupo (los dos primeros dígitos del
+código). Los saldos se presentan según la naturaleza de la clase: débito para
+1, 5, 6 y 7 y crédito para 2, 3 y 4.
+
+Estado de resultados: Ingresos (4), gastos (5), costos de ventas (6) y costos
+de producción (7) del periodo. La utilidad se cierra contra la cuenta de
+patrimonio (3605 por defecto), de modo que las cuentas de resultados empiezan
+cada periodo en cero.
+
+Liquidación de IVA: La cuenta 2408 se neta por agente: IVA generado (haber)
+menos IVA descontable (debe). Un saldo a favor se arrastra al periodo siguiente.
+
+Cada cierre guarda una instantánea de los totales del libro mayor. El cierre
+siguiente solo usa la diferencia contra esa instantánea y los saldos del cierre
+anterior, sin recorrer la historia de movimientos.
+
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from ledger import TIPOS_AGENTE, Ledger
+from plan_cuentas import PlanCuentas
+
+CUENTA_IVA = 2408
+
+CLASES_PUC = {
+    1: "activo",
+    2: "pasivo",
+    3: "patrimonio",
+    4: "ingresos",
+    5: "gastos",
+    6: "costos_ventas",
+    7: "costos_produccion",
+}
+CLASES_BALANCE = (1, 2, 3)
+CLASES_RESULTADOS = (4, 5, 6, 7)
+CLASES_CREDITO = (2, 3, 4)  # Clases de naturaleza crédito
+
+
+class CierrePeriodos:
+    """
+    Clase para cerrar periodos de forma incremental para muchos agentes a la vez.
+    """
+
+    def __init__(
+        self,
+        ledger: Ledger,
+        plantillas_cuentas: Dict,
+        agentes,
+        cuenta_patrimonio: int = 3605,
+        registrar: bool = False,
+    ):
+        """
+        :param ledger: Libro mayor de los agentes.
+        :param plantillas_cuentas: Plan de cuentas con el codigo_tipo_cuenta.
+        :param agentes: Identificadores de los agentes que se cierran.
+        :param cuenta_patrimonio: Cuenta de patrimonio que recibe la utilidad.
+        :param registrar: Si es True los asientos de cierre se registran en el
+                          libro mayor con la plantilla "cierre_periodo".
+        """
+        self.ledger = ledger
+        self.plan_cuentas = PlanCuentas.desde_plantillas(plantillas_cuentas)
+        self.agentes = np.asarray(agentes, dtype=np.intp).ravel()
+        self.cuenta_patrimonio = cuenta_patrimonio
+        self.registrar = registrar
+
+        codigos = list(self.plan_cuentas.codigos)
+        clases = list(self.plan_cuentas.tipos)
+        if cuenta_patrimonio not in self.plan_cuentas:
+            codigos.append(cuenta_patrimonio)
+            clases.append(int(str(cuenta_patrimonio)[0]))
+        self.codigos = np.array(codigos, dtype=np.int64)
+        self.clases = np.array(clases, dtype=np.int64)
+        self.grupos = np.array([str(codigo)[:2] for codigo in codigos])
+        self._posicion_patrimonio = codigos.index(cuenta_patrimonio)
+        self._posicion_iva = (
+            codigos.index(CUENTA_IVA) if CUENTA_IVA in codigos else None
+        )
+
+        self._es_balance = np.isin(self.clases, CLASES_BALANCE)
+        self._es_resultado = np.isin(self.clases, CLASES_RESULTADOS)
+        self._signo = np.where(np.isin(self.clases, CLASES_CREDITO), -1.0, 1.0)
+
+        forma = (len(self.agentes), len(self.codigos))
+        self._debe_previo = np.zeros(forma)
+        self._haber_previo = np.zeros(forma)
+        self._saldos = np.zeros(forma)  # Saldos (debe - haber) al último cierre
+        self._iva_a_favor = np.zeros(len(self.agentes))
+        self.periodos = []
+
+    def _agregar(self, saldos: np.ndarray, etiquetas: np.ndarray, columnas):
+        import pandas as pd
+
+        # Suma los saldos, con el signo de su naturaleza, por etiqueta de columna
+        indicadora = (etiquetas[:, None] == np.asarray(columnas)[None, :]).astype(float)
+        return pd.DataFrame(
+            (saldos * self._signo) @ indicadora, columns=columnas, index=self._indice()
+        )
+
+    def _indice(self):
+        import pandas as pd
+
+        return pd.Index(self.agentes, name="agente")
+
+    def _tipos(self) -> np.ndarray:
+        return np.array(TIPOS_AGENTE, dtype=object)[
+            self.ledger.tipos_agente(self.agentes)
+        ]
+
+    def cerrar(self, periodo: Optional[int] = None) -> Dict:
+        """
+        Cierra el periodo para todos los agentes.
+
+        :param periodo: Etiqueta del periodo; por defecto ledger.periodo.
+        :return: Diccionario de DataFrames indexados por agente:
+                 balance_clases, balance_grupos, estado_resultados y
+                 liquidacion_iva.
+        """
+        periodo = self.ledger.periodo if periodo is None else periodo
+        debe, haber, _ = self.ledger.totales_matriz(self.agentes, self.codigos)
+        delta_debe = debe - self._debe_previo
+        delta_haber = haber - self._haber_previo
+        movimiento = delta_debe - delta_haber
+
+        resultados = np.where(self._es_resultado, movimiento, 0.0)
+        utilidad = 0.0 - resultados.sum(axis=1)
+
+        saldos = self._saldos + np.where(self._es_balance, movimiento, 0.0)
+        saldos[:, self._posicion_patrimonio] -= utilidad
+
+        nombres_clase = np.array([CLASES_PUC[clase] for clase in self.clases])
+        estado_resultados = self._agregar(
+            resultados, nombres_clase, [CLASES_PUC[c] for c in CLASES_RESULTADOS]
+        )
+        estado_resultados["utilidad"] = utilidad
+
+        balance_clases = self._agregar(
+            saldos, nombres_clase, [CLASES_PUC[c] for c in CLASES_BALANCE]
+        )
+        balance_clases["diferencia"] = balance_clases["activo"] - (
+            balance_clases["pasivo"] + balance_clases["patrimonio"]
+        )
+        balance_grupos = self._agregar(
+            saldos, self.grupos, sorted(set(self.grupos[self._es_balance].tolist()))
+        )
+
+        liquidacion_iva = self._liquidar_iva(delta_debe, delta_haber)
+
+        tipos = self._tipos()
+        tablas = (balance_clases, balance_grupos, estado_resultados, liquidacion_iva)
+        for tabla in tablas:
+            tabla.insert(0, "tipo", tipos)
+            tabla.insert(0, "periodo", periodo)
+
+        if self.registrar:
+            self._registrar_cierre(resultados, utilidad)
+            debe, haber, _ = self.ledger.totales_matriz(self.agentes, self.codigos)
+        self._debe_previo, self._haber_previo = debe, haber
+        self._saldos = saldos
+        self.periodos.append(periodo)
+
+        return {
+            "balance_clases": balance_clases,
+            "balance_grupos": balance_grupos,
+            "estado_resultados": estado_resultados,
+            "liquidacion_iva": liquidacion_iva,
+        }
+
+    def _liquidar_iva(self, delta_debe: np.ndarray, delta_haber: np.ndarray):
+        import pandas as pd
+
+        if self._posicion_iva is None:
+            generado = descontable = np.zeros(len(self.agentes))
+        else:
+            generado = delta_haber[:, self._posicion_iva]
+            descontable = delta_debe[:, self._posicion_iva]
+        a_favor_anterior = self._iva_a_favor
+        neto = generado - descontable - a_favor_anterior
+        self._iva_a_favor = np.maximum(-neto, 0.0)
+        return pd.DataFrame(
+            {
+                "iva_generado": generado,
+                "iva_descontable": descontable,
+                "saldo_a_favor_anterior": a_favor_anterior,
+                "saldo_a_pagar": np.maximum(neto, 0.0),
+                "saldo_a_favor": self._iva_a_favor,
+            },
+            index=self._indice(),
+        )
+
+    def _registrar_cierre(self, resultados: np.ndarray, utilidad: np.ndarray) -> None:
+        # Cada cuenta de resultados se salda y la utilidad va al patrimonio
+        montos = resultados.copy()
+        montos[:, self._posicion_patrimonio] = utilidad
+        filas, columnas = np.nonzero(montos)
+        if filas.size == 0:
+            return
+        valores = montos[filas, columnas]
+        primera = self.ledger.nueva_transaccion(len(self.agentes))
+        self.ledger.registrar_lote(
+            self.agentes[filas],
+            self.codigos[columnas],
+            np.maximum(-valores, 0.0),
+            np.maximum(valores, 0.0),
+            transacciones=primera + filas,
+            plantilla="cierre_periodo",
+        )
@@ -0,0 +1,234 @@
+### Exportación del libro diario a archivos columnares por bloques
+
+"""
+
+Un DiarioColumnar se suscribe a un Ledger y copia cada movimiento a un buffer
+de tamaño fijo. Cuando el buffer se llena se escribe un bloque: un archivo .npy
+por columna dentro de un directorio, más un manifiesto diario.json con los
+bloques escritos, los nombres de las plantillas y los tipos de agente.
+
+Columnas de cada movimiento:
+
+agente (int32), tipo (int8, posición en TIPOS_AGENTE), codigo (int64),
+transaccion (int64), plantilla (int16, posición en el manifiesto; -1 si no se
+indicó), debe (float64), haber (float64) y periodo (int32).
+
+El formato .npy se puede abrir con memoria mapeada (np.load(mmap_mode="r")),
+así que LectorDiario recorre bloque a bloque un diario de cualquier tamaño sin
+cargarlo completo en memoria.
+
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+import numpy as np
+
+from ledger import TIPOS_AGENTE, Ledger
+
+VERSION_DIARIO = 1
+MANIFIESTO = "diario.json"
+
+COLUMNAS_DIARIO = {
+    "agente": np.int32,
+    "tipo": np.int8,
+    "codigo": np.int64,
+    "transaccion": np.int64,
+    "plantilla": np.int16,
+    "debe": np.float64,
+    "haber": np.float64,
+    "periodo": np.int32,
+}
+
+
+class DiarioColumnar:
+    """
+    Sumidero que escribe los movimientos de un Ledger en bloques columnares.
+    """
+
+    def __init__(self, directorio: Union[str, Path], filas_por_bloque: int = 1_000_000):
+        """
+        :param directorio: Directorio de salida; se crea si no existe.
+        :param filas_por_bloque: Tamaño del buffer en memoria y de cada bloque.
+        """
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.filas_por_bloque = int(filas_por_bloque)
+
+        self._buffer = {
+            nombre: np.empty(self.filas_por_bloque, dtype=dtype)
+            for nombre, dtype in COLUMNAS_DIARIO.items()
+        }
+        self._n = 0
+        self._bloques = []
+        self._plantillas: Dict[str, int] = {}
+        self._ledgers = []
+
+    def conectar(self, ledger: Ledger) -> "DiarioColumnar":
+        """Suscribe el diario a un libro mayor."""
+        ledger.suscribir(self.escribir)
+        self._ledgers.append(ledger)
+        return self
+
+    def _codigo_plantilla(self, plantilla: Optional[str]) -> int:
+        if plantilla is None:
+            return -1
+        codigo = self._plantillas.get(plantilla)
+        if codigo is None:
+            codigo = len(self._plantillas)
+            self._plantillas[plantilla] = codigo
+        return codigo
+
+    def escribir(
+        self, movimientos: Dict[str, np.ndarray], plantilla: Optional[str], periodo: int
+    ) -> None:
+        """Agrega movimientos al buffer (ver Ledger.suscribir)."""
+        n = len(movimientos["agente"])
+        constantes = {
+            "plantilla": self._codigo_plantilla(plantilla),
+            "periodo": periodo,
+        }
+        inicio = 0
+        while inicio < n:
+            cupo = min(n - inicio, self.filas_por_bloque - self._n)
+            destino = slice(self._n, self._n + cupo)
+            for nombre, columna in self._buffer.items():
+                if nombre in constantes:
+                    columna[destino] = constantes[nombre]
+                else:
+                    columna[destino] = movimientos[nombre][inicio : inicio + cupo]
+            self._n += cupo
+            inicio += cupo
+            if self._n == self.filas_por_bloque:
+                self.vaciar()
+
+    def vaciar(self) -> None:
+        """Escribe en disco el contenido del buffer como un bloque nuevo."""
+        if self._n == 0:
+            return
+        nombre_bloque = f"bloque_{len(self._bloques):06d}"
+        ruta = self.directorio / nombre_bloque
+        ruta.mkdir(exist_ok=True)
+        for nombre, columna in self._buffer.items():
+            np.save(ruta / f"{nombre}.npy", columna[: self._n])
+        self._bloques.append({"nombre": nombre_bloque, "filas": self._n})
+        self._n = 0
+        self._escribir_manifiesto()
+
+    def _escribir_manifiesto(self) -> None:
+        manifiesto = {
+            "version": VERSION_DIARIO,
+            "columnas": {n: np.dtype(d).str for n, d in COLUMNAS_DIARIO.items()},
+            "tipos_agente": list(TIPOS_AGENTE),
+            "plantillas": sorted(self._plantillas, key=self._plantillas.get),
+            "bloques": self._bloques,
+        }
+        temporal = self.directorio / (MANIFIESTO + ".tmp")
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(manifiesto, archivo, indent=1)
+        os.replace(temporal, self.directorio / MANIFIESTO)
+
+    def cerrar(self) -> None:
+        """Escribe lo pendiente y deja de recibir movimientos."""
+        self.vaciar()
+        self._escribir_manifiesto()
+        for ledger in self._ledgers:
+            ledger.desuscribir(self.escribir)
+        self._ledgers = []
+
+    def __enter__(self) -> "DiarioColumnar":
+        return self
+
+    def __exit__(self, *excinfo) -> None:
+        self.cerrar()
+
+
+class LectorDiario:
+    """
+    Lectura con memoria mapeada de un diario escrito por DiarioColumnar.
+    """
+
+    def __init__(self, directorio: Union[str, Path]):
+        self.directorio = Path(directorio)
+        with open(self.directorio / MANIFIESTO, encoding="utf-8") as archivo:
+            self.manifiesto = json.load(archivo)
+        if self.manifiesto["version"] != VERSION_DIARIO:
+            raise ValueError(
+                f"Versión de diario no soportada: {self.manifiesto['version']}."
+            )
+        self.plantillas = self.manifiesto["plantillas"]
+        self.tipos_agente = self.manifiesto["tipos_agente"]
+
+    def __len__(self) -> int:
+        return sum(bloque["filas"] for bloque in self.manifiesto["bloques"])
+
+    def bloques(self) -> Iterator[Dict[str, np.ndarray]]:
+        """Recorre los bloques; cada columna es un arreglo con memoria mapeada."""
+        for bloque in self.manifiesto["bloques"]:
+            ruta = self.directorio / bloque["nombre"]
+            yield {
+                nombre: np.load(ruta / f"{nombre}.npy", mmap_mode="r")
+                for nombre in self.manifiesto["columnas"]
+            }
+
+    def movimientos(self, agente: int, codigo: int) -> Dict[str, np.ndarray]:
+        """Movimientos de una cuenta, en orden de registro."""
+        partes = {nombre: [] for nombre in self.manifiesto["columnas"]}
+        for bloque in self.bloques():
+            filas = np.flatnonzero(
+                (bloque["agente"] == agente) & (bloque["codigo"] == codigo)
+            )
+            for nombre, columna in bloque.items():
+                partes[nombre].append(np.asarray(columna[filas]))
+        return {
+            nombre: (
+                np.concatenate(valores)
+                if valores
+                else np.empty(0, dtype=COLUMNAS_DIARIO[nombre])
+            )
+            for nombre, valores in partes.items()
+        }
+
+    def balance_comprobacion(self, hasta_periodo: Optional[int] = None):
+        """
+        Balance de comprobación por agente y cuenta, calculado bloque a bloque.
+
+        :param hasta_periodo: Si se da, solo incluye movimientos hasta ese periodo.
+        :return: DataFrame con agente, tipo, codigo, debe, haber y saldo
+                 (debe - haber).
+        """
+        import pandas as pd
+
+        acumulado: Dict[tuple, list] = {}
+        for bloque in self.bloques():
+            filas = slice(None)
+            if hasta_periodo is not None:
+                filas = np.flatnonzero(bloque["periodo"] <= hasta_periodo)
+            claves = np.stack(
+                [
+                    np.asarray(bloque["agente"][filas], dtype=np.int64),
+                    np.asarray(bloque["tipo"][filas], dtype=np.int64),
+                    np.asarray(bloque["codigo"][filas]),
+                ],
+                axis=1,
+            )
+            if len(claves) == 0:
+                continue
+            unicas, inversos = np.unique(claves, axis=0, return_inverse=True)
+            inversos = inversos.ravel()
+            debe = np.bincount(inversos, weights=bloque["debe"][filas])
+            haber = np.bincount(inversos, weights=bloque["haber"][filas])
+            for clave, d, h in zip(map(tuple, unicas.tolist()), debe, haber):
+                total = acumulado.setdefault(clave, [0.0, 0.0])
+                total[0] += d
+                total[1] += h
+
+        filas = [
+            (agente, self.tipos_agente[tipo], codigo, debe, haber, debe - haber)
+            for (agente, tipo, codigo), (debe, haber) in sorted(acumulado.items())
+        ]
+        return pd.DataFrame(
+            filas, columns=["agente", "tipo", "codigo", "debe", "haber", "saldo"]
+        )
@@ -0,0 +1,198 @@
+### Ejecución de barridos de escenarios tributarios en un pool de procesos
+
+"""
+
+Cada escenario es un diccionario de parámetros (iva_rate, tariff,
+temporal_export, national_VAT, ...) que se simula de forma independiente.
+
+El contexto común (plan de cuentas y bienes) se serializa una sola vez en un
+bloque de memoria compartida; cada proceso del pool lo lee al arrancar y lo
+reutiliza en todos sus escenarios. Los resúmenes se devuelven a medida que
+terminan, con un número acotado de escenarios en vuelo.
+
+"""
+
+import copy
+import itertools
+import os
+import pickle
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from accounting_motor import MotorContable
+from ledger import Ledger
+from model import NCT, ZF, Good, Transaction
+from transacciones import LiquidadorTransacciones
+
+# Contexto que cada proceso del pool lee de la memoria compartida al arrancar
+_contexto: Optional[Dict] = None
+
+
+def rejilla(**valores: Sequence) -> List[Dict]:
+    """
+    Todas las combinaciones de los valores dados.
+
+    Ejemplo: rejilla(iva_rate=[0.05, 0.19], tariff=[0, 0.1]) da 4 escenarios.
+    """
+    nombres = list(valores)
+    return [
+        dict(zip(nombres, combinacion))
+        for combinacion in itertools.product(*(valores[n] for n in nombres))
+    ]
+
+
+def muestra_aleatoria(n: int, semilla: Optional[int] = None, **rangos) -> List[Dict]:
+    """
+    Muestra aleatoria de escenarios.
+
+    :param n: Número de escenarios.
+    :param semilla: Semilla del generador, para reproducir la muestra.
+    :param rangos: Por parámetro, una tupla (mínimo, máximo) para muestrear de forma
+                   uniforme o una lista de valores para escoger entre ellos.
+    """
+    generador = np.random.default_rng(semilla)
+    columnas = {}
+    for nombre, rango in rangos.items():
+        if isinstance(rango, tuple):
+            columnas[nombre] = generador.uniform(rango[0], rango[1], n).tolist()
+        else:
+            columnas[nombre] = [
+                rango[i] for i in generador.integers(len(rango), size=n)
+            ]
+    return [{nombre: columnas[nombre][i] for nombre in columnas} for i in range(n)]
+
+
+def _iniciar_proceso(nombre_memoria: str, tamano: int) -> None:
+    global _contexto
+    memoria = shared_memory.SharedMemory(name=nombre_memoria)
+    try:
+        _contexto = pickle.loads(memoria.buf[:tamano])
+    finally:
+        memoria.close()
+
+
+def _ejecutar_escenario(simulacion: Callable, indice: int, parametros: Dict) -> Dict:
+    resumen = simulacion(parametros, _contexto)
+    return {"escenario": indice, "parametros": parametros, **resumen}
+
+
+def simular_escenario(parametros: Dict, contexto: Dict) -> Dict:
+    """
+    Simulación por defecto: compara la venta de cada bien desde una empresa ZF y
+    desde una NCT a compradores NCT.
+
+    Los parámetros iva_rate y tariff reemplazan las tasas de los bienes gravados;
+    temporal_export y national_VAT se aplican a todas las transacciones.
+
+    :return: Por tipo de vendedor (sufijo _ZF o _NCT): iva, arancel, margen del
+             vendedor y saldo de caja del comprador.
+    """
+    cantidad = parametros.get("cantidad", 100.0)
+    bienes = []
+    for original in contexto["bienes"]:
+        bien = copy.copy(original)
+        if bien.status_iva == "gravado" and "iva_rate" in parametros:
+            bien.iva_rate = parametros["iva_rate"]
+        if "tariff" in parametros and bien.status_iva != "excluido":
+            bien.tariff = parametros["tariff"]
+        bienes.append(bien)
+
+    ledger = Ledger()
+    liquidador = LiquidadorTransacciones(MotorContable(ledger=ledger))
+    plantillas = contexto["plantillas_cuentas"]
+    resumen = {}
+    for clase in (ZF, NCT):
+        vendedor = clase("vendedor", plantillas, bienes, [], ledger=ledger)
+        comprador = NCT("comprador", plantillas, [], [], ledger=ledger)
+        for bien in bienes:
+            vendedor.purchase_good(bien, cantidad, 0.6 * bien.price)
+
+        totales = {"monto_iva": 0.0, "monto_arancel": 0.0, "precio_total": 0.0}
+        transacciones = (
+            Transaction(
+                vendedor,
+                comprador,
+                bien,
+                cantidad,
+                int(parametros.get("temporal_export", 0)),
+                int(parametros.get("national_VAT", 0)),
+            )
+            for bien in bienes
+        )
+        costo_ventas = 0.0
+        for lote in liquidador.liquidar(transacciones):
+            for clave in totales:
+                totales[clave] += lote[clave]
+            costo_ventas += lote["costo_ventas"]
+
+        sufijo = vendedor.get_type()
+        resumen[f"iva_{sufijo}"] = totales["monto_iva"]
+        resumen[f"arancel_{sufijo}"] = totales["monto_arancel"]
+        resumen[f"margen_{sufijo}"] = totales["precio_total"] - costo_ventas
+        debe, haber, _ = ledger.totales(comprador.agente_id, 1105)
+        resumen[f"caja_comprador_{sufijo}"] = debe - haber
+    return resumen
+
+
+class EjecutorEscenarios:
+    """
+    Clase para ejecutar escenarios independientes en un pool de procesos.
+    """
+
+    def __init__(
+        self,
+        plantillas_cuentas: Dict,
+        bienes: List[Good],
+        simulacion: Callable[[Dict, Dict], Dict] = simular_escenario,
+        procesos: Optional[int] = None,
+    ):
+        """
+        :param plantillas_cuentas: Plan de cuentas que se envía a los procesos.
+        :param bienes: Definición de los bienes que se envía a los procesos.
+        :param simulacion: Función (parametros, contexto) -> resumen. Debe poder
+                           serializarse con pickle (definida a nivel de módulo).
+        :param procesos: Número de procesos; por defecto uno por núcleo.
+        """
+        self.contexto = {"plantillas_cuentas": plantillas_cuentas, "bienes": bienes}
+        self.simulacion = simulacion
+        self.procesos = procesos or os.cpu_count() or 1
+
+    def ejecutar(self, escenarios: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Simula los escenarios y devuelve sus resúmenes a medida que terminan.
+
+        Cada resumen incluye "escenario" (posición en la entrada) y "parametros".
+        """
+        datos = pickle.dumps(self.contexto, protocol=pickle.HIGHEST_PROTOCOL)
+        memoria = shared_memory.SharedMemory(create=True, size=max(len(datos), 1))
+        try:
+            memoria.buf[: len(datos)] = datos
+            with ProcessPoolExecutor(
+                max_workers=self.procesos,
+                initializer=_iniciar_proceso,
+                initargs=(memoria.name, len(datos)),
+            ) as pool:
+                yield from self._despachar(pool, escenarios)
+        finally:
+            memoria.close()
+            memoria.unlink()
+
+    def _despachar(self, pool, escenarios: Iterable[Dict]) -> Iterator[Dict]:
+        # Se mantienen pocos escenarios en vuelo para no acumular la entrada
+        maximo_en_vuelo = 4 * self.procesos
+        pendientes = set()
+        for indice, parametros in enumerate(escenarios):
+            pendientes.add(
+                pool.submit(_ejecutar_escenario, self.simulacion, indice, parametros)
+            )
+            if len(pendientes) >= maximo_en_vuelo:
+                terminados, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    yield futuro.result()
+        while pendientes:
+            terminados, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                yield futuro.result()
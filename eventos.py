@@ -0,0 +1,476 @@
+### Bitácora de eventos con instantáneas para rebobinar y bifurcar simulaciones
+
+"""
+
+BitacoraEventos registra cada operación de la simulación como un evento
+inmutable (periodo, tipo, datos) y la aplica sobre su estado: un libro mayor y
+los agentes por nombre. Los tipos de evento son:
+
+agente: Alta de un agente ZF o NCT.
+
+metodo_costeo: Método de costeo de un bien en el inventario de un agente.
+
+compra / venta: Agent.purchase_good y Agent.sell_good.
+
+produccion: Órdenes de producción con MotorProduccion.
+
+transaccion: Venta entre dos agentes liquidada con LiquidadorTransacciones.
+
+asiento: Contabilización directa de una plantilla con MotorContable.
+
+Cada evento nuevo se valida, se agrega a la bitácora y luego se aplica, así
+que el estado nunca contiene cambios que la bitácora no pueda reproducir. Si
+falla al aplicarse, el evento se retira y el estado se reconstruye desde la
+última instantánea (los Agent obtenidos antes dejan de ser los del estado).
+
+Cada cada_periodos periodos se toma una instantánea compacta del estado
+(Ledger.instantanea e Inventory.instantanea). Para reconstruir el estado al
+final de cualquier periodo se parte de la instantánea más cercana y se
+reaplican solo los eventos posteriores.
+
+Una bifurcación comparte con su bitácora de origen los eventos hasta el punto
+de corte y las instantáneas, que son inmutables; solo guarda sus propios
+eventos. Su estado se materializa la primera vez que se usa, a partir de la
+instantánea más cercana, así que bifurcar no copia nada. Una bifurcación puede
+cambiar los bienes (p. ej. otra tasa de IVA o arancel), que se aplican a sus
+propios eventos; los eventos heredados siempre se reaplican con los bienes de
+la bitácora que los registró.
+
+"""
+
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from accounting_motor import MotorContable
+from ledger import Ledger
+from model import NCT, ZF, Agent, Good, Inventory, Transaction
+from produccion import MotorProduccion
+from transacciones import LiquidadorTransacciones
+
+CLASES_AGENTE = {"ZF": ZF, "NCT": NCT}
+
+
+class Evento(NamedTuple):
+    periodo: int
+    tipo: str
+    datos: Dict
+
+
+class Instantanea(NamedTuple):
+    periodo: int  # Estado al inicio de este periodo
+    indice: int  # Número de eventos aplicados
+    ledger: Dict
+    agentes: Tuple  # (clase, nombre, agente_id, vendidos, producidos, inventario)
+
+
+class EstadoSimulacion:
+    """
+    Estado materializado: libro mayor, motores y agentes por nombre.
+    """
+
+    def __init__(self, ledger: Ledger):
+        self.ledger = ledger
+        self.motor = MotorContable(ledger=ledger)
+        self.produccion = MotorProduccion(self.motor)
+        self.liquidador = LiquidadorTransacciones(self.motor)
+        self.agentes: Dict[str, Agent] = {}
+
+    def agente(self, nombre: str) -> Agent:
+        try:
+            return self.agentes[nombre]
+        except KeyError:
+            raise ValueError(f"No existe el agente '{nombre}'.") from None
+
+
+def _inmutable(valor):
+    # Los arreglos de los eventos se copian y quedan de solo lectura
+    if isinstance(valor, np.ndarray):
+        valor = valor.copy()
+        valor.flags.writeable = False
+    return valor
+
+
+class BitacoraEventos:
+    """
+    Clase para registrar, rebobinar y bifurcar una simulación basada en eventos.
+    """
+
+    def __init__(
+        self,
+        plantillas_cuentas: Dict,
+        bienes: Iterable[Good],
+        cada_periodos: int = 1,
+        conservar_movimientos: bool = False,
+    ):
+        """
+        :param plantillas_cuentas: Plan de cuentas de los agentes.
+        :param bienes: Bienes que pueden aparecer en los eventos.
+        :param cada_periodos: Cada cuántos periodos se toma una instantánea.
+        :param conservar_movimientos: Se pasa al Ledger; por defecto solo guarda
+                                      totales, porque la historia ya está en los
+                                      eventos y así las instantáneas son pequeñas.
+        """
+        self.plantillas_cuentas = plantillas_cuentas
+        self.bienes: Dict[str, Good] = {bien.name: bien for bien in bienes}
+        self.cada_periodos = max(int(cada_periodos), 1)
+        self.periodo = 0
+
+        self._padre: Optional["BitacoraEventos"] = None
+        self._base = 0  # Eventos heredados del padre
+        self._propios: List[Evento] = []
+        self._instantaneas: List[Instantanea] = []
+
+        self._estado: Optional[EstadoSimulacion] = EstadoSimulacion(
+            Ledger(conservar_movimientos=conservar_movimientos)
+        )
+        self._tomar_instantanea()
+
+    # Registro de eventos
+
+    def __len__(self) -> int:
+        return self._base + len(self._propios)
+
+    def _iterar(self, desde: int, hasta: int) -> Iterator[Tuple[Evento, Dict]]:
+        """Eventos [desde, hasta) con los bienes de la bitácora que los registró."""
+        if desde < self._base:
+            yield from self._padre._iterar(desde, min(hasta, self._base))
+        for evento in self._propios[max(desde - self._base, 0) : hasta - self._base]:
+            yield evento, self.bienes
+
+    def eventos(self) -> Iterator[Evento]:
+        """Todos los eventos, en orden."""
+        for evento, _ in self._iterar(0, len(self)):
+            yield evento
+
+    def _instantaneas_visibles(self) -> List[Instantanea]:
+        heredadas = []
+        if self._padre is not None:
+            heredadas = [
+                instantanea
+                for instantanea in self._padre._instantaneas_visibles()
+                if instantanea.indice <= self._base
+            ]
+        return heredadas + self._instantaneas
+
+    @property
+    def estado(self) -> EstadoSimulacion:
+        """Estado actual; en una bifurcación se materializa en el primer uso."""
+        if self._estado is None:
+            self._estado = self._reconstruir(len(self))
+            self._estado.ledger.periodo = self.periodo
+        return self._estado
+
+    def agente(self, nombre: str) -> Agent:
+        return self.estado.agente(nombre)
+
+    def _registrar(self, tipo: str, **datos):
+        evento = Evento(
+            self.periodo, tipo, {k: _inmutable(v) for k, v in datos.items()}
+        )
+        self._validar(self.estado, evento)
+        # Primero se registra y luego se aplica: el estado nunca tiene cambios
+        # que no estén en la bitácora
+        self._propios.append(evento)
+        try:
+            return self._aplicar(self.estado, evento, self.bienes)
+        except Exception:
+            # El evento pudo quedar aplicado a medias: se retira y el estado se
+            # reconstruye desde la última instantánea en el próximo uso
+            self._propios.pop()
+            self._estado = None
+            raise
+
+    def agregar_agente(
+        self,
+        clase: str,
+        nombre: str,
+        bienes_vendidos: Iterable[str] = (),
+        bienes_producidos: Iterable[str] = (),
+    ) -> Agent:
+        """Da de alta un agente ("ZF" o "NCT") con bienes dados por nombre."""
+        if clase not in CLASES_AGENTE:
+            raise ValueError(f"Tipo de agente desconocido: {clase}.")
+        if nombre in self.estado.agentes:
+            raise ValueError(f"Ya existe el agente '{nombre}'.")
+        return self._registrar(
+            "agente",
+            clase=clase,
+            nombre=nombre,
+            vendidos=tuple(bienes_vendidos),
+            producidos=tuple(bienes_producidos),
+        )
+
+    def fijar_metodo_costeo(self, agente: str, bien: str, metodo: str) -> None:
+        self._registrar("metodo_costeo", agente=agente, bien=bien, metodo=metodo)
+
+    def comprar(self, agente: str, bien: str, cantidad: float, costo_unitario: float):
+        self._registrar(
+            "compra",
+            agente=agente,
+            bien=bien,
+            cantidad=cantidad,
+            costo_unitario=costo_unitario,
+        )
+
+    def vender(self, agente: str, bien: str, cantidad: float, precio: float) -> float:
+        """Vende del inventario del agente y devuelve el costo de lo vendido."""
+        return self._registrar(
+            "venta", agente=agente, bien=bien, cantidad=cantidad, precio=precio
+        )
+
+    def producir(self, agente: str, bien: str, cantidades, costo_indirecto=0.0):
+        return self._registrar(
+            "produccion",
+            agente=agente,
+            bien=bien,
+            cantidades=np.atleast_1d(cantidades),
+            costo_indirecto=costo_indirecto,
+        )
+
+    def transaccion(
+        self,
+        vendedor: str,
+        comprador: str,
+        bien: str,
+        cantidad: float,
+        temporal_export: int = 0,
+        national_VAT: int = 0,
+    ) -> Dict:
+        """Liquida y contabiliza una venta entre dos agentes."""
+        return self._registrar(
+            "transaccion",
+            vendedor=vendedor,
+            comprador=comprador,
+            bien=bien,
+            cantidad=cantidad,
+            temporal_export=temporal_export,
+            national_VAT=national_VAT,
+        )
+
+    def contabilizar(self, plantilla: str, agente: str, variables: Dict):
+        return self._registrar(
+            "asiento",
+            plantilla=plantilla,
+            agente=agente,
+            variables={k: _inmutable(v) for k, v in variables.items()},
+        )
+
+    def avanzar_periodo(self) -> int:
+        """Pasa al periodo siguiente y toma una instantánea si corresponde."""
+        self.periodo += 1
+        self.estado.ledger.periodo = self.periodo
+        if self.periodo % self.cada_periodos == 0:
+            self._tomar_instantanea()
+        return self.periodo
+
+    # Aplicación de eventos
+
+    def _validar(self, estado: EstadoSimulacion, evento: Evento) -> None:
+        """
+        Valida un evento nuevo antes de registrarlo, para que los errores
+        habituales no lleguen a aplicarse a medias.
+
+        :raises ValueError: Si el evento se refiere a agentes o bienes que no
+                            existen, o si no hay inventario suficiente.
+        """
+        datos = evento.datos
+        tipo = evento.tipo
+        if tipo not in (
+            "agente",
+            "metodo_costeo",
+            "compra",
+            "venta",
+            "produccion",
+            "transaccion",
+            "asiento",
+        ):
+            raise ValueError(f"Tipo de evento desconocido: {tipo}.")
+        nombres_bienes = {
+            "agente": datos.get("vendidos", ()) + datos.get("producidos", ()),
+            "compra": (datos.get("bien"),),
+            "produccion": (datos.get("bien"),),
+            "transaccion": (datos.get("bien"),),
+        }.get(tipo, ())
+        for nombre in nombres_bienes:
+            if nombre not in self.bienes:
+                raise ValueError(f"No existe el bien '{nombre}'.")
+        for clave in ("agente", "vendedor", "comprador"):
+            if clave in datos:
+                estado.agente(datos[clave])
+
+        if tipo == "venta" or tipo == "transaccion":
+            vendedor = estado.agente(datos.get("agente", datos.get("vendedor")))
+            if vendedor.inventory.get_total_quantity(datos["bien"]) < datos["cantidad"]:
+                raise ValueError(
+                    f"No hay suficiente inventario de {datos['bien']} en "
+                    f"{vendedor.nombre}."
+                )
+        elif tipo == "produccion":
+            agente = estado.agente(datos["agente"])
+            unidades = float(np.sum(datos["cantidades"]))
+            for nombre, por_unidad in self.bienes[datos["bien"]].insumos.items():
+                if agente.inventory.get_total_quantity(nombre) < unidades * por_unidad:
+                    raise ValueError(
+                        f"No hay suficiente inventario de {nombre} en "
+                        f"{agente.nombre} para producir {datos['bien']}."
+                    )
+
+    def _aplicar(
+        self, estado: EstadoSimulacion, evento: Evento, bienes: Dict[str, Good]
+    ):
+        datos = evento.datos
+        tipo = evento.tipo
+        if tipo == "agente":
+            agente = CLASES_AGENTE[datos["clase"]](
+                datos["nombre"],
+                self.plantillas_cuentas,
+                [bienes[nombre] for nombre in datos["vendidos"]],
+                [bienes[nombre] for nombre in datos["producidos"]],
+                ledger=estado.ledger,
+            )
+            estado.agentes[agente.nombre] = agente
+            return agente
+        if tipo == "metodo_costeo":
+            estado.agente(datos["agente"]).set_costing_method_for_good(
+                datos["bien"], datos["metodo"]
+            )
+            return None
+        if tipo == "compra":
+            return estado.agente(datos["agente"]).purchase_good(
+                bienes[datos["bien"]], datos["cantidad"], datos["costo_unitario"]
+            )
+        if tipo == "venta":
+            return estado.agente(datos["agente"]).sell_good(
+                datos["bien"], datos["cantidad"], datos["precio"]
+            )
+        if tipo == "produccion":
+            return estado.produccion.producir(
+                estado.agente(datos["agente"]),
+                bienes[datos["bien"]],
+                datos["cantidades"],
+                costo_indirecto=datos["costo_indirecto"],
+            )
+        if tipo == "transaccion":
+            return estado.liquidador.liquidar_lote(
+                [
+                    Transaction(
+                        estado.agente(datos["vendedor"]),
+                        estado.agente(datos["comprador"]),
+                        bienes[datos["bien"]],
+                        datos["cantidad"],
+                        datos["temporal_export"],
+                        datos["national_VAT"],
+                    )
+                ]
+            )
+        if tipo == "asiento":
+            return estado.motor.contabilizar(
+                datos["plantilla"],
+                estado.agente(datos["agente"]).agente_id,
+                datos["variables"],
+            )
+        raise ValueError(f"Tipo de evento desconocido: {tipo}.")
+
+    # Instantáneas y reconstrucción
+
+    def _tomar_instantanea(self) -> None:
+        estado = self.estado
+        agentes = tuple(
+            (
+                agente.type,
+                nombre,
+                agente.agente_id,
+                tuple(bien.name for bien in agente.bienes_vendidos),
+                tuple(bien.name for bien in agente.bienes_producidos),
+                agente.inventory.instantanea(),
+            )
+            for nombre, agente in estado.agentes.items()
+        )
+        self._instantaneas.append(
+            Instantanea(self.periodo, len(self), estado.ledger.instantanea(), agentes)
+        )
+
+    def _desde_instantanea(self, instantanea: Instantanea) -> EstadoSimulacion:
+        estado = EstadoSimulacion(Ledger.desde_instantanea(instantanea.ledger))
+        for (
+            clase,
+            nombre,
+            agente_id,
+            vendidos,
+            producidos,
+            inventario,
+        ) in instantanea.agentes:
+            agente = CLASES_AGENTE[clase](
+                nombre,
+                self.plantillas_cuentas,
+                [self.bienes[bien] for bien in vendidos],
+                [self.bienes[bien] for bien in producidos],
+                ledger=estado.ledger,
+                agente_id=agente_id,
+            )
+            agente.inventory = Inventory.desde_instantanea(inventario, self.bienes)
+            estado.agentes[nombre] = agente
+        return estado
+
+    def _reconstruir(self, hasta: int) -> EstadoSimulacion:
+        """Estado después de los primeros `hasta` eventos."""
+        instantanea = max(
+            (i for i in self._instantaneas_visibles() if i.indice <= hasta),
+            key=lambda i: i.indice,
+        )
+        estado = self._desde_instantanea(instantanea)
+        for evento, bienes in self._iterar(instantanea.indice, hasta):
+            estado.ledger.periodo = evento.periodo
+            self._aplicar(estado, evento, bienes)
+        return estado
+
+    def _indice_fin_periodo(self, periodo: int) -> int:
+        # Los eventos están ordenados por periodo
+        indice = 0
+        for evento in self.eventos():
+            if evento.periodo > periodo:
+                break
+            indice += 1
+        return indice
+
+    def estado_en(self, periodo: int) -> EstadoSimulacion:
+        """
+        Estado independiente al final de un periodo, reconstruido desde la
+        instantánea más cercana sin modificar la bitácora.
+        """
+        if periodo > self.periodo:
+            raise ValueError(f"El periodo {periodo} aún no ha ocurrido.")
+        estado = self._reconstruir(self._indice_fin_periodo(periodo))
+        estado.ledger.periodo = periodo
+        return estado
+
+    def bifurcar(
+        self, periodo: Optional[int] = None, bienes: Optional[Iterable[Good]] = None
+    ) -> "BitacoraEventos":
+        """
+        Crea una rama que comparte los eventos y las instantáneas de esta bitácora.
+
+        :param periodo: La rama parte del final de este periodo; por defecto del
+                        estado actual.
+        :param bienes: Bienes que reemplazan, por nombre, a los de esta bitácora
+                       en los eventos nuevos de la rama.
+        """
+        rama = object.__new__(BitacoraEventos)
+        rama.plantillas_cuentas = self.plantillas_cuentas
+        rama.bienes = dict(self.bienes)
+        rama.bienes.update({bien.name: bien for bien in bienes or ()})
+        rama.cada_periodos = self.cada_periodos
+        rama._padre = self
+        rama._propios = []
+        rama._instantaneas = []
+        rama._estado = None
+        if periodo is None:
+            rama.periodo = self.periodo
+            rama._base = len(self)
+        else:
+            if periodo > self.periodo:
+                raise ValueError(f"El periodo {periodo} aún no ha ocurrido.")
+            rama.periodo = periodo
+            rama._base = self._indice_fin_periodo(periodo)
+        return rama
@@ -0,0 +1,257 @@
+### Liquidación de IVA y aranceles por agente y periodo
+
+"""
+
+MotorImpuestos acumula, por agente y periodo, las bases de cada transacción
+liquidada y calcula en una sola operación vectorizada la posición tributaria de
+todos los agentes:
+
+Ventas por estado de IVA del vendedor: gravadas (incluye las ventas gravadas
+sin IVA facturado, como las ventas a la zona franca o las exportaciones
+temporales, que conservan el derecho a descontar), exentas y excluidas.
+
+iva_generado: IVA que factura el vendedor (iva_vendedor). En las ventas
+ZF -> NCT es cero: el IVA es de importación y lo paga el comprador.
+
+iva_compras: IVA pagado en las compras, incluido el de importación.
+iva_importacion es la parte pagada al nacionalizar bienes de la zona franca.
+
+arancel: Arancel de los bienes que entran al territorio aduanero nacional desde
+la zona franca; lo debe el comprador (importador).
+
+Descuento proporcional: Si un agente vende bienes que dan derecho a descontar
+IVA y otros que no, solo descuenta la fracción de su IVA de compras
+proporcional a las ventas con derecho:
+
+    prorrata = ventas con derecho / ventas totales
+
+Por defecto dan derecho las ventas gravadas y exentas, y no las excluidas;
+exentos_descontables y excluidos_descontables cambian ese tratamiento. Un
+agente sin ventas en el periodo descuenta todo su IVA de compras. El IVA no
+descontable queda como mayor costo (iva_no_descontable).
+
+iva_a_pagar: iva_generado - iva_descontable - saldo a favor del periodo
+anterior, si es positivo; si no, el saldo a favor se arrastra al periodo
+siguiente, como en CierrePeriodos.
+
+Los periodos se liquidan en orden. Las transacciones se registran con
+registrar_transacciones (LiquidadorTransacciones lo hace si recibe el motor
+como impuestos) o, en arreglos, con registrar.
+
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ledger import TIPOS_AGENTE, Ledger
+from model import Transaction
+from transacciones import montos_transacciones
+
+BASES = (
+    "ventas_gravadas",
+    "ventas_exentas",
+    "ventas_excluidas",
+    "iva_generado",
+    "iva_compras",
+    "iva_importacion",
+    "arancel",
+)
+
+
+class MotorImpuestos:
+    """
+    Clase para liquidar IVA y aranceles de muchos agentes a la vez.
+    """
+
+    def __init__(
+        self,
+        ledger: Ledger,
+        agentes,
+        exentos_descontables: bool = True,
+        excluidos_descontables: bool = False,
+    ):
+        """
+        :param ledger: Libro mayor de los agentes (tipos de agente y periodo).
+        :param agentes: Identificadores de los agentes que se liquidan.
+        :param exentos_descontables: Si las ventas exentas dan derecho a
+                                     descontar el IVA de compras.
+        :param excluidos_descontables: Si las ventas excluidas dan derecho a
+                                       descontar el IVA de compras.
+        """
+        self.ledger = ledger
+        self.agentes = np.asarray(agentes, dtype=np.intp).ravel()
+        self.exentos_descontables = exentos_descontables
+        self.excluidos_descontables = excluidos_descontables
+
+        # Identificador de agente -> fila (-1 si no se liquida)
+        self._filas = np.full(
+            int(self.agentes.max()) + 1 if self.agentes.size else 0, -1, dtype=np.intp
+        )
+        self._filas[self.agentes] = np.arange(self.agentes.size)
+
+        self._bases: Dict[int, np.ndarray] = {}  # Periodo -> agentes x BASES
+        self._saldo_a_favor = np.zeros(self.agentes.size)
+        self.periodos: List[int] = []
+
+    def _filas_de(self, agentes: np.ndarray) -> np.ndarray:
+        filas = np.full(agentes.shape, -1, dtype=np.intp)
+        conocidos = (agentes >= 0) & (agentes < len(self._filas))
+        filas[conocidos] = self._filas[agentes[conocidos]]
+        return filas
+
+    def _sumar(self, bases: np.ndarray, filas: np.ndarray, columna: str, valores):
+        validas = filas >= 0
+        bases[:, BASES.index(columna)] += np.bincount(
+            filas[validas],
+            weights=np.broadcast_to(valores, filas.shape)[validas],
+            minlength=len(bases),
+        )
+
+    def registrar(
+        self,
+        vendedores,
+        compradores,
+        estados_iva,
+        precio_total,
+        iva_vendedor,
+        monto_iva,
+        monto_arancel,
+        importacion,
+        periodo: Optional[int] = None,
+    ) -> None:
+        """
+        Registra un lote de transacciones liquidadas.
+
+        :param vendedores: Identificador del vendedor de cada transacción.
+        :param compradores: Identificador del comprador.
+        :param estados_iva: Código del estado de IVA efectivo (posición en
+                            ESTADOS_IVA).
+        :param precio_total: Valor de la venta sin impuestos.
+        :param iva_vendedor: IVA facturado por el vendedor.
+        :param monto_iva: IVA pagado por el comprador.
+        :param monto_arancel: Arancel pagado por el comprador.
+        :param importacion: True si el bien entra al territorio nacional desde la
+                            zona franca (vendedor ZF, comprador NCT).
+        :param periodo: Periodo de las transacciones; por defecto ledger.periodo.
+        """
+        periodo = self.ledger.periodo if periodo is None else int(periodo)
+        if self.periodos and periodo <= self.periodos[-1]:
+            raise ValueError(f"El periodo {periodo} ya se liquidó.")
+        vendedores = self._filas_de(np.atleast_1d(np.asarray(vendedores)))
+        compradores = self._filas_de(np.atleast_1d(np.asarray(compradores)))
+        estados = np.broadcast_to(np.asarray(estados_iva), vendedores.shape)
+        precio_total = np.asarray(precio_total, dtype=np.float64)
+        monto_iva = np.asarray(monto_iva, dtype=np.float64)
+
+        bases = self._bases.get(periodo)
+        if bases is None:
+            bases = self._bases[periodo] = np.zeros((self.agentes.size, len(BASES)))
+        for codigo, columna in enumerate(BASES[:3]):
+            self._sumar(
+                bases,
+                vendedores,
+                columna,
+                np.where(estados == codigo, precio_total, 0.0),
+            )
+        self._sumar(bases, vendedores, "iva_generado", iva_vendedor)
+        self._sumar(bases, compradores, "iva_compras", monto_iva)
+        self._sumar(
+            bases,
+            compradores,
+            "iva_importacion",
+            np.where(np.asarray(importacion, dtype=bool), monto_iva, 0.0),
+        )
+        self._sumar(bases, compradores, "arancel", monto_arancel)
+
+    def registrar_transacciones(
+        self,
+        transacciones: List[Transaction],
+        periodo: Optional[int] = None,
+        montos: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
+        """
+        Registra objetos Transaction.
+
+        :param montos: Resultado de transacciones.montos_transacciones para las
+                       mismas transacciones; si es None se calcula.
+        """
+        if not transacciones:
+            return
+        if montos is None:
+            montos = montos_transacciones(transacciones)
+        n = len(transacciones)
+        vendedor_zf = np.array([t.seller.type == "ZF" for t in transacciones])
+        comprador_zf = np.array([t.buyer.type == "ZF" for t in transacciones])
+        self.registrar(
+            [t.seller.agente_id for t in transacciones],
+            [t.buyer.agente_id for t in transacciones],
+            montos["estado_iva"][:n],
+            montos["precio_total"][:n],
+            montos["iva_vendedor"][:n],
+            montos["monto_iva"][:n],
+            montos["monto_arancel"][:n],
+            vendedor_zf & ~comprador_zf,
+            periodo,
+        )
+
+    def liquidar(self, periodo: Optional[int] = None):
+        """
+        Liquida el periodo para todos los agentes.
+
+        :param periodo: Periodo a liquidar; por defecto ledger.periodo. Debe ser
+                        posterior a los ya liquidados.
+        :return: DataFrame indexado por agente con periodo, tipo, las BASES,
+                 prorrata, iva_descontable, iva_no_descontable,
+                 saldo_a_favor_anterior, iva_a_pagar y saldo_a_favor.
+        """
+        import pandas as pd
+
+        periodo = self.ledger.periodo if periodo is None else int(periodo)
+        if self.periodos and periodo <= self.periodos[-1]:
+            raise ValueError(
+                f"El periodo {periodo} no es posterior al último liquidado "
+                f"({self.periodos[-1]})."
+            )
+        bases = self._bases.pop(periodo, None)
+        if bases is None:
+            bases = np.zeros((self.agentes.size, len(BASES)))
+        tabla = pd.DataFrame(bases, columns=BASES, index=self._indice())
+
+        gravadas, exentas, excluidas = bases[:, 0], bases[:, 1], bases[:, 2]
+        con_derecho = gravadas.copy()
+        if self.exentos_descontables:
+            con_derecho += exentas
+        if self.excluidos_descontables:
+            con_derecho += excluidas
+        ventas = gravadas + exentas + excluidas
+        prorrata = np.divide(
+            con_derecho, ventas, out=np.ones_like(ventas), where=ventas > 0
+        )
+
+        iva_compras = bases[:, BASES.index("iva_compras")]
+        descontable = iva_compras * prorrata
+        a_favor_anterior = self._saldo_a_favor
+        neto = bases[:, BASES.index("iva_generado")] - descontable - a_favor_anterior
+        self._saldo_a_favor = np.maximum(-neto, 0.0)
+
+        tabla["prorrata"] = prorrata
+        tabla["iva_descontable"] = descontable
+        tabla["iva_no_descontable"] = iva_compras - descontable
+        tabla["saldo_a_favor_anterior"] = a_favor_anterior
+        tabla["iva_a_pagar"] = np.maximum(neto, 0.0)
+        tabla["saldo_a_favor"] = self._saldo_a_favor
+        tabla.insert(0, "tipo", self._tipos())
+        tabla.insert(0, "periodo", periodo)
+        self.periodos.append(periodo)
+        return tabla
+
+    def _indice(self):
+        import pandas as pd
+
+        return pd.Index(self.agentes, name="agente")
+
+    def _tipos(self) -> np.ndarray:
+        return np.array(TIPOS_AGENTE, dtype=object)[
+            self.ledger.tipos_agente(self.agentes)
+        ]
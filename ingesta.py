@@ -0,0 +1,466 @@
+### Ingesta asíncrona de archivos de transacciones (CSV y JSONL)
+
+"""
+
+IngestaTransacciones lee archivos de transacciones reales (declaraciones de
+aduana, facturas) y los aplica al modelo mientras los sigue leyendo:
+
+1. Cada archivo tiene una tarea productora que, en un hilo (asyncio.to_thread),
+   lee un bloque de filas, las valida y las convierte en registros.
+
+2. Los bloques pasan por una asyncio.Queue acotada: si la simulación va más
+   lenta que la lectura, los productores esperan y la memoria no crece con el
+   tamaño de los archivos.
+
+3. El consumidor aplica cada bloque mientras los productores ya leen el
+   siguiente, así la lectura y la simulación se solapan en lugar de ser dos
+   fases separadas.
+
+Campos de cada fila (los nombres de columna se pueden cambiar con mapeo):
+
+vendedor, tipo_vendedor, comprador, tipo_comprador: Nombres de los agentes y su
+tipo (ZF o NCT). Los agentes se crean la primera vez que aparecen.
+
+bien, status_iva (gravado, exento o excluido), precio (unitario, sin IVA),
+iva_rate y tariff (como tasas): Definen el bien (BienGravado, BienExento o
+BienExcluido) la primera vez que aparece. Las transacciones se liquidan al
+precio de su fila, que viaja en la Transaction en lugar de copiar el bien.
+
+cantidad, temporal_export y national_VAT (0 o 1, opcionales).
+
+Si falta el vendedor, la fila es una compra del comprador a un proveedor
+externo (purchase_good); si falta el comprador, es una venta a un cliente
+externo (sell_good). Si están ambos, es una Transaction entre agentes, que se
+liquida con un LiquidadorTransacciones si se da uno o, si no, con sell_good del
+vendedor y purchase_good del comprador.
+
+Las filas inválidas o sin inventario suficiente se rechazan con su archivo,
+línea y motivo, sin detener la ingesta. Lo mismo pasa con una transacción entre
+agentes que falla al liquidarse; el resto de su lote se liquida igual. El orden
+se respeta dentro de cada archivo; entre archivos los bloques se intercalan.
+
+"""
+
+import asyncio
+import csv
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from ledger import Ledger, ledger_por_defecto
+from model import (
+    NCT,
+    ZF,
+    Agent,
+    BienExcluido,
+    BienExento,
+    BienGravado,
+    Good,
+    Transaction,
+)
+from transacciones import ErrorLiquidacion
+
+CAMPOS = (
+    "vendedor",
+    "tipo_vendedor",
+    "comprador",
+    "tipo_comprador",
+    "bien",
+    "status_iva",
+    "precio",
+    "iva_rate",
+    "tariff",
+    "cantidad",
+    "temporal_export",
+    "national_VAT",
+)
+CLASES_AGENTE = {"ZF": ZF, "NCT": NCT}
+ESTADOS_IVA = ("gravado", "exento", "excluido")
+
+
+class Registro(NamedTuple):
+    archivo: str
+    linea: int
+    vendedor: str
+    tipo_vendedor: str
+    comprador: str
+    tipo_comprador: str
+    bien: str
+    status_iva: str
+    precio: float
+    iva_rate: float
+    tariff: float
+    cantidad: float
+    temporal_export: int
+    national_VAT: int
+
+
+def _texto(fila: Dict, campo: str) -> str:
+    valor = fila.get(campo)
+    return "" if valor is None else str(valor).strip()
+
+
+def _numero(fila: Dict, campo: str, defecto: Optional[float] = None) -> float:
+    texto = _texto(fila, campo)
+    if not texto:
+        if defecto is None:
+            raise ValueError(f"Falta el campo '{campo}'.")
+        return defecto
+    try:
+        return float(texto)
+    except ValueError:
+        raise ValueError(f"El campo '{campo}' no es numérico: {texto!r}.") from None
+
+
+def _bandera(fila: Dict, campo: str) -> int:
+    valor = _numero(fila, campo, 0.0)
+    if valor not in (0.0, 1.0):
+        raise ValueError(f"El campo '{campo}' debe ser 0 o 1.")
+    return int(valor)
+
+
+def validar_fila(fila: Dict, archivo: str, linea: int) -> Registro:
+    """
+    Convierte una fila (con los nombres de CAMPOS) en un Registro.
+
+    :raises ValueError: Si la fila no es válida.
+    """
+    vendedor, comprador = _texto(fila, "vendedor"), _texto(fila, "comprador")
+    if not vendedor and not comprador:
+        raise ValueError("La fila no tiene vendedor ni comprador.")
+    tipos = {}
+    for rol, nombre in (("vendedor", vendedor), ("comprador", comprador)):
+        tipo = _texto(fila, f"tipo_{rol}").upper()
+        if nombre and tipo not in CLASES_AGENTE:
+            raise ValueError(f"Tipo de {rol} inválido: {tipo!r}.")
+        tipos[rol] = tipo
+
+    bien = _texto(fila, "bien")
+    if not bien:
+        raise ValueError("Falta el campo 'bien'.")
+    status_iva = _texto(fila, "status_iva").lower() or "gravado"
+    if status_iva not in ESTADOS_IVA:
+        raise ValueError(f"Estado de IVA inválido: {status_iva!r}.")
+
+    precio = _numero(fila, "precio")
+    cantidad = _numero(fila, "cantidad")
+    iva_rate = _numero(fila, "iva_rate", 0.0) if status_iva == "gravado" else 0.0
+    tariff = _numero(fila, "tariff", 0.0) if status_iva != "excluido" else 0.0
+    if precio < 0 or cantidad <= 0:
+        raise ValueError(
+            "El precio no puede ser negativo y la cantidad debe ser positiva."
+        )
+    if not 0 <= iva_rate < 1 or not 0 <= tariff < 1:
+        raise ValueError("iva_rate y tariff deben ser tasas entre 0 y 1.")
+
+    return Registro(
+        archivo,
+        linea,
+        vendedor,
+        tipos["vendedor"],
+        comprador,
+        tipos["comprador"],
+        bien,
+        status_iva,
+        precio,
+        iva_rate,
+        tariff,
+        cantidad,
+        _bandera(fila, "temporal_export"),
+        _bandera(fila, "national_VAT"),
+    )
+
+
+def _filas(ruta: Path) -> Iterator[Tuple[int, Dict]]:
+    """Filas (línea, diccionario) de un archivo CSV o JSONL."""
+    with open(ruta, newline="", encoding="utf-8") as archivo:
+        if ruta.suffix.lower() == ".csv":
+            lector = csv.DictReader(archivo)
+            for fila in lector:
+                yield lector.line_num, fila
+        else:
+            for linea, texto in enumerate(archivo, start=1):
+                if texto.strip():
+                    try:
+                        fila = json.loads(texto)
+                    except json.JSONDecodeError as error:
+                        fila = ValueError(f"JSON inválido: {error.msg}.")
+                    if not isinstance(fila, (dict, Exception)):
+                        fila = ValueError("La fila no es un objeto JSON.")
+                    yield linea, fila
+
+
+class IngestaTransacciones:
+    """
+    Clase para aplicar archivos de transacciones al modelo con lectura solapada.
+    """
+
+    def __init__(
+        self,
+        plantillas_cuentas: Dict,
+        ledger: Optional[Ledger] = None,
+        liquidador=None,
+        bienes: Iterable[Good] = (),
+        agentes: Iterable[Agent] = (),
+        tamano_lote: int = 1_000,
+        lotes_en_cola: int = 8,
+        mapeo: Optional[Dict[str, str]] = None,
+        max_rechazos: int = 1_000,
+    ):
+        """
+        :param plantillas_cuentas: Plan de cuentas de los agentes que se crean.
+        :param ledger: Libro mayor de los agentes; por defecto el del liquidador
+                       o el libro mayor por defecto.
+        :param liquidador: LiquidadorTransacciones para contabilizar las
+                           transacciones entre agentes; si es None solo se mueven
+                           los inventarios.
+        :param bienes: Bienes ya definidos, por nombre.
+        :param agentes: Agentes ya existentes, por nombre.
+        :param tamano_lote: Filas por bloque leído.
+        :param lotes_en_cola: Bloques que pueden esperar en la cola; acota la
+                              memoria usada por la lectura.
+        :param mapeo: Nombre de la columna del archivo para cada campo de CAMPOS
+                      que se llame distinto.
+        :param max_rechazos: Número de rechazos que se guardan con su detalle.
+        """
+        self.plantillas_cuentas = plantillas_cuentas
+        self.liquidador = liquidador
+        if ledger is None:
+            ledger = liquidador.motor.ledger if liquidador else ledger_por_defecto()
+        self.ledger = ledger
+        self.bienes: Dict[str, Good] = {bien.name: bien for bien in bienes}
+        self.agentes: Dict[str, Agent] = {agente.nombre: agente for agente in agentes}
+        self.tamano_lote = tamano_lote
+        self.lotes_en_cola = lotes_en_cola
+        self.mapeo = {columna: campo for campo, columna in (mapeo or {}).items()}
+        self.max_rechazos = max_rechazos
+
+        self.leidos = 0
+        self.aplicados = 0
+        self.n_rechazos = 0
+        self.rechazos: List[Tuple[str, int, str]] = []
+        # Transacciones aún no liquidadas, con su registro, y sus cambios de
+        # inventario
+        self._pendientes: List[Tuple[Registro, Transaction]] = []
+        self._reservas: Dict[Tuple[str, str], float] = {}
+
+    # Lectura (en hilos)
+
+    def _leer_bloques(self, ruta: Path) -> Iterator[Tuple[List[Registro], List, int]]:
+        # Se ejecuta en un hilo: no toca el estado de la ingesta, solo devuelve
+        # (registros válidos, rechazos, filas leídas) por bloque
+        registros, rechazos, leidas = [], [], 0
+        for linea, fila in _filas(ruta):
+            leidas += 1
+            try:
+                if isinstance(fila, Exception):
+                    raise fila
+                if self.mapeo:
+                    fila = {self.mapeo.get(k, k): v for k, v in fila.items()}
+                registros.append(validar_fila(fila, str(ruta), linea))
+            except ValueError as error:
+                rechazos.append((str(ruta), linea, str(error)))
+            if leidas >= self.tamano_lote:
+                yield registros, rechazos, leidas
+                registros, rechazos, leidas = [], [], 0
+        if leidas:
+            yield registros, rechazos, leidas
+
+    def _rechazar(self, archivo: str, linea: int, motivo: str) -> None:
+        self.n_rechazos += 1
+        if len(self.rechazos) < self.max_rechazos:
+            self.rechazos.append((archivo, linea, motivo))
+
+    async def _producir(self, ruta: Path, cola: asyncio.Queue) -> None:
+        bloques = self._leer_bloques(ruta)
+        fin = object()
+        while True:
+            bloque = await asyncio.to_thread(next, bloques, fin)
+            if bloque is fin:
+                return
+            await cola.put(bloque)
+
+    # Aplicación (en el bucle de eventos, mientras los hilos siguen leyendo)
+
+    def _bien(self, registro: Registro) -> Good:
+        bien = self.bienes.get(registro.bien)
+        if bien is None:
+            if registro.status_iva == "gravado":
+                bien = BienGravado(
+                    registro.bien, registro.precio, registro.iva_rate, registro.tariff
+                )
+            elif registro.status_iva == "exento":
+                bien = BienExento(registro.bien, registro.precio, registro.tariff)
+            else:
+                bien = BienExcluido(registro.bien, registro.precio)
+            self.bienes[registro.bien] = bien
+        elif bien.status_iva != registro.status_iva:
+            raise ValueError(
+                f"El bien {registro.bien} ya está registrado como {bien.status_iva}."
+            )
+        return bien
+
+    def _agente(self, nombre: str, tipo: str) -> Agent:
+        agente = self.agentes.get(nombre)
+        if agente is None:
+            agente = CLASES_AGENTE[tipo](
+                nombre, self.plantillas_cuentas, [], [], ledger=self.ledger
+            )
+            self.agentes[nombre] = agente
+        elif agente.type != tipo:
+            raise ValueError(
+                f"El agente {nombre} ya está registrado como {agente.type}."
+            )
+        return agente
+
+    def _disponible(self, agente: Agent, bien: str) -> float:
+        return agente.inventory.get_total_quantity(bien) + self._reservas.get(
+            (agente.nombre, bien), 0.0
+        )
+
+    def _rechazar_pendiente(self, registro: Registro, error: ValueError) -> None:
+        # La fila ya se había contado como aplicada al quedar pendiente
+        self.aplicados -= 1
+        self._rechazar(registro.archivo, registro.linea, str(error))
+
+    def _liquidar_pendientes(self) -> None:
+        if not self._pendientes:
+            return
+        pendientes, self._pendientes, self._reservas = self._pendientes, [], {}
+        if self.liquidador is None:
+            for registro, transaccion in pendientes:
+                try:
+                    transaccion.seller.sell_good(
+                        transaccion.good.name,
+                        transaccion.amount,
+                        transaccion.precio_unitario,
+                    )
+                except ValueError as error:
+                    self._rechazar_pendiente(registro, error)
+                    continue
+                transaccion.buyer.purchase_good(
+                    transaccion.good, transaccion.amount, transaccion.precio_unitario
+                )
+            return
+
+        tamano = self.liquidador.tamano_lote
+        for inicio in range(0, len(pendientes), tamano):
+            lote = pendientes[inicio : inicio + tamano]
+            while lote:
+                try:
+                    self.liquidador.liquidar_lote([t for _, t in lote])
+                except ErrorLiquidacion as error:
+                    # Se rechaza la que falló y se reintenta el resto del lote
+                    self._rechazar_pendiente(lote[error.liquidadas][0], error)
+                    lote = lote[error.liquidadas + 1 :]
+                except ValueError as error:
+                    # El lote se rechazó antes de liquidar nada
+                    for registro, _ in lote:
+                        self._rechazar_pendiente(registro, error)
+                    lote = []
+                else:
+                    lote = []
+
+    def _aplicar_registro(self, registro: Registro) -> None:
+        bien = self._bien(registro)
+        vendedor = comprador = None
+        if registro.vendedor:
+            vendedor = self._agente(registro.vendedor, registro.tipo_vendedor)
+        if registro.comprador:
+            comprador = self._agente(registro.comprador, registro.tipo_comprador)
+
+        if vendedor is not None and comprador is not None:
+            if self._disponible(vendedor, bien.name) < registro.cantidad:
+                raise ValueError(
+                    f"No hay suficiente inventario de {bien.name} en {vendedor.nombre}."
+                )
+            transaccion = Transaction(
+                vendedor,
+                comprador,
+                bien,
+                registro.cantidad,
+                registro.temporal_export,
+                registro.national_VAT,
+                price=registro.precio,
+            )
+            self._pendientes.append((registro, transaccion))
+            for agente, signo in ((vendedor, -1.0), (comprador, 1.0)):
+                clave = (agente.nombre, bien.name)
+                self._reservas[clave] = (
+                    self._reservas.get(clave, 0.0) + signo * registro.cantidad
+                )
+            return
+
+        # Las compras y ventas externas se aplican en orden con las pendientes
+        self._liquidar_pendientes()
+        if comprador is not None:
+            comprador.purchase_good(bien, registro.cantidad, registro.precio)
+        else:
+            if vendedor.inventory.get_total_quantity(bien.name) < registro.cantidad:
+                raise ValueError(
+                    f"No hay suficiente inventario de {bien.name} en {vendedor.nombre}."
+                )
+            vendedor.sell_good(bien.name, registro.cantidad, registro.precio)
+
+    def aplicar_lote(self, registros: List[Registro]) -> None:
+        """Aplica un bloque de registros validados, en orden."""
+        self.leidos += len(registros)
+        for registro in registros:
+            try:
+                self._aplicar_registro(registro)
+            except ValueError as error:
+                self._rechazar(registro.archivo, registro.linea, str(error))
+            else:
+                self.aplicados += 1
+        self._liquidar_pendientes()
+
+    def _aplicar_bloque(self, registros: List[Registro], rechazos: List, leidas: int):
+        self.aplicar_lote(registros)
+        self.leidos += leidas - len(registros)
+        for rechazo in rechazos:
+            self._rechazar(*rechazo)
+
+    # Orquestación
+
+    async def ingerir(self, archivos: Iterable) -> Dict:
+        """
+        Lee los archivos en paralelo y aplica sus bloques a medida que llegan.
+
+        :param archivos: Rutas a archivos .csv o .jsonl.
+        :return: Resumen con filas leídas, aplicadas y rechazadas.
+        """
+        cola: asyncio.Queue = asyncio.Queue(maxsize=self.lotes_en_cola)
+        productores = [
+            asyncio.create_task(self._producir(Path(ruta), cola)) for ruta in archivos
+        ]
+        terminados = asyncio.gather(*productores)
+        try:
+            while True:
+                obtener = asyncio.ensure_future(cola.get())
+                await asyncio.wait(
+                    {obtener, terminados}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not obtener.done():
+                    obtener.cancel()
+                    break
+                self._aplicar_bloque(*obtener.result())
+            await terminados
+            while not cola.empty():
+                self._aplicar_bloque(*cola.get_nowait())
+        finally:
+            for productor in productores:
+                productor.cancel()
+        return self.resumen()
+
+    def ejecutar(self, archivos: Iterable) -> Dict:
+        """Versión síncrona de ingerir()."""
+        return asyncio.run(self.ingerir(archivos))
+
+    def resumen(self) -> Dict:
+        return {
+            "leidos": self.leidos,
+            "aplicados": self.aplicados,
+            "rechazados": self.n_rechazos,
+            "agentes": len(self.agentes),
+            "bienes": len(self.bienes),
+        }
@@ -0,0 +1,290 @@
+### Instrumentación opcional de los caminos críticos de la simulación
+
+"""
+
+Instrumentacion reemplaza temporalmente, mientras está activa, estos métodos por
+versiones que miden cada llamada:
+
+inventario.add_lote / inventario.remove_lote: Inventory.add_lote y remove_lote,
+por bien. También registra la profundidad (número de lotes) de cada inventario.
+
+cuenta.registrar_transaccion: Account.registrar_transaccion, por código.
+
+agente.purchase_good / agente.sell_good: Métodos de Agent, por bien.
+
+plantilla.contabilizar: MotorContable.contabilizar, por plantilla.
+
+Cada métrica se agrupa por (punto, tipo de agente, etiqueta) y guarda el número
+de llamadas, el tiempo total y máximo y un histograma de duraciones en cubetas
+de potencias de dos (nanosegundos). El tipo de agente (ZF o NCT) se toma del
+agente que está ejecutando purchase_good o sell_good (una ContextVar) o del
+libro mayor cuando la llamada no ocurre dentro de un agente.
+
+Cuando la instrumentación no está activa los métodos originales quedan intactos,
+así que no tiene ningún costo.
+
+Ejemplo:
+
+with Instrumentacion() as instrumentacion:
+    ejecutar_simulacion()
+instrumentacion.exportar("reporte.json")
+
+"""
+
+import functools
+import json
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from accounting_motor import MotorContable
+from ledger import TIPOS_AGENTE
+from model import Account, Agent, Inventory
+
+# (tipo, nombre) del agente cuyo método se está ejecutando
+_agente_actual: ContextVar[Optional[Tuple[str, str]]] = ContextVar(
+    "agente_instrumentado", default=None
+)
+
+# Instrumentación activa; los métodos solo se reemplazan una vez a la vez
+_activa: Optional["Instrumentacion"] = None
+
+CUBETAS = 48  # Cubetas del histograma: hasta 2**47 ns (~39 horas)
+
+
+class Metrica:
+    """
+    Contador, temporizador e histograma de un punto instrumentado.
+    """
+
+    __slots__ = ("llamadas", "unidades", "nanosegundos", "maximo", "histograma")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.unidades = 0  # Movimientos, asientos o lotes procesados
+        self.nanosegundos = 0
+        self.maximo = 0
+        self.histograma = [0] * CUBETAS
+
+    def agregar(self, nanosegundos: int, unidades: int = 1) -> None:
+        self.llamadas += 1
+        self.unidades += unidades
+        self.nanosegundos += nanosegundos
+        if nanosegundos > self.maximo:
+            self.maximo = nanosegundos
+        self.histograma[min(nanosegundos.bit_length(), CUBETAS - 1)] += 1
+
+    def percentil(self, fraccion: float) -> int:
+        """Cota superior, en nanosegundos, del percentil según el histograma."""
+        objetivo = fraccion * self.llamadas
+        acumulado = 0
+        for cubeta, conteo in enumerate(self.histograma):
+            acumulado += conteo
+            if conteo and acumulado >= objetivo:
+                return 2**cubeta
+        return self.maximo
+
+
+class Instrumentacion:
+    """
+    Clase para medir llamadas, tiempos y profundidad de inventarios en una corrida.
+    """
+
+    def __init__(self, agentes_reporte: int = 20):
+        """
+        :param agentes_reporte: Número de inventarios más profundos que se
+                                incluyen en el reporte.
+        """
+        self.agentes_reporte = agentes_reporte
+        self.metricas: Dict[Tuple[str, str, str], Metrica] = {}
+        # Inventario -> [tipo, nombre, lotes actuales, máximo de lotes]
+        self.profundidad: Dict[int, list] = {}
+        self._originales: List[Tuple[type, str, Callable]] = []
+
+    def _metrica(self, punto: str, tipo: str, etiqueta: str) -> Metrica:
+        clave = (punto, tipo, etiqueta)
+        metrica = self.metricas.get(clave)
+        if metrica is None:
+            metrica = self.metricas[clave] = Metrica()
+        return metrica
+
+    def activar(self) -> "Instrumentacion":
+        """Reemplaza los métodos instrumentados hasta que se llame desactivar."""
+        global _activa
+        if _activa is not None:
+            raise RuntimeError("Ya hay una instrumentación activa.")
+        _activa = self
+        reemplazos = {
+            (Inventory, "add_lote"): self._envolver_add_lote,
+            (Inventory, "remove_lote"): self._envolver_remove_lote,
+            (Account, "registrar_transaccion"): self._envolver_registrar,
+            (Agent, "purchase_good"): self._envolver_agente,
+            (Agent, "sell_good"): self._envolver_agente,
+            (MotorContable, "contabilizar"): self._envolver_contabilizar,
+        }
+        for (clase, nombre), envolver in reemplazos.items():
+            original = clase.__dict__[nombre]
+            self._originales.append((clase, nombre, original))
+            setattr(clase, nombre, functools.wraps(original)(envolver(original)))
+        return self
+
+    def desactivar(self) -> None:
+        """Restaura los métodos originales."""
+        global _activa
+        for clase, nombre, original in reversed(self._originales):
+            setattr(clase, nombre, original)
+        self._originales = []
+        if _activa is self:
+            _activa = None
+
+    def __enter__(self) -> "Instrumentacion":
+        return self.activar()
+
+    def __exit__(self, *excinfo) -> None:
+        self.desactivar()
+
+    # Envoltorios de cada punto instrumentado
+
+    def _profundidad(self, inventario: Inventory) -> None:
+        agente = _agente_actual.get() or ("", "")
+        lotes = sum(len(cola) for cola in inventario.lotes.values())
+        registro = self.profundidad.get(id(inventario))
+        if registro is None:
+            self.profundidad[id(inventario)] = [agente[0], agente[1], lotes, lotes]
+            return
+        if agente[1]:
+            registro[0], registro[1] = agente
+        registro[2] = lotes
+        registro[3] = max(registro[3], lotes)
+
+    def _envolver_add_lote(self, original: Callable) -> Callable:
+        def add_lote(inventario, good, quantity, unit_cost):
+            inicio = time.perf_counter_ns()
+            resultado = original(inventario, good, quantity, unit_cost)
+            duracion = time.perf_counter_ns() - inicio
+            tipo = (_agente_actual.get() or ("",))[0]
+            self._metrica("inventario.add_lote", tipo, good.name).agregar(duracion)
+            self._profundidad(inventario)
+            return resultado
+
+        return add_lote
+
+    def _envolver_remove_lote(self, original: Callable) -> Callable:
+        def remove_lote(inventario, good_name, quantity):
+            sku = inventario.id_bien(good_name)
+            lotes = len(inventario.lotes.get(sku, ()))
+            inicio = time.perf_counter_ns()
+            try:
+                return original(inventario, good_name, quantity)
+            finally:
+                duracion = time.perf_counter_ns() - inicio
+                tipo = (_agente_actual.get() or ("",))[0]
+                consumidos = lotes - len(inventario.lotes.get(sku, ()))
+                self._metrica("inventario.remove_lote", tipo, good_name).agregar(
+                    duracion, max(consumidos, 0)
+                )
+                self._profundidad(inventario)
+
+        return remove_lote
+
+    def _envolver_registrar(self, original: Callable) -> Callable:
+        def registrar_transaccion(cuenta, debe=0, haber=0, transaccion=None):
+            inicio = time.perf_counter_ns()
+            resultado = original(cuenta, debe, haber, transaccion)
+            duracion = time.perf_counter_ns() - inicio
+            agente = _agente_actual.get()
+            if agente is not None:
+                tipo = agente[0]
+            else:
+                tipo = TIPOS_AGENTE[cuenta.ledger.tipos_agente(cuenta.agente_id)]
+            self._metrica(
+                "cuenta.registrar_transaccion", tipo, str(cuenta.codigo)
+            ).agregar(duracion)
+            return resultado
+
+        return registrar_transaccion
+
+    def _envolver_agente(self, original: Callable) -> Callable:
+        punto = f"agente.{original.__name__}"
+
+        def metodo(agente, bien, *args, **kwargs):
+            token = _agente_actual.set((agente.type, agente.nombre))
+            inicio = time.perf_counter_ns()
+            try:
+                return original(agente, bien, *args, **kwargs)
+            finally:
+                duracion = time.perf_counter_ns() - inicio
+                _agente_actual.reset(token)
+                etiqueta = bien if isinstance(bien, str) else bien.name
+                self._metrica(punto, agente.type, etiqueta).agregar(duracion)
+
+        return metodo
+
+    def _envolver_contabilizar(self, original: Callable) -> Callable:
+        def contabilizar(motor, plantilla, agentes, variables, ledger=None):
+            inicio = time.perf_counter_ns()
+            transacciones = original(motor, plantilla, agentes, variables, ledger)
+            duracion = time.perf_counter_ns() - inicio
+            agente = _agente_actual.get()
+            if agente is not None:
+                tipo = agente[0]
+            else:
+                libro = ledger if ledger is not None else motor.ledger
+                tipos = np.unique(libro.tipos_agente(np.atleast_1d(agentes)))
+                tipo = TIPOS_AGENTE[tipos[0]] if len(tipos) == 1 else "mixto"
+            self._metrica("plantilla.contabilizar", tipo, plantilla).agregar(
+                duracion, len(transacciones)
+            )
+            return transacciones
+
+        return contabilizar
+
+    # Reporte
+
+    def reporte(self) -> Dict:
+        """
+        Resume las métricas y los inventarios más profundos.
+
+        :return: Diccionario con "metricas" (una fila por punto, tipo y etiqueta,
+                 ordenadas por tiempo total) e "inventarios_profundos".
+        """
+        filas = []
+        for (punto, tipo, etiqueta), metrica in self.metricas.items():
+            filas.append(
+                {
+                    "punto": punto,
+                    "tipo": tipo,
+                    "etiqueta": etiqueta,
+                    "llamadas": metrica.llamadas,
+                    "unidades": metrica.unidades,
+                    "segundos": metrica.nanosegundos / 1e9,
+                    "promedio_us": metrica.nanosegundos / metrica.llamadas / 1e3,
+                    "p50_us": metrica.percentil(0.5) / 1e3,
+                    "p99_us": metrica.percentil(0.99) / 1e3,
+                    "maximo_us": metrica.maximo / 1e3,
+                    "histograma_ns": {
+                        str(2**cubeta): conteo
+                        for cubeta, conteo in enumerate(metrica.histograma)
+                        if conteo
+                    },
+                }
+            )
+        filas.sort(key=lambda fila: fila["segundos"], reverse=True)
+
+        profundos = sorted(
+            self.profundidad.values(), key=lambda registro: registro[3], reverse=True
+        )
+        return {
+            "metricas": filas,
+            "inventarios_profundos": [
+                {"tipo": tipo, "agente": nombre, "lotes": lotes, "maximo_lotes": maximo}
+                for tipo, nombre, lotes, maximo in profundos[: self.agentes_reporte]
+            ],
+        }
+
+    def exportar(self, ruta: str) -> None:
+        """Escribe el reporte en un archivo JSON."""
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(self.reporte(), archivo, indent=1, ensure_ascii=False)
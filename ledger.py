@@ -0,0 +1,678 @@
+### Libro mayor columnar compartido por todas las cuentas del modelo
+
+"""
+
+Cada movimiento contable se guarda como una fila de cinco columnas NumPy:
+
+agente: Identificador entero del agente dueño de la cuenta.
+
+codigo: Código PUC de la cuenta (SIN_CODIGO para cuentas sueltas).
+
+transaccion: Identificador del asiento al que pertenece el movimiento.
+
+debe: Valor registrado en el debe.
+
+haber: Valor registrado en el haber.
+
+Las columnas se preasignan y crecen duplicando su capacidad, de modo que un
+movimiento ocupa 36 bytes en lugar de los cientos que cuesta un diccionario.
+
+Además de los movimientos, el libro mayor mantiene totales acumulados (debe,
+haber y número de movimientos) en matrices agentes x cuentas que se actualizan
+al registrar, para que los saldos se consulten en tiempo constante. Solo las
+cuentas que reciben movimientos ocupan una columna de esas matrices.
+
+Los suscriptores (p. ej. un DiarioColumnar) reciben cada lote de movimientos con
+el tipo del agente, la plantilla y el periodo. Con conservar_movimientos=False
+el libro mayor solo mantiene los totales y los movimientos viven únicamente en
+los suscriptores, lo que acota la memoria en corridas largas.
+
+"""
+
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SIN_CODIGO = -1  # Código usado por las cuentas que no provienen del PUC
+
+# Tipos de agente que conoce el libro mayor; la posición es su código
+TIPOS_AGENTE = ("", "ZF", "NCT")
+
+
+# Celdas con más movimientos en un lote se suman con math.fsum en lugar de por
+# rangos (ver _sumas_compensadas)
+_MAXIMO_POR_RANGO = 64
+
+
+def _sumas_compensadas(
+    valores: np.ndarray, conteo: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Suma compensada (Neumaier) de los valores de un lote por celda.
+
+    Se suma por rangos: en el paso r se suma el r-ésimo valor de cada celda, así
+    que cada paso es una operación vectorizada sobre las celdas que aún tienen
+    valores. Las celdas con más de _MAXIMO_POR_RANGO valores se suman aparte con
+    math.fsum (exacta).
+
+    :param valores: Valores ordenados por celda.
+    :param conteo: Número de valores de cada celda.
+    :return: (suma, compensación) por celda; la suma compensada es su suma.
+    """
+    inicios = np.cumsum(conteo) - conteo
+    suma = np.zeros(len(conteo), dtype=np.float64)
+    compensacion = np.zeros(len(conteo), dtype=np.float64)
+
+    grandes = conteo > _MAXIMO_POR_RANGO
+    for celda in np.flatnonzero(grandes).tolist():
+        inicio = inicios[celda]
+        suma[celda] = math.fsum(valores[inicio : inicio + conteo[celda]].tolist())
+
+    activas = np.flatnonzero(~grandes)
+    for rango in range(int(conteo[activas].max()) if activas.size else 0):
+        activas = activas[conteo[activas] > rango]
+        valor = valores[inicios[activas] + rango]
+        anterior = suma[activas]
+        nueva = anterior + valor
+        compensacion[activas] += np.where(
+            np.abs(anterior) >= np.abs(valor),
+            (anterior - nueva) + valor,
+            (valor - nueva) + anterior,
+        )
+        suma[activas] = nueva
+    return suma, compensacion
+
+
+class Ledger:
+    """
+    Almacén columnar de movimientos contables compartido entre cuentas y agentes.
+    """
+
+    def __init__(
+        self,
+        capacidad_inicial: int = 1024,
+        compensado: bool = False,
+        conservar_movimientos: bool = True,
+    ):
+        """
+        Inicializa un libro mayor vacío.
+
+        :param capacidad_inicial: Número de movimientos para los que se reserva memoria.
+        :param compensado: Si es True los totales acumulados usan suma compensada
+                           (Neumaier), entre lotes y dentro de cada lote, para
+                           que no se desvíen en corridas largas.
+        :param conservar_movimientos: Si es False los movimientos no se guardan en
+                                      memoria (solo totales y suscriptores).
+        """
+        capacidad = max(int(capacidad_inicial), 1)
+        self._agente = np.empty(capacidad, dtype=np.int32)
+        self._codigo = np.empty(capacidad, dtype=np.int64)
+        self._transaccion = np.empty(capacidad, dtype=np.int64)
+        self._debe = np.empty(capacidad, dtype=np.float64)
+        self._haber = np.empty(capacidad, dtype=np.float64)
+        self._n = 0
+
+        self._siguiente_agente = 0
+        self._siguiente_transaccion = 0
+        self._tipo_agente = np.zeros(16, dtype=np.int8)
+
+        self.conservar_movimientos = conservar_movimientos
+        # Posiciones de los movimientos por (agente, codigo), en trozos; se
+        # actualiza al consultar con los movimientos registrados desde entonces
+        self._indice: Dict[Tuple[int, int], List[np.ndarray]] = {}
+        self._indexadas = 0
+        self.periodo = 0  # Periodo que se informa a los suscriptores
+        self._suscriptores: List[Callable] = []
+
+        # Totales acumulados por (agente, columna de cuenta)
+        self.compensado = compensado
+        self._columnas = {}  # Código de cuenta -> columna en las matrices
+        self._codigos_columna = []  # Columna -> código de cuenta
+        self._tot_debe = np.zeros((16, 4), dtype=np.float64)
+        self._tot_haber = np.zeros((16, 4), dtype=np.float64)
+        self._conteo = np.zeros((16, 4), dtype=np.int64)
+        if compensado:
+            self._comp_debe = np.zeros((16, 4), dtype=np.float64)
+            self._comp_haber = np.zeros((16, 4), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def capacidad(self) -> int:
+        return len(self._debe)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria reservada por las columnas, en bytes."""
+        return sum(
+            columna.nbytes
+            for columna in (
+                self._agente,
+                self._codigo,
+                self._transaccion,
+                self._debe,
+                self._haber,
+            )
+        )
+
+    # Vistas de solo lectura sobre los movimientos registrados
+    @property
+    def agentes(self) -> np.ndarray:
+        return self._vista(self._agente)
+
+    @property
+    def codigos(self) -> np.ndarray:
+        return self._vista(self._codigo)
+
+    @property
+    def transacciones(self) -> np.ndarray:
+        return self._vista(self._transaccion)
+
+    @property
+    def debe(self) -> np.ndarray:
+        return self._vista(self._debe)
+
+    @property
+    def haber(self) -> np.ndarray:
+        return self._vista(self._haber)
+
+    def _vista(self, columna: np.ndarray) -> np.ndarray:
+        vista = columna[: self._n]
+        vista.flags.writeable = False
+        return vista
+
+    def nuevo_agente(self, tipo: str = "") -> int:
+        """Reserva un identificador para un agente (o una cuenta suelta)."""
+        return self.nuevos_agentes(1, tipo)
+
+    def nuevos_agentes(self, cantidad: int, tipo: str = "") -> int:
+        """
+        Reserva identificadores de agente consecutivos.
+
+        :param cantidad: Número de identificadores a reservar.
+        :param tipo: Tipo de los agentes ("ZF", "NCT" o "" si no aplica).
+        :return: El primer identificador reservado.
+        """
+        if tipo not in TIPOS_AGENTE:
+            raise ValueError(f"Tipo de agente desconocido: {tipo}.")
+        primero = self._siguiente_agente
+        self._siguiente_agente += int(cantidad)
+
+        capacidad = len(self._tipo_agente)
+        if self._siguiente_agente > capacidad:
+            while capacidad < self._siguiente_agente:
+                capacidad *= 2
+            tipos = np.zeros(capacidad, dtype=np.int8)
+            tipos[:primero] = self._tipo_agente[:primero]
+            self._tipo_agente = tipos
+        self._tipo_agente[primero : self._siguiente_agente] = TIPOS_AGENTE.index(tipo)
+        return primero
+
+    def tipos_agente(self, agentes: np.ndarray) -> np.ndarray:
+        """Código del tipo (posición en TIPOS_AGENTE) de cada agente."""
+        return self._tipo_agente[np.asarray(agentes, dtype=np.intp)]
+
+    def suscribir(self, funcion: Callable) -> None:
+        """
+        Registra una función que recibe cada lote de movimientos.
+
+        La función se llama como funcion(movimientos, plantilla, periodo), donde
+        movimientos es un diccionario de arreglos con las columnas agente, tipo,
+        codigo, transaccion, debe y haber.
+        """
+        self._suscriptores.append(funcion)
+
+    def desuscribir(self, funcion: Callable) -> None:
+        self._suscriptores.remove(funcion)
+
+    def _notificar(
+        self, agentes, codigos, transacciones, debe, haber, plantilla
+    ) -> None:
+        movimientos: Dict[str, np.ndarray] = {
+            "agente": agentes,
+            "tipo": self.tipos_agente(agentes),
+            "codigo": codigos,
+            "transaccion": transacciones,
+            "debe": debe,
+            "haber": haber,
+        }
+        for funcion in self._suscriptores:
+            funcion(movimientos, plantilla, self.periodo)
+
+    def nueva_transaccion(self, cantidad: int = 1) -> int:
+        """
+        Reserva identificadores de asiento consecutivos.
+
+        :param cantidad: Número de identificadores a reservar.
+        :return: El primer identificador reservado.
+        """
+        primera = self._siguiente_transaccion
+        self._siguiente_transaccion += int(cantidad)
+        return primera
+
+    def _asegurar_capacidad(self, adicionales: int) -> None:
+        requerida = self._n + adicionales
+        capacidad = self.capacidad
+        if requerida <= capacidad:
+            return
+
+        while capacidad < requerida:
+            capacidad *= 2
+
+        for nombre in ("_agente", "_codigo", "_transaccion", "_debe", "_haber"):
+            anterior = getattr(self, nombre)
+            nueva = np.empty(capacidad, dtype=anterior.dtype)
+            nueva[: self._n] = anterior[: self._n]
+            setattr(self, nombre, nueva)
+
+    def _matrices(self) -> Tuple[str, ...]:
+        nombres = ("_tot_debe", "_tot_haber", "_conteo")
+        if self.compensado:
+            nombres += ("_comp_debe", "_comp_haber")
+        return nombres
+
+    def _asegurar_matrices(self, filas: int, columnas: int) -> None:
+        actuales_filas, actuales_columnas = self._conteo.shape
+        if filas <= actuales_filas and columnas <= actuales_columnas:
+            return
+
+        nuevas_filas = actuales_filas
+        while nuevas_filas < filas:
+            nuevas_filas *= 2
+        nuevas_columnas = actuales_columnas
+        while nuevas_columnas < columnas:
+            nuevas_columnas *= 2
+
+        for nombre in self._matrices():
+            anterior = getattr(self, nombre)
+            nueva = np.zeros((nuevas_filas, nuevas_columnas), dtype=anterior.dtype)
+            nueva[:actuales_filas, :actuales_columnas] = anterior
+            setattr(self, nombre, nueva)
+
+    def columna(self, codigo: int) -> int:
+        """Columna de las matrices de totales asignada a un código de cuenta."""
+        codigo = int(codigo)
+        columna = self._columnas.get(codigo)
+        if columna is None:
+            columna = len(self._codigos_columna)
+            self._columnas[codigo] = columna
+            self._codigos_columna.append(codigo)
+        return columna
+
+    def columnas(self, codigos: np.ndarray) -> np.ndarray:
+        """Versión vectorizada de columna()."""
+        unicos, inversos = np.unique(np.asarray(codigos), return_inverse=True)
+        mapa = np.array([self.columna(c) for c in unicos.tolist()], dtype=np.intp)
+        return mapa[inversos].reshape(np.shape(codigos))
+
+    def _acumular(self, filas, columnas, debe, haber) -> None:
+        """Suma movimientos (escalares o arreglos) a los totales acumulados."""
+        comp_debe = comp_haber = 0.0
+        if np.ndim(filas) == 0:
+            self._asegurar_matrices(filas + 1, columnas + 1)
+            celdas = (filas, columnas)
+            conteo = 1
+        else:
+            self._asegurar_matrices(int(filas.max()) + 1, int(columnas.max()) + 1)
+            # Agrega el lote por celda antes de sumarlo a los totales
+            ancho = self._conteo.shape[1]
+            claves = filas * ancho + columnas
+            if self.compensado:
+                # También dentro del lote: se ordena por celda y se suma compensado.
+                # El orden dentro de una celda es determinista para un mismo lote
+                # y con la compensación casi no afecta al resultado.
+                orden = np.argsort(claves)
+                ordenadas = claves[orden]
+                primeras = np.flatnonzero(
+                    np.concatenate(([True], ordenadas[1:] != ordenadas[:-1]))
+                )
+                planas = ordenadas[primeras]
+                conteo = np.diff(np.append(primeras, len(ordenadas)))
+                debe, comp_debe = _sumas_compensadas(
+                    np.broadcast_to(debe, claves.shape)[orden], conteo
+                )
+                haber, comp_haber = _sumas_compensadas(
+                    np.broadcast_to(haber, claves.shape)[orden], conteo
+                )
+            else:
+                planas, inversos, conteo = np.unique(
+                    claves, return_inverse=True, return_counts=True
+                )
+                debe = np.bincount(inversos, weights=debe, minlength=len(planas))
+                haber = np.bincount(inversos, weights=haber, minlength=len(planas))
+            celdas = np.divmod(planas, ancho)
+
+        self._conteo[celdas] += conteo
+        if not self.compensado:
+            self._tot_debe[celdas] += debe
+            self._tot_haber[celdas] += haber
+            return
+
+        for total, compensacion, valor, comp_lote in (
+            (self._tot_debe, self._comp_debe, debe, comp_debe),
+            (self._tot_haber, self._comp_haber, haber, comp_haber),
+        ):
+            suma = total[celdas]
+            nueva = suma + valor
+            compensacion[celdas] += (
+                np.where(
+                    np.abs(suma) >= np.abs(valor),
+                    (suma - nueva) + valor,
+                    (valor - nueva) + suma,
+                )
+                + comp_lote
+            )
+            total[celdas] = nueva
+
+    def registrar(
+        self,
+        agente: int,
+        codigo: int,
+        debe: float = 0,
+        haber: float = 0,
+        transaccion: Optional[int] = None,
+        plantilla: Optional[str] = None,
+    ) -> int:
+        """
+        Registra un movimiento individual.
+
+        :param agente: Identificador del agente dueño de la cuenta.
+        :param codigo: Código de la cuenta.
+        :param debe: Valor del debe.
+        :param haber: Valor del haber.
+        :param transaccion: Asiento al que pertenece; si es None se crea uno nuevo.
+        :param plantilla: Nombre de la plantilla contable, para los suscriptores.
+        :return: El identificador del asiento.
+        """
+        if transaccion is None:
+            transaccion = self.nueva_transaccion()
+
+        if self.conservar_movimientos:
+            self._asegurar_capacidad(1)
+            i = self._n
+            self._agente[i] = agente
+            self._codigo[i] = codigo
+            self._transaccion[i] = transaccion
+            self._debe[i] = debe
+            self._haber[i] = haber
+            self._n += 1
+
+        self._acumular(int(agente), self.columna(codigo), debe, haber)
+
+        if self._suscriptores:
+            self._notificar(
+                np.array([agente], dtype=np.int32),
+                np.array([codigo], dtype=np.int64),
+                np.array([transaccion], dtype=np.int64),
+                np.array([debe], dtype=np.float64),
+                np.array([haber], dtype=np.float64),
+                plantilla,
+            )
+        return transaccion
+
+    def registrar_lote(
+        self,
+        agentes: np.ndarray,
+        codigos: np.ndarray,
+        debe: np.ndarray,
+        haber: np.ndarray,
+        transacciones: Optional[np.ndarray] = None,
+        plantilla: Optional[str] = None,
+    ) -> None:
+        """
+        Registra un lote de movimientos en una sola operación vectorizada.
+
+        Los escalares se difunden al tamaño del lote.
+
+        :param agentes: Identificadores de agente por movimiento.
+        :param codigos: Códigos de cuenta por movimiento.
+        :param debe: Valores del debe.
+        :param haber: Valores del haber.
+        :param transacciones: Asientos por movimiento; si es None cada movimiento
+                              recibe un asiento nuevo.
+        :param plantilla: Nombre de la plantilla contable, para los suscriptores.
+        """
+        agentes, codigos, debe, haber = np.broadcast_arrays(
+            np.asarray(agentes, dtype=np.int32),
+            np.asarray(codigos, dtype=np.int64),
+            np.asarray(debe, dtype=np.float64),
+            np.asarray(haber, dtype=np.float64),
+        )
+        agentes, codigos, debe, haber = (
+            agentes.ravel(),
+            codigos.ravel(),
+            debe.ravel(),
+            haber.ravel(),
+        )
+        n = agentes.size
+        if n == 0:
+            return
+
+        if transacciones is None:
+            primera = self.nueva_transaccion(n)
+            transacciones = np.arange(primera, primera + n, dtype=np.int64)
+        else:
+            transacciones = np.broadcast_to(
+                np.asarray(transacciones, dtype=np.int64), (n,)
+            )
+
+        if self.conservar_movimientos:
+            self._asegurar_capacidad(n)
+            fin = self._n + n
+            self._agente[self._n : fin] = agentes
+            self._codigo[self._n : fin] = codigos
+            self._transaccion[self._n : fin] = transacciones
+            self._debe[self._n : fin] = debe
+            self._haber[self._n : fin] = haber
+            self._n = fin
+
+        self._acumular(agentes.astype(np.intp), self.columnas(codigos), debe, haber)
+
+        if self._suscriptores:
+            self._notificar(agentes, codigos, transacciones, debe, haber, plantilla)
+
+    def _actualizar_indice(self) -> None:
+        inicio, fin = self._indexadas, self._n
+        if inicio == fin:
+            return
+        agentes = self._agente[inicio:fin]
+        codigos = self._codigo[inicio:fin]
+        # Orden estable por cuenta: dentro de cada cuenta se respeta el registro
+        orden = np.lexsort((codigos, agentes))
+        agentes, codigos = agentes[orden], codigos[orden]
+        limites = np.flatnonzero(
+            (agentes[1:] != agentes[:-1]) | (codigos[1:] != codigos[:-1])
+        )
+        limites = [0, *(limites + 1).tolist(), len(orden)]
+        posiciones = orden + inicio
+        posiciones.flags.writeable = False
+        for i, j in zip(limites[:-1], limites[1:]):
+            clave = (int(agentes[i]), int(codigos[i]))
+            self._indice.setdefault(clave, []).append(posiciones[i:j])
+        self._indexadas = fin
+
+    def filas(self, agente: int, codigo: int) -> np.ndarray:
+        """
+        Posiciones, en orden de registro, de los movimientos de una cuenta.
+
+        El costo depende de los movimientos de la cuenta y de los registrados
+        desde la última consulta, no del tamaño del libro mayor.
+
+        :raises ValueError: Si el libro mayor no conserva los movimientos.
+        """
+        if not self.conservar_movimientos:
+            raise ValueError(
+                "El libro mayor no conserva los movimientos "
+                "(conservar_movimientos=False); consulte sus suscriptores, p. ej. "
+                "un DiarioColumnar."
+            )
+        self._actualizar_indice()
+        trozos = self._indice.get((int(agente), int(codigo)))
+        if not trozos:
+            return np.empty(0, dtype=np.intp)
+        if len(trozos) > 1:
+            unidas = np.concatenate(trozos)
+            unidas.flags.writeable = False
+            trozos[:] = [unidas]
+        return trozos[0]
+
+    def movimientos(self, agente: int, codigo: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Obtiene los movimientos de una cuenta.
+
+        :param agente: Identificador del agente.
+        :param codigo: Código de la cuenta.
+        :return: Una tupla (debe, haber) de arreglos en orden de registro.
+        :raises ValueError: Si el libro mayor no conserva los movimientos.
+        """
+        filas = self.filas(agente, codigo)
+        return self._debe[filas], self._haber[filas]
+
+    def totales(self, agente: int, codigo: int) -> Tuple[float, float, int]:
+        """
+        Obtiene en tiempo constante los totales acumulados de una cuenta.
+
+        :param agente: Identificador del agente.
+        :param codigo: Código de la cuenta.
+        :return: Una tupla (total_debe, total_haber, numero_de_movimientos).
+        """
+        columna = self._columnas.get(int(codigo))
+        filas, columnas = self._conteo.shape
+        if columna is None or agente >= filas or columna >= columnas:
+            return 0.0, 0.0, 0
+
+        celda = (agente, columna)
+        total_debe = self._tot_debe[celda]
+        total_haber = self._tot_haber[celda]
+        if self.compensado:
+            total_debe += self._comp_debe[celda]
+            total_haber += self._comp_haber[celda]
+        return float(total_debe), float(total_haber), int(self._conteo[celda])
+
+    def totales_matriz(
+        self, agentes: np.ndarray, codigos: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Obtiene los totales acumulados de varios agentes y cuentas a la vez.
+
+        :param agentes: Identificadores de agente (filas del resultado).
+        :param codigos: Códigos de cuenta (columnas del resultado).
+        :return: Una tupla (debe, haber, conteo) de matrices agentes x cuentas.
+        """
+        agentes = np.asarray(agentes, dtype=np.intp)
+        codigos = np.asarray(codigos)
+        forma = (len(agentes), len(codigos))
+        debe = np.zeros(forma, dtype=np.float64)
+        haber = np.zeros(forma, dtype=np.float64)
+        conteo = np.zeros(forma, dtype=np.int64)
+
+        filas, columnas = self._conteo.shape
+        posiciones = np.array(
+            [self._columnas.get(int(c), -1) for c in codigos.tolist()], dtype=np.intp
+        )
+        con_columna = np.flatnonzero(posiciones >= 0)
+        con_fila = np.flatnonzero(agentes < filas)
+        if con_columna.size == 0 or con_fila.size == 0:
+            return debe, haber, conteo
+
+        celdas = np.ix_(agentes[con_fila], posiciones[con_columna])
+        destino = np.ix_(con_fila, con_columna)
+        debe[destino] = self._tot_debe[celdas]
+        haber[destino] = self._tot_haber[celdas]
+        conteo[destino] = self._conteo[celdas]
+        if self.compensado:
+            debe[destino] += self._comp_debe[celdas]
+            haber[destino] += self._comp_haber[celdas]
+        return debe, haber, conteo
+
+    def instantanea(self) -> Dict:
+        """
+        Copia compacta del estado del libro mayor.
+
+        Incluye los movimientos (si se conservan), los totales acumulados, los
+        tipos de agente y los contadores. Los arreglos se recortan a la parte usada
+        y son de solo lectura, de modo que varias copias pueden compartirlos. Los
+        suscriptores no forman parte de la instantánea.
+        """
+        filas = min(self._conteo.shape[0], self._siguiente_agente)
+        columnas = len(self._codigos_columna)
+        datos = {
+            "compensado": self.compensado,
+            "conservar_movimientos": self.conservar_movimientos,
+            "periodo": self.periodo,
+            "siguiente_agente": self._siguiente_agente,
+            "siguiente_transaccion": self._siguiente_transaccion,
+            "codigos_columna": tuple(self._codigos_columna),
+            "tipo_agente": self._tipo_agente[: self._siguiente_agente].copy(),
+        }
+        for nombre in ("_agente", "_codigo", "_transaccion", "_debe", "_haber"):
+            datos[nombre] = getattr(self, nombre)[: self._n].copy()
+        for nombre in self._matrices():
+            datos[nombre] = getattr(self, nombre)[:filas, :columnas].copy()
+        for valor in datos.values():
+            if isinstance(valor, np.ndarray):
+                valor.flags.writeable = False
+        return datos
+
+    @classmethod
+    def desde_instantanea(cls, instantanea: Dict, adoptar: bool = False) -> "Ledger":
+        """
+        Crea un libro mayor nuevo con el estado de instantanea().
+
+        :param adoptar: Si es True el libro mayor usa como columnas y matrices los
+                        arreglos escribibles de la instantánea, sin copiarlos, p.
+                        ej. los abiertos con np.load(..., mmap_mode="c") de un
+                        punto de control: siguen mapeados en memoria y solo se
+                        copian al crecer, y lo que se escriba en ellos no llega
+                        al archivo. No deben usarse en otra parte.
+        """
+        n = len(instantanea["_debe"])
+        ledger = cls(
+            capacidad_inicial=max(n, 1024),
+            compensado=instantanea["compensado"],
+            conservar_movimientos=instantanea["conservar_movimientos"],
+        )
+        ledger.periodo = instantanea["periodo"]
+        ledger.nuevos_agentes(instantanea["siguiente_agente"])
+        ledger._tipo_agente[: instantanea["siguiente_agente"]] = instantanea[
+            "tipo_agente"
+        ]
+        ledger._siguiente_transaccion = instantanea["siguiente_transaccion"]
+        for codigo in instantanea["codigos_columna"]:
+            ledger.columna(codigo)
+
+        def adoptable(arreglo: np.ndarray) -> bool:
+            # Con algún eje vacío el crecimiento por duplicación no avanzaría
+            return adoptar and arreglo.flags.writeable and 0 not in arreglo.shape
+
+        for nombre in ("_agente", "_codigo", "_transaccion", "_debe", "_haber"):
+            if adoptable(instantanea[nombre]):
+                setattr(ledger, nombre, instantanea[nombre])
+            else:
+                getattr(ledger, nombre)[:n] = instantanea[nombre]
+        ledger._n = n
+
+        filas, columnas = instantanea["_conteo"].shape
+        if all(adoptable(instantanea[nombre]) for nombre in ledger._matrices()):
+            for nombre in ledger._matrices():
+                setattr(ledger, nombre, instantanea[nombre])
+        else:
+            ledger._asegurar_matrices(max(filas, 1), max(columnas, 1))
+            for nombre in ledger._matrices():
+                getattr(ledger, nombre)[:filas, :columnas] = instantanea[nombre]
+        return ledger
+
+
+_ledger_por_defecto: Optional[Ledger] = None
+
+
+def ledger_por_defecto() -> Ledger:
+    """
+    Devuelve el libro mayor compartido que usan las cuentas creadas sin uno explícito.
+    """
+    global _ledger_por_defecto
+    if _ledger_por_defecto is None:
+        _ledger_por_defecto = Ledger()
+    return _ledger_por_defecto
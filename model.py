@@ -1,53 +1,103 @@
 #! Script para realizar la calculadora
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional
 from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Mapping, MutableMapping, Set as AbstractSet
+from types import MappingProxyType
 
-from utils import cargar_plantillas_cuentas
+import numpy as np
+
+from catalogo import ESTADOS_IVA, CatalogoBienes, catalogo_por_defecto
+from ledger import SIN_CODIGO, Ledger, ledger_por_defecto
+from plan_cuentas import PlanCuentas
 
 
 ### Ensayo
 
-# TODO Usar pathlib
-ruta = r"C:\Users\andre\OneDrive\Documentos\Repositories\MIT_Tax_Avoidance\FTZ_Model\directorio_cuentas.xlsx"
 
-plantilla_1 = cargar_plantillas_cuentas(
-    ruta
-)  ### Generar plantilla para las cuentas basada en el PUC
+def __getattr__(name: str):
+    # La plantilla del PUC se carga al primer uso y no al importar el módulo
+    if name == "plantilla_1":
+        from utils import cargar_plantillas_cuentas
+
+        return cargar_plantillas_cuentas()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Account:
     """
-    Clase para generar las cuentas y registrarlas
+    Clase para generar las cuentas y registrarlas.
+
+    La cuenta es una vista sobre un Ledger compartido: sus movimientos viven en
+    las columnas del libro mayor identificados por (agente_id, codigo).
     """
 
-    def __init__(self, name: str, tipo: int):
-        self.historial = {}  # Diccionario vacío para el historial
-        self.contador_transacciones = 0  # Contador de transacciones
+    def __init__(
+        self,
+        name: str,
+        tipo: int,
+        codigo: Optional[int] = None,
+        agente_id: Optional[int] = None,
+        ledger: Optional[Ledger] = None,
+    ):
+        """
+        Inicializa una nueva cuenta.
+
+        :param name: Nombre de la cuenta.
+        :param tipo: Código del tipo de cuenta (clase del PUC).
+        :param codigo: Código PUC de la cuenta. Si es None la cuenta es suelta.
+        :param agente_id: Identificador del agente dueño. Si es None se reserva uno
+                          nuevo en el libro mayor.
+        :param ledger: Libro mayor donde se guardan los movimientos. Si es None se
+                       usa el libro mayor por defecto.
+        """
+        self.ledger = ledger if ledger is not None else ledger_por_defecto()
+        self.agente_id = (
+            agente_id if agente_id is not None else self.ledger.nuevo_agente()
+        )
+        self.codigo = int(codigo) if codigo is not None else SIN_CODIGO
         self.name = name
         self.tipo = tipo
 
-    def registrar_transaccion(self, debe=0, haber=0) -> None:
-        if not isinstance(debe, (int, float)) or not isinstance(haber, (int, float)):
-            raise ValueError("Los valores de 'debe' y 'haber' deben ser números.")
+    @property
+    def contador_transacciones(self) -> int:
+        return self.ledger.totales(self.agente_id, self.codigo)[2]
 
-        # Aumenta el contador de transacciones
-        self.contador_transacciones += 1
+    @property
+    def historial(self) -> Mapping:
+        """
+        Movimientos de la cuenta, {número: {"debe": ..., "haber": ...}} desde 1.
+
+        Es una instantánea de solo lectura que se arma desde el libro mayor en
+        cada acceso (con montos float): para registrar movimientos se usa
+        registrar_transaccion, y conviene guardarla si se va a recorrer varias
+        veces.
+
+        :raises ValueError: Si el libro mayor no conserva los movimientos.
+        """
+        debe, haber = self.ledger.movimientos(self.agente_id, self.codigo)
+        return MappingProxyType(
+            {
+                i: MappingProxyType({"debe": d, "haber": h})
+                for i, (d, h) in enumerate(zip(debe.tolist(), haber.tolist()), start=1)
+            }
+        )
 
-        # Crea un registro de la transacción
-        transaccion = {"debe": debe, "haber": haber}
+    def registrar_transaccion(self, debe=0, haber=0, transaccion=None) -> None:
+        if not isinstance(debe, (int, float)) or not isinstance(haber, (int, float)):
+            raise ValueError("Los valores de 'debe' y 'haber' deben ser números.")
 
-        # Añade la transacción al historial
-        self.historial[self.contador_transacciones] = transaccion
+        # Añade el movimiento al libro mayor compartido
+        self.ledger.registrar(self.agente_id, self.codigo, debe, haber, transaccion)
 
-    def mostrar_historial(self) -> None:
+    def mostrar_historial(self) -> Mapping:
         return self.historial
 
     def calcular_totales(self) -> Dict:
-        total_debe = sum(transaccion["debe"] for transaccion in self.historial.values())
-        total_haber = sum(
-            transaccion["haber"] for transaccion in self.historial.values()
-        )
+        # Los totales son float: el libro mayor guarda los montos en float64,
+        # también cuando los movimientos se registran con enteros
+        total_debe, total_haber, _ = self.ledger.totales(self.agente_id, self.codigo)
         neto = total_haber - total_debe
         totales_cuenta = {}
 
@@ -63,10 +113,7 @@ class Account:
         return totales_cuenta
 
     def saldo_neto(self) -> Dict:
-        total_debe = sum(transaccion["debe"] for transaccion in self.historial.values())
-        total_haber = sum(
-            transaccion["haber"] for transaccion in self.historial.values()
-        )
+        total_debe, total_haber, _ = self.ledger.totales(self.agente_id, self.codigo)
         neto = total_haber - total_debe
 
         if neto > 0:
@@ -79,46 +126,335 @@ class Account:
         return saldo
 
 
-### Prueba
+_SIN_CAMBIOS: Mapping = MappingProxyType({})
 
-inventarios = Account("inventarios", 1)
 
-inventarios.registrar_transaccion(100, 0)
+class CuentasAgente(MutableMapping):
+    """
+    Cuentas de un agente por código, que se crean al primer acceso.
+
+    Como una Account es solo una vista sobre el libro mayor, crearla cuando se
+    consulta no cambia sus saldos: el agente no paga por las cuentas del plan
+    que nunca usa. Se comporta como el diccionario {codigo: Account} de todo el
+    plan de cuentas, también al asignar o borrar cuentas: las asignadas
+    reemplazan a las del plan y las borradas dejan de estar, en el mismo orden
+    que tendría el diccionario.
+    """
+
+    __slots__ = (
+        "plan_cuentas",
+        "agente_id",
+        "ledger",
+        "_creadas",
+        "_reemplazos",
+        "_borradas",
+        "_al_final",
+    )
+
+    def __init__(self, plan_cuentas: PlanCuentas, agente_id: int, ledger: Ledger):
+        self.plan_cuentas = plan_cuentas
+        self.agente_id = agente_id
+        self.ledger = ledger
+        self._creadas: Dict[int, Account] = {}
+        # Cambios sobre el plan; se crean con la primera asignación o borrado
+        self._reemplazos: Mapping[int, Account] = _SIN_CAMBIOS  # Asignadas
+        self._borradas: AbstractSet[int] = frozenset()  # Fuera de su lugar
+        self._al_final: Mapping[int, None] = _SIN_CAMBIOS  # Agregadas, en orden
+
+    def _editable(self) -> None:
+        if self._reemplazos is _SIN_CAMBIOS:
+            self._reemplazos, self._borradas, self._al_final = {}, set(), {}
+
+    def __getitem__(self, codigo) -> Account:
+        cuenta = self._reemplazos.get(codigo)
+        if cuenta is None:
+            cuenta = self._creadas.get(codigo)
+        if cuenta is None:
+            plan = self.plan_cuentas
+            if codigo in self._borradas or codigo not in plan:
+                raise KeyError(codigo)
+            posicion = plan.posicion_por_codigo[codigo]
+            cuenta = Account(
+                name=plan.nombres[posicion],
+                tipo=plan.tipos[posicion],
+                codigo=codigo,
+                agente_id=self.agente_id,
+                ledger=self.ledger,
+            )
+            self._creadas[codigo] = cuenta
+        return cuenta
+
+    def __setitem__(self, codigo, cuenta: Account) -> None:
+        self._editable()
+        if codigo not in self:
+            # Como en un diccionario, una clave nueva va al final
+            self._al_final[codigo] = None
+        self._reemplazos[codigo] = cuenta
+
+    def __delitem__(self, codigo) -> None:
+        if codigo not in self:
+            raise KeyError(codigo)
+        self._editable()
+        self._reemplazos.pop(codigo, None)
+        self._creadas.pop(codigo, None)
+        if codigo in self._al_final:
+            del self._al_final[codigo]
+        else:
+            self._borradas.add(codigo)
 
-inventarios.registrar_transaccion(0, 50)
+    def __contains__(self, codigo) -> bool:
+        return codigo in self._al_final or (
+            codigo in self.plan_cuentas and codigo not in self._borradas
+        )
 
-inventarios.calcular_totales()
+    def __iter__(self) -> Iterator[int]:
+        if self._borradas:
+            yield from (c for c in self.plan_cuentas.codigos if c not in self._borradas)
+        else:
+            yield from self.plan_cuentas.codigos
+        yield from list(self._al_final)
+
+    def __len__(self) -> int:
+        return len(self.plan_cuentas) - len(self._borradas) + len(self._al_final)
+
+    @property
+    def creadas(self) -> int:
+        """Número de cuentas materializadas o asignadas."""
+        return len(self._creadas) + len(self._reemplazos)
+
+    def por_nombre(self, nombre: str) -> Optional[Account]:
+        """Primera cuenta, en el orden del diccionario, con ese nombre."""
+        if not self._reemplazos and not self._borradas:
+            codigo = self.plan_cuentas.codigo(nombre)
+            return None if codigo is None else self[codigo]
+        for codigo in self:
+            cuenta = self._reemplazos.get(codigo)
+            actual = (
+                cuenta.name if cuenta is not None else self.plan_cuentas.nombre(codigo)
+            )
+            if actual == nombre:
+                return self[codigo]
+        return None
 
 
 ### ---------------------- Clase Good ------------------------------
 
+# Contador global de cambios en los insumos de cualquier bien
+_version_insumos = 0
+
+
+def _nueva_version_insumos() -> int:
+    global _version_insumos
+    _version_insumos += 1
+    return _version_insumos
+
+
+def ultima_version_insumos() -> int:
+    """Última versión emitida; si no cambió, ningún bien modificó sus insumos."""
+    return _version_insumos
+
+
+class Insumos(dict):
+    """
+    Diccionario de insumos que registra una versión nueva cada vez que se modifica,
+    para que las caches que dependen de los insumos sepan cuándo invalidarse.
+    """
+
+    __slots__ = ("version",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = _nueva_version_insumos()
+
+    def _modificado(self):
+        self.version = _nueva_version_insumos()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._modificado()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._modificado()
+
+    def __ior__(self, other):
+        result = super().__ior__(other)
+        self._modificado()
+        return result
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._modificado()
+
+    def setdefault(self, key, default=None):
+        result = super().setdefault(key, default)
+        self._modificado()
+        return result
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self._modificado()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._modificado()
+        return result
+
+    def clear(self):
+        super().clear()
+        self._modificado()
+
 
 class Good(ABC):
     """
     Clase abstracta base para los bienes.
     Permite añadir precio, tarifa del IVA, arancel e insumos necesarios para producir el bien.
+
+    El bien es una vista sobre una fila de un CatalogoBienes: precio, iva_rate,
+    tariff y status_iva se leen y escriben en los arreglos del catálogo. Los
+    bienes iguales y las copias comparten la fila hasta que cambia un atributo.
     """
 
+    __slots__ = ("catalogo", "id", "_insumos", "__weakref__", "__dict__")
+
+    # Estado de IVA con el que se registran los bienes de la clase
+    ESTADO_IVA = "gravado"
+
     def __init__(
         self,
         name: str,
         price: float,
         tariff: float,
         insumos: Dict[str, float] = None,
+        catalogo: Optional[CatalogoBienes] = None,
+        iva_rate: float = 0.0,
     ):
         """
         Inicializa un nuevo bien.
 
         :param name: Nombre del bien.
         :param price: Precio base del bien.
-        :param tariff: Arancel aplicado al bien (en porcentaje).
+        :param tariff: Arancel aplicado al bien (como tasa, p. ej. 0.10 para un 10 %).
         :param insumos: Diccionario de insumos necesarios para producir el bien.
                         Las claves son los nombres de otros bienes y los valores son las cantidades requeridas.
+        :param catalogo: Catálogo donde se registra el bien; por defecto el
+                         catálogo compartido.
+        :param iva_rate: Tasa de IVA del bien.
         """
-        self.name = name
-        self.price = price
-        self.tariff = tariff
-        self.insumos = insumos if insumos is not None else {}
+        self.catalogo = catalogo if catalogo is not None else catalogo_por_defecto()
+        self.id = self.catalogo.registrar(
+            name, price, iva_rate, tariff, self.ESTADO_IVA
+        )
+        # Los insumos se crean al primer uso: la mayoría de los bienes no tiene
+        self._insumos = Insumos(insumos) if insumos else None
+
+    def __del__(self):
+        # La fila vuelve al catálogo cuando ningún bien la usa
+        fila = getattr(self, "id", None)
+        if fila is not None:
+            self.catalogo.liberar(fila)
+
+    @property
+    def name(self) -> str:
+        return self.catalogo.nombres[self.catalogo._sku[self.id]]
+
+    @name.setter
+    def name(self, name: str):
+        # Otro nombre es otro sku: los inventarios lo ven como otro bien
+        self.id = self.catalogo.modificar(self.id, nombre=name)
+
+    @property
+    def sku(self) -> int:
+        """Id del nombre del bien en el catálogo; clave de los inventarios."""
+        return int(self.catalogo._sku[self.id])
+
+    @property
+    def price(self) -> float:
+        return float(self.catalogo._precio[self.id])
+
+    @price.setter
+    def price(self, price: float):
+        self.id = self.catalogo.modificar(self.id, precio=price)
+
+    @property
+    def iva_rate(self) -> float:
+        return float(self.catalogo._iva_rate[self.id])
+
+    @iva_rate.setter
+    def iva_rate(self, iva_rate: float):
+        self.id = self.catalogo.modificar(self.id, iva_rate=iva_rate)
+
+    @property
+    def tariff(self) -> float:
+        return float(self.catalogo._tariff[self.id])
+
+    @tariff.setter
+    def tariff(self, tariff: float):
+        self.id = self.catalogo.modificar(self.id, tariff=tariff)
+
+    @property
+    def status_iva(self) -> str:
+        return ESTADOS_IVA[self.catalogo._estado[self.id]]
+
+    @status_iva.setter
+    def status_iva(self, status_iva: str):
+        if status_iva not in ESTADOS_IVA:
+            raise ValueError(f"Estado de IVA inválido: {status_iva!r}.")
+        self.id = self.catalogo.modificar(self.id, estado=status_iva)
+
+    @property
+    def insumos(self) -> Insumos:
+        if self._insumos is None:
+            self._insumos = Insumos()
+        return self._insumos
+
+    @insumos.setter
+    def insumos(self, insumos: Dict[str, float]):
+        self._insumos = Insumos(insumos)
+
+    @property
+    def version_insumos(self) -> int:
+        return self._insumos.version if self._insumos is not None else 0
+
+    def __copy__(self):
+        # La copia comparte la fila del original; al cambiar un atributo de
+        # cualquiera de los dos, ese bien pasa a una fila propia
+        copia = object.__new__(type(self))
+        copia.catalogo = self.catalogo
+        copia.id = self.catalogo.retener(self.id)
+        copia._insumos = Insumos(self._insumos) if self._insumos else None
+        if getattr(self, "__dict__", None):
+            copia.__dict__.update(self.__dict__)
+        return copia
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def __reduce__(self):
+        # Al deserializar (p. ej. en otro proceso) el bien se registra en el
+        # catálogo por defecto de ese proceso
+        return (
+            _reconstruir_bien,
+            (
+                type(self),
+                self.name,
+                self.price,
+                self.iva_rate,
+                self.tariff,
+                self.status_iva,
+                dict(self._insumos) if self._insumos else None,
+            ),
+            self.__dict__ or None,
+        )
+
+
+def _reconstruir_bien(cls, name, price, iva_rate, tariff, status_iva, insumos):
+    bien = object.__new__(cls)
+    bien.catalogo = catalogo_por_defecto()
+    bien.id = bien.catalogo.registrar(name, price, iva_rate, tariff, status_iva)
+    bien._insumos = Insumos(insumos) if insumos else None
+    return bien
 
 
 class BienGravado(Good):
@@ -126,6 +462,8 @@ class BienGravado(Good):
     Clase para bienes gravados.
     """
 
+    __slots__ = ()
+
     def __init__(
         self,
         name: str,
@@ -133,10 +471,9 @@ class BienGravado(Good):
         iva_rate: float,
         tariff: float,
         insumos: Dict[str, float] = None,
+        catalogo: Optional[CatalogoBienes] = None,
     ):
-        super().__init__(name, price, tariff, insumos)
-        self.iva_rate = iva_rate
-        self.status_iva = "gravado"
+        super().__init__(name, price, tariff, insumos, catalogo, iva_rate)
 
 
 class BienExento(Good):
@@ -144,16 +481,18 @@ class BienExento(Good):
     Clase para bienes exentos.
     """
 
+    __slots__ = ()
+    ESTADO_IVA = "exento"  # Un bien exento tiene tasa de IVA 0%
+
     def __init__(
         self,
         name: str,
         price: float,
         tariff: float,
         insumos: Dict[str, float] = None,
+        catalogo: Optional[CatalogoBienes] = None,
     ):
-        super().__init__(name, price, tariff, insumos)
-        self.iva_rate = 0  # Un bien exento tiene tasa de IVA 0%
-        self.status_iva = "exento"
+        super().__init__(name, price, tariff, insumos, catalogo)
 
 
 class BienExcluido(Good):
@@ -161,58 +500,88 @@ class BienExcluido(Good):
     Clase para bienes excluidos.
     """
 
+    __slots__ = ()
+    ESTADO_IVA = "excluido"  # Un bien excluido no está gravado con IVA
+
     def __init__(
         self,
         name: str,
         price: float,
         insumos: Dict[str, float] = None,
+        catalogo: Optional[CatalogoBienes] = None,
     ):
-        super().__init__(name, price, tariff=0, insumos=insumos)
-        self.iva_rate = 0  # Un bien excluido no está gravado con IVA
-        self.status_iva = "excluido"
+        super().__init__(name, price, tariff=0, insumos=insumos, catalogo=catalogo)
 
 
 # ---------------------- Clase Inventario -------------------------
 
 
 class Lote:
-    def __init__(self, good: Good, quantity: float, unit_cost: float):
-        self.good = good
+    __slots__ = ("good_id", "quantity", "unit_cost")
+
+    def __init__(self, good_id: int, quantity: float, unit_cost: float):
+        self.good_id = good_id
         self.quantity = quantity
         self.unit_cost = unit_cost
 
 
 class Inventory:
-    def __init__(self):
-        # Diccionario para almacenar listas de lotes por bien
+    def __init__(self, catalogo: Optional[CatalogoBienes] = None):
+        # Los bienes se identifican por su sku en el catálogo; los métodos
+        # aceptan el nombre o el sku
+        self.catalogo = catalogo if catalogo is not None else catalogo_por_defecto()
+
+        # Diccionario para almacenar los lotes por sku. Cada bien usa un deque
+        # para retirar lotes en O(1) por el inicio (FIFO) o por el final (LIFO)
         self.lotes = {}
 
         # Diccionario para almacenar el método de costeo por bien
         self.costing_methods = {}
 
+        # Agregados por bien que se actualizan con cada entrada y salida, para no
+        # recorrer los lotes al consultar la cantidad o el costo promedio
+        self._total_quantity = {}
+        self._total_value = {}
+
+    def id_bien(self, good_name) -> Optional[int]:
+        """Sku de un bien dado por nombre (None si no está en el catálogo) o sku."""
+        if isinstance(good_name, str):
+            return self.catalogo.sku(good_name)
+        return good_name
+
     def set_costing_method(self, good_name: str, method: str):
         if method not in ["FIFO", "LIFO", "WeightedAverage"]:
             raise ValueError(
                 "Método de costeo inválido. Debe ser 'FIFO', 'LIFO' o 'WeightedAverage'."
             )
+        if isinstance(good_name, str):
+            good_name = self.catalogo.internar(good_name)
         self.costing_methods[good_name] = method
 
     def add_lote(self, good: Good, quantity: float, unit_cost: float):
-        if good.name not in self.lotes:
-            self.lotes[good.name] = []
+        if good.catalogo is self.catalogo:
+            sku = good.sku
+        else:
+            sku = self.catalogo.internar(good.name)
+        if sku not in self.lotes:
+            self.lotes[sku] = deque()
+            self._total_quantity[sku] = 0.0
+            self._total_value[sku] = 0.0
 
         # Agregar un nuevo lote al inventario
-        self.lotes[good.name].append(Lote(good, quantity, unit_cost))
+        self.lotes[sku].append(Lote(sku, quantity, unit_cost))
+        self._total_quantity[sku] += quantity
+        self._total_value[sku] += quantity * unit_cost
 
     def remove_lote(self, good_name: str, quantity: float):
+        nombre, good_name = good_name, self.id_bien(good_name)
         if good_name not in self.lotes or not self.lotes[good_name]:
-            raise ValueError(
-                f"No hay suficiente inventario de {good_name} para retirar."
-            )
+            raise ValueError(f"No hay suficiente inventario de {nombre} para retirar.")
 
         method = self.costing_methods.get(good_name, "FIFO")
         total_cost = 0.0
         quantity_to_remove = quantity
+        removed_value = 0.0
 
         if method == "FIFO":
             while quantity_to_remove > 0 and self.lotes[good_name]:
@@ -220,7 +589,7 @@ class Inventory:
                 if first_lote.quantity <= quantity_to_remove:
                     total_cost += first_lote.quantity * first_lote.unit_cost
                     quantity_to_remove -= first_lote.quantity
-                    self.lotes[good_name].pop(0)
+                    self.lotes[good_name].popleft()
                 else:
                     total_cost += quantity_to_remove * first_lote.unit_cost
                     first_lote.quantity -= quantity_to_remove
@@ -239,35 +608,119 @@ class Inventory:
                     quantity_to_remove = 0
 
         elif method == "WeightedAverage":
-            total_quantity = sum(lote.quantity for lote in self.lotes[good_name])
+            total_quantity = self._total_quantity[good_name]
             if total_quantity < quantity:
                 raise ValueError(
-                    f"No hay suficiente inventario de {good_name} para retirar."
+                    f"No hay suficiente inventario de {nombre} para retirar."
                 )
 
-            average_cost = (
-                sum(lote.quantity * lote.unit_cost for lote in self.lotes[good_name])
-                / total_quantity
-            )
+            average_cost = self._total_value[good_name] / total_quantity
             total_cost = quantity * average_cost
-            self._reduce_inventory(good_name, quantity)
+            removed_value = self._reduce_inventory(good_name, quantity)
+            quantity_to_remove = 0
+
+        # Los agregados se reducen por el valor de los lotes efectivamente retirados
+        if method != "WeightedAverage":
+            removed_value = total_cost
+        self._update_totals(good_name, quantity - quantity_to_remove, removed_value)
 
         return total_cost
 
-    def _reduce_inventory(self, good_name: str, quantity: float):
-        """Método auxiliar para reducir el inventario sin calcular costos."""
+    def _reduce_inventory(self, good_name: str, quantity: float) -> float:
+        """
+        Método auxiliar para reducir el inventario sin calcular costos de venta.
+
+        :return: El valor, a costo de cada lote, de las unidades retiradas.
+        """
         quantity_to_remove = quantity
+        removed_value = 0.0
         while quantity_to_remove > 0 and self.lotes[good_name]:
             first_lote = self.lotes[good_name][0]
             if first_lote.quantity <= quantity_to_remove:
+                removed_value += first_lote.quantity * first_lote.unit_cost
                 quantity_to_remove -= first_lote.quantity
-                self.lotes[good_name].pop(0)
+                self.lotes[good_name].popleft()
             else:
+                removed_value += quantity_to_remove * first_lote.unit_cost
                 first_lote.quantity -= quantity_to_remove
                 quantity_to_remove = 0
+        return removed_value
+
+    def _update_totals(self, good_name: str, quantity: float, value: float):
+        if self.lotes[good_name]:
+            self._total_quantity[good_name] -= quantity
+            self._total_value[good_name] -= value
+        else:
+            # Sin lotes los agregados vuelven a cero exacto y no arrastran redondeos
+            self._total_quantity[good_name] = 0.0
+            self._total_value[good_name] = 0.0
 
     def get_total_quantity(self, good_name: str) -> float:
-        return sum(lote.quantity for lote in self.lotes.get(good_name, []))
+        return self._total_quantity.get(self.id_bien(good_name), 0.0)
+
+    def get_total_value(self, good_name: str) -> float:
+        return self._total_value.get(self.id_bien(good_name), 0.0)
+
+    def get_average_cost(self, good_name: str) -> float:
+        good_name = self.id_bien(good_name)
+        total_quantity = self._total_quantity.get(good_name, 0.0)
+        if total_quantity <= 0:
+            return 0.0
+        return self._total_value[good_name] / total_quantity
+
+    def instantanea(self) -> Dict:
+        """
+        Copia compacta del inventario: por nombre del bien, arreglos de
+        cantidades y costos unitarios de los lotes (de solo lectura) y los
+        agregados.
+        """
+        nombres = self.catalogo.nombres
+        lotes = {}
+        for sku, cola in self.lotes.items():
+            cantidades = np.array([lote.quantity for lote in cola], dtype=np.float64)
+            costos = np.array([lote.unit_cost for lote in cola], dtype=np.float64)
+            cantidades.flags.writeable = False
+            costos.flags.writeable = False
+            lotes[nombres[sku]] = (
+                cantidades,
+                costos,
+                self._total_quantity[sku],
+                self._total_value[sku],
+            )
+        metodos = {nombres[sku]: metodo for sku, metodo in self.costing_methods.items()}
+        return {"metodos": metodos, "lotes": lotes}
+
+    @classmethod
+    def desde_instantanea(
+        cls,
+        instantanea: Dict,
+        bienes: Optional[Dict[str, Good]] = None,
+        catalogo: Optional[CatalogoBienes] = None,
+    ):
+        """
+        Reconstruye un inventario a partir de instantanea().
+
+        :param bienes: Bienes por nombre; si se dan, el inventario usa su catálogo.
+        :param catalogo: Catálogo del inventario si no se dan bienes.
+        """
+        if catalogo is None and bienes:
+            catalogo = next(iter(bienes.values())).catalogo
+        inventario = cls(catalogo)
+        internar = inventario.catalogo.internar
+        inventario.costing_methods = {
+            internar(nombre): metodo
+            for nombre, metodo in instantanea["metodos"].items()
+        }
+        for good_name, datos in instantanea["lotes"].items():
+            cantidades, costos, total_quantity, total_value = datos
+            sku = internar(good_name)
+            inventario.lotes[sku] = deque(
+                Lote(sku, cantidad, costo)
+                for cantidad, costo in zip(cantidades.tolist(), costos.tolist())
+            )
+            inventario._total_quantity[sku] = total_quantity
+            inventario._total_value[sku] = total_value
+        return inventario
 
 
 # ---------------------- Clase Agent ------------------------------
@@ -284,6 +737,8 @@ class Agent(ABC):
         plantillas_cuentas: Dict,
         bienes_vendidos: List,
         bienes_producidos: List,
+        ledger: Optional[Ledger] = None,
+        agente_id: Optional[int] = None,
     ):
         """
         Inicializa una nueva instancia de Agent.
@@ -294,19 +749,27 @@ class Agent(ABC):
 
         :param bienes_vendidos: Una lista de bienes vendidos por el agente.
         :param bienes_producidos: Una lista de bienes producidos por el agente.
+        :param ledger: Libro mayor donde se registran los movimientos de las cuentas.
+                       Si es None se usa el libro mayor por defecto.
+        :param agente_id: Identificador del agente en el libro mayor. Si es None se
+                          reserva uno nuevo; si se da, el agente es una vista sobre
+                          las cuentas ya registradas con ese identificador.
 
         """
 
         self.nombre = nombre
-        self.cuentas = {}
         self.type = self.get_type()  # Establece el tipo según la subclase
 
-        # Inicializar las cuentas contables del agente
-        for codigo, plantilla in plantillas_cuentas.items():
-            cuenta_nombre = plantilla["cuenta"]
-            codigo_tipo_cuenta = plantilla["codigo_tipo_cuenta"]
-            # Creamos una nueva instancia de Account para cada cuenta del agente
-            self.cuentas[codigo] = Account(name=cuenta_nombre, tipo=codigo_tipo_cuenta)
+        self.ledger = ledger if ledger is not None else ledger_por_defecto()
+        self.agente_id = (
+            agente_id if agente_id is not None else self.ledger.nuevo_agente(self.type)
+        )
+
+        # Índice del plan de cuentas compartido por todos los agentes
+        self.plan_cuentas = PlanCuentas.desde_plantillas(plantillas_cuentas)
+
+        # Cuentas contables del agente: se crean cuando se consultan por primera vez
+        self.cuentas = CuentasAgente(self.plan_cuentas, self.agente_id, self.ledger)
 
         self.bienes_vendidos = bienes_vendidos if bienes_vendidos else []
         self.bienes_producidos = bienes_producidos if bienes_producidos else []
@@ -370,10 +833,7 @@ class Agent(ABC):
         :param account_name: El nombre de la cuenta a buscar.
         :return: La cuenta encontrada o None si no existe.
         """
-        for cuenta in self.cuentas.values():
-            if cuenta.name == account_name:
-                return cuenta
-        return None
+        return self.cuentas.por_nombre(account_name)
 
     def get_account_by_code(self, account_code: str) -> Optional["Account"]:
         """
@@ -424,6 +884,7 @@ class Transaction:
         temporal_export: int,
         national_VAT: int = 0,
         iva_status_transaccion: str = "gravado",
+        price: Optional[float] = None,
     ):
         """
         Inicializa una nueva transacci n.
@@ -435,6 +896,7 @@ class Transaction:
         :param temporal_export: Si la transacci n es de exportaci n temporal (0 o 1).
         :param national_VAT: Si nacionalizaria el IVA usando VAN  (0 o 1).
         :param iva_status_transaccion: El estado de IVA de la transacci n ("gravado", "exento", "excluido").
+        :param price: Precio unitario pactado; si es None se usa el precio del bien.
         :raises ValueError: Si el valor de 'temporal_export' o 'national_VAT' no es 0 o 1.
         """
         self.seller = seller
@@ -454,6 +916,12 @@ class Transaction:
             self.national_VAT = bool(self.national_VAT)
 
         self.iva_status_transaccion = iva_status_transaccion
+        self.price = price
+
+    @property
+    def precio_unitario(self) -> float:
+        """Precio unitario de la transacción: el pactado o el del bien."""
+        return self.good.price if self.price is None else self.price
 
 
 ### --------------------- Clase Production ------------------------------
@@ -478,5 +946,14 @@ class Production:
         :param good: El bien que se est  produciendo.
         :param amount_good: La cantidad del bien que se va a producir.
         :param inputs: Un diccionario con los insumos necesarios para producir el bien.
-                        Las claves son los nombres de los insumos y los valores son las cantidades requeridas.
+                        Las claves son los nombres de los insumos y los valores son las cantidades requeridas
+                        para toda la orden (no por unidad).
+        :raises ValueError: Si la cantidad a producir no es positiva.
         """
+        if amount_good <= 0:
+            raise ValueError("La cantidad a producir debe ser positiva.")
+
+        self.producer = producer
+        self.good = good
+        self.amount_good = amount_good
+        self.inputs = inputs if inputs is not None else {}
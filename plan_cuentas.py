@@ -0,0 +1,127 @@
+### Índice compartido e inmutable del plan de cuentas (PUC)
+
+"""
+
+Todos los agentes se construyen con las mismas plantillas_cuentas, así que el
+índice se construye una sola vez por contenido de las plantillas y lo comparten
+todos los agentes. La cache se indexa por el contenido (código, tipo y nombre de
+cada cuenta, en orden) y no por la identidad del diccionario: dos cargas del
+mismo Excel comparten el índice, un diccionario modificado recibe uno nuevo y
+los índices que ningún agente usa se liberan.
+
+codigo_por_nombre: Nombre de la cuenta -> código. Si dos cuentas comparten
+nombre se conserva la primera, como hacía la búsqueda lineal.
+
+posicion_por_codigo: Código -> posición de la cuenta en el plan.
+
+codigos_con_prefijo: Prefijo PUC -> códigos, para agregar por clase ("1"),
+grupo ("14") o cuenta ("1435").
+
+"""
+
+import weakref
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+# Contenido de las plantillas -> PlanCuentas, mientras algún agente lo use
+_planes: "weakref.WeakValueDictionary[Tuple, PlanCuentas]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+# Copia de las últimas plantillas vistas, sus códigos en orden y su índice: los
+# agentes se construyen con las mismas plantillas, y compararlas con la copia es
+# más barato que calcular la clave. La igualdad de diccionarios ignora el orden,
+# así que también se comparan los códigos
+_ultimo: Optional[Tuple[Dict, Tuple, "PlanCuentas"]] = None
+
+
+def _contenido(plantillas_cuentas: Dict) -> Tuple:
+    return tuple(
+        (codigo, plantilla["codigo_tipo_cuenta"], plantilla["cuenta"])
+        for codigo, plantilla in plantillas_cuentas.items()
+    )
+
+
+class PlanCuentas:
+    """
+    Índice inmutable de un plan de cuentas.
+    """
+
+    def __init__(self, plantillas_cuentas: Dict):
+        """
+        :param plantillas_cuentas: Diccionario {codigo: {"codigo_tipo_cuenta": ...,
+                                   "cuenta": ...}} como el de cargar_plantillas_cuentas.
+        """
+        self.codigos: Tuple[int, ...] = tuple(plantillas_cuentas)
+        self.nombres: Tuple[str, ...] = tuple(
+            plantilla["cuenta"] for plantilla in plantillas_cuentas.values()
+        )
+        self.tipos: Tuple[int, ...] = tuple(
+            plantilla["codigo_tipo_cuenta"] for plantilla in plantillas_cuentas.values()
+        )
+
+        codigo_por_nombre = {}
+        for codigo, nombre in zip(self.codigos, self.nombres):
+            codigo_por_nombre.setdefault(nombre, codigo)
+
+        prefijos: Dict[str, list] = {}
+        for codigo in self.codigos:
+            texto = str(codigo)
+            for largo in range(1, len(texto) + 1):
+                prefijos.setdefault(texto[:largo], []).append(codigo)
+
+        self.codigo_por_nombre: Mapping[str, int] = MappingProxyType(codigo_por_nombre)
+        self.posicion_por_codigo: Mapping[int, int] = MappingProxyType(
+            {codigo: i for i, codigo in enumerate(self.codigos)}
+        )
+        self._prefijos: Mapping[str, Tuple[int, ...]] = MappingProxyType(
+            {prefijo: tuple(codigos) for prefijo, codigos in prefijos.items()}
+        )
+
+    @classmethod
+    def desde_plantillas(cls, plantillas_cuentas: Dict) -> "PlanCuentas":
+        """
+        Devuelve el índice compartido de unas plantillas, construyéndolo la
+        primera vez que se ve su contenido.
+        """
+        global _ultimo
+        if (
+            _ultimo is not None
+            and _ultimo[0] == plantillas_cuentas
+            and _ultimo[1] == tuple(plantillas_cuentas)
+        ):
+            return _ultimo[2]
+        clave = _contenido(plantillas_cuentas)
+        plan = _planes.get(clave)
+        if plan is None:
+            plan = _planes[clave] = cls(plantillas_cuentas)
+        copia = {
+            codigo: dict(plantilla) for codigo, plantilla in plantillas_cuentas.items()
+        }
+        _ultimo = (copia, tuple(copia), plan)
+        return plan
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def __contains__(self, codigo) -> bool:
+        return codigo in self.posicion_por_codigo
+
+    def codigo(self, nombre: str) -> Optional[int]:
+        return self.codigo_por_nombre.get(nombre)
+
+    def posicion(self, codigo: int) -> Optional[int]:
+        return self.posicion_por_codigo.get(codigo)
+
+    def nombre(self, codigo: int) -> str:
+        return self.nombres[self.posicion_por_codigo[codigo]]
+
+    def tipo(self, codigo: int) -> int:
+        return self.tipos[self.posicion_por_codigo[codigo]]
+
+    def codigos_con_prefijo(self, prefijo: Union[int, str]) -> Tuple[int, ...]:
+        """
+        Códigos cuyo número empieza por el prefijo, p. ej. 14 para los inventarios.
+        """
+        return self._prefijos.get(str(prefijo), ())
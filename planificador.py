@@ -0,0 +1,447 @@
+### Planificador de periodos: actividad de los agentes en paralelo y determinista
+
+"""
+
+Cada periodo se compone de fases (p. ej. producción y luego comercio) y cada
+fase de actividades: Transaction y Production. La referencia de una fase es su
+corrida serial: los tramos consecutivos del mismo tipo, en el orden original,
+ejecutados con LiquidadorTransacciones.liquidar (lotes de tamano_lote) y con
+MotorProduccion.ejecutar (lotes de agrupar_ordenes). A cada lote de esa corrida
+se le llama paso. PlanificadorPeriodos ejecuta una fase así:
+
+1. Agrupa a los agentes que se relacionan en la fase (componentes conexas:
+vendedor y comprador de una transacción quedan en el mismo grupo) y reparte los
+grupos, en el orden de su primera actividad, en paquetes de tamaño fijo. Cada
+agente pertenece a un solo paquete. Si todos los agentes quedan conectados hay
+un solo paquete y la fase corre en el proceso actual.
+
+2. Cada paquete mueve los inventarios de su parte de cada paso
+(mover_inventarios y mover_ordenes), en el orden de los pasos. Un paquete solo
+toca los inventarios de sus agentes y los ve en el mismo orden que la corrida
+serial, así que los costos salen iguales. Con procesos > 1 los paquetes se
+reparten entre procesos hijos creados con fork, que heredan el estado de la
+fase sin copiarlo; cada hijo devuelve los costos y el estado final de los
+inventarios (agente, bien) que tocó, y el proceso principal lo adopta. Mover
+inventarios es Python puro, así que un pool de hilos no lo acelera.
+
+3. En el proceso principal se recorren los pasos en orden y se contabiliza lo
+movido (contabilizar_lote y contabilizar_ordenes, vectorizados), que también
+lo registra en la red y en el motor de impuestos.
+
+Sin errores, el libro mayor (movimientos, totales y lo que reciben los
+suscriptores), los inventarios, la red y los impuestos son idénticos bit a bit
+a los de la corrida serial, con cualquier número de procesos. Si algo falla,
+cada paquete se detiene en su primer error, se contabiliza lo que sí se movió y
+se lanza el primer error en el orden de los pasos; a diferencia de la corrida
+serial, los paquetes sin error completan la fase.
+
+El benchmark "planificador" de benchmarks/suite.py compara uno y varios procesos.
+
+Durante una fase las consultas de saldos ven el libro mayor del inicio de la
+fase.
+
+"""
+
+import multiprocessing
+from collections import deque
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from accounting_motor import MotorContable
+from model import Agent, Lote, Production, Transaction
+from produccion import MotorProduccion, agrupar_ordenes
+from transacciones import LiquidadorTransacciones, montos_transacciones
+
+# Fase en curso: los procesos hijos la heredan al crearse con fork
+_fase: Optional[tuple] = None
+
+
+def _agentes(actividad) -> tuple:
+    if isinstance(actividad, Transaction):
+        return actividad.seller, actividad.buyer
+    if isinstance(actividad, Production):
+        return (actividad.producer,)
+    raise ValueError(
+        f"Actividad desconocida: {type(actividad).__name__}. Debe ser Transaction "
+        "o Production."
+    )
+
+
+def _componentes(actividades: Sequence) -> np.ndarray:
+    """
+    Grupo de cada actividad: el índice (en orden de aparición) del primer agente
+    de su componente conexa.
+    """
+    indices: Dict[int, int] = {}
+    primeros = np.empty(len(actividades), dtype=np.intp)
+    ultimos = np.empty(len(actividades), dtype=np.intp)
+    for k, actividad in enumerate(actividades):
+        agentes = _agentes(actividad)
+        primeros[k] = indices.setdefault(id(agentes[0]), len(indices))
+        ultimos[k] = indices.setdefault(id(agentes[-1]), len(indices))
+
+    # Union-find vectorizado: cada raíz se cuelga de la menor raíz vecina y los
+    # caminos se acortan hasta que todos apuntan a su raíz
+    raices = np.arange(len(indices))
+    while True:
+        a, b = raices[primeros], raices[ultimos]
+        distintas = a != b
+        if not distintas.any():
+            return a
+        a, b = a[distintas], b[distintas]
+        np.minimum.at(raices, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            siguientes = raices[raices]
+            if np.array_equal(siguientes, raices):
+                break
+            raices = siguientes
+
+
+def _grupo_de(actividades: Sequence) -> Tuple[np.ndarray, int]:
+    """Grupo de cada actividad, numerados en el orden de su primera actividad."""
+    raices = _componentes(actividades)
+    # Las raíces son el primer agente visto, así que su orden es el de aparición
+    unicas, grupo = np.unique(raices, return_inverse=True)
+    return grupo.ravel(), len(unicas)
+
+
+def agrupar(actividades: Sequence) -> List[List[int]]:
+    """
+    Grupos independientes de una fase: actividades que no comparten agentes.
+
+    :return: Por grupo, las posiciones de sus actividades en orden; los grupos
+             van en el orden de su primera actividad.
+    """
+    grupo, n_grupos = _grupo_de(actividades)
+    orden = np.argsort(grupo, kind="stable")
+    cortes = np.cumsum(np.bincount(grupo, minlength=n_grupos))[:-1]
+    return [posiciones.tolist() for posiciones in np.split(orden, cortes)]
+
+
+def _estado_inventarios(tocados: Dict[Tuple[int, str], Agent]) -> tuple:
+    """
+    Lotes y agregados de cada (agente, bien) tocado, para enviarlos al padre: los
+    lotes de todos van concatenados, con el número de lotes de cada uno.
+    """
+    claves, longitudes, cantidades, costos, totales = [], [], [], [], []
+    for (indice, nombre), agente in tocados.items():
+        inventario = agente.inventory
+        sku = inventario.id_bien(nombre)
+        if sku is None or sku not in inventario.lotes:
+            continue
+        cola = inventario.lotes[sku]
+        claves.append((indice, nombre))
+        longitudes.append(len(cola))
+        for lote in cola:
+            cantidades.append(lote.quantity)
+            costos.append(lote.unit_cost)
+        totales.append((inventario._total_quantity[sku], inventario._total_value[sku]))
+    return (
+        claves,
+        np.array(longitudes, dtype=np.intp),
+        np.array(cantidades, dtype=np.float64),
+        np.array(costos, dtype=np.float64),
+        np.array(totales, dtype=np.float64).reshape(-1, 2),
+    )
+
+
+def _adoptar_inventarios(agentes: List[Agent], estado: tuple) -> None:
+    claves, longitudes, cantidades, costos, totales = estado
+    cortes = np.cumsum(longitudes).tolist()
+    cantidades, costos, totales = cantidades.tolist(), costos.tolist(), totales.tolist()
+    inicio = 0
+    for (indice, nombre), fin, (cantidad, valor) in zip(claves, cortes, totales):
+        inventario = agentes[indice].inventory
+        sku = inventario.catalogo.internar(nombre)
+        inventario.lotes[sku] = deque(
+            map(Lote, repeat(sku), cantidades[inicio:fin], costos[inicio:fin])
+        )
+        inventario._total_quantity[sku] = cantidad
+        inventario._total_value[sku] = valor
+        inicio = fin
+
+
+def _mover_en_proceso(trabajador: int) -> Tuple[Dict[int, Dict], tuple]:
+    # Corre en un proceso hijo, sobre la fase heredada al bifurcarse
+    planificador, pasos, tareas, indices = _fase
+    resultados = {}
+    tocados: Dict[Tuple[int, str], Agent] = {}
+    for p in range(trabajador, len(tareas), planificador.procesos):
+        resultados[p] = planificador._mover_paquete(tareas[p], pasos)
+        for k, suyas in tareas[p]:
+            lote, montos = pasos[k]
+            if montos is None:
+                productor = lote[0].producer
+                for nombre in {n for orden in lote for n in orden.inputs} | {
+                    lote[0].good.name
+                }:
+                    tocados[indices[id(productor)], nombre] = productor
+                continue
+            for j in suyas:
+                transaccion = lote[j]
+                nombre = transaccion.good.name
+                for agente in (transaccion.seller, transaccion.buyer):
+                    tocados[indices[id(agente)], nombre] = agente
+    return resultados, _estado_inventarios(tocados)
+
+
+class PlanificadorPeriodos:
+    """
+    Clase para ejecutar la actividad de cada periodo en grupos independientes.
+    """
+
+    def __init__(
+        self,
+        motor: MotorContable,
+        procesos: int = 1,
+        actividades_por_paquete: int = 1_000,
+        tamano_lote: int = 10_000,
+        costo_indirecto: float = 0.0,
+        red=None,
+        impuestos=None,
+    ):
+        """
+        :param motor: Motor contable con el libro mayor de los agentes.
+        :param procesos: Procesos que mueven los inventarios; con 1 todo corre
+                         en el proceso actual. Con más de 1 requiere fork.
+        :param actividades_por_paquete: Actividades mínimas por paquete. Junta
+                                        grupos pequeños para no repartir tareas
+                                        diminutas; no cambia el resultado.
+        :param tamano_lote: Transacciones por lote de liquidación.
+        :param costo_indirecto: Costo indirecto de cada orden de producción.
+        :param red: RedComercial donde se registran las transacciones, como en
+                    LiquidadorTransacciones.
+        :param impuestos: MotorImpuestos donde se registran las transacciones,
+                          como en LiquidadorTransacciones.
+        """
+        if procesos < 1:
+            raise ValueError("El número de procesos debe ser positivo.")
+        if procesos > 1 and "fork" not in multiprocessing.get_all_start_methods():
+            raise ValueError(
+                "Varios procesos requieren fork, que no existe en esta plataforma."
+            )
+        self.motor = motor
+        self.procesos = procesos
+        self.actividades_por_paquete = actividades_por_paquete
+        self.tamano_lote = tamano_lote
+        self.costo_indirecto = costo_indirecto
+        self.liquidador = LiquidadorTransacciones(motor, tamano_lote, red, impuestos)
+        self.produccion = MotorProduccion(motor)
+
+    @property
+    def ledger(self):
+        return self.motor.ledger
+
+    def _paquetes(self, actividades: Sequence) -> Tuple[int, np.ndarray, int]:
+        """
+        :return: Número de grupos, paquete de cada actividad y número de paquetes.
+        """
+        grupo, n_grupos = _grupo_de(actividades)
+        paquete_grupo = np.empty(n_grupos, dtype=np.intp)
+        paquete, actual = 0, 0
+        for g, tamano in enumerate(np.bincount(grupo, minlength=n_grupos).tolist()):
+            paquete_grupo[g] = paquete
+            actual += tamano
+            if actual >= self.actividades_por_paquete:
+                paquete, actual = paquete + 1, 0
+        return n_grupos, paquete_grupo[grupo], paquete + (actual > 0)
+
+    def _pasos(self, actividades: Sequence) -> List[Tuple[bool, np.ndarray]]:
+        """
+        Pasos de la corrida serial: (es_produccion, posiciones de sus actividades).
+        """
+        pasos: List[Tuple[bool, np.ndarray]] = []
+        inicio = 0
+        while inicio < len(actividades):
+            es_produccion = isinstance(actividades[inicio], Production)
+            fin = inicio
+            while (
+                fin < len(actividades)
+                and isinstance(actividades[fin], Production) == es_produccion
+            ):
+                fin += 1
+            if es_produccion:
+                # agrupar_ordenes devuelve las órdenes; se vuelve a sus posiciones
+                posiciones: Dict[int, deque] = {}
+                for i in range(inicio, fin):
+                    posiciones.setdefault(id(actividades[i]), deque()).append(i)
+                for ordenes in agrupar_ordenes(actividades[inicio:fin]):
+                    pasos.append(
+                        (
+                            True,
+                            np.array(
+                                [posiciones[id(orden)].popleft() for orden in ordenes]
+                            ),
+                        )
+                    )
+            else:
+                for i in range(inicio, fin, self.tamano_lote):
+                    pasos.append((False, np.arange(i, min(i + self.tamano_lote, fin))))
+            inicio = fin
+        return pasos
+
+    def _mover_paquete(self, tareas: List[Tuple[int, List[int]]], pasos) -> Dict:
+        """
+        Mueve los inventarios de un paquete, paso por paso.
+
+        :param tareas: (paso, posiciones del paquete dentro del paso) en orden.
+        :param pasos: Por paso, sus actividades y, si son transacciones, sus montos.
+        :return: Lo movido en cada paso y el primer error como (paso, posición,
+                 error), o None.
+        """
+        movido: Dict[int, Tuple] = {}
+        for k, locales in tareas:
+            actividades, montos = pasos[k]
+            if montos is None:
+                try:
+                    movido[k] = self.produccion.mover_ordenes(
+                        actividades, self.costo_indirecto
+                    )
+                except ValueError as error:
+                    return {"movido": movido, "error": (k, 0, error)}
+            else:
+                costos, n, error = self.liquidador.mover_inventarios(
+                    actividades, montos, locales
+                )
+                movidas = np.array(locales[:n], dtype=np.intp)
+                movido[k] = (movidas, costos[movidas])
+                if error is not None:
+                    return {"movido": movido, "error": (k, locales[n], error)}
+        return {"movido": movido, "error": None}
+
+    def _mover(self, actividades: List, pasos, tareas) -> List[Dict]:
+        trabajadores = min(self.procesos, len(tareas))
+        if trabajadores <= 1:
+            return [self._mover_paquete(suyas, pasos) for suyas in tareas]
+
+        agentes: List[Agent] = []
+        indices: Dict[int, int] = {}
+        for actividad in actividades:
+            for agente in _agentes(actividad):
+                if id(agente) not in indices:
+                    indices[id(agente)] = len(agentes)
+                    agentes.append(agente)
+
+        global _fase
+        _fase = (self, pasos, tareas, indices)
+        try:
+            with multiprocessing.get_context("fork").Pool(trabajadores) as pool:
+                salidas = pool.map(_mover_en_proceso, range(trabajadores))
+        finally:
+            _fase = None
+
+        resultados: List[Optional[Dict]] = [None] * len(tareas)
+        for por_paquete, estado in salidas:
+            for p, resultado in por_paquete.items():
+                resultados[p] = resultado
+            _adoptar_inventarios(agentes, estado)
+        return resultados
+
+    def ejecutar_fase(self, actividades: Iterable) -> Dict:
+        """
+        Ejecuta las actividades de una fase por grupos independientes.
+
+        :param actividades: Transaction y Production de la fase.
+        :return: Resumen con grupos, paquetes, transacciones y producciones.
+        :raises ValueError: Si algún agente no usa el libro mayor del motor (antes
+                            de tocar nada), o el primer error en el orden de los
+                            pasos. Lo que cada paquete movió antes de su primer
+                            error queda contabilizado, igual con cualquier número
+                            de procesos.
+        """
+        actividades = list(actividades)
+        for actividad in actividades:
+            for agente in _agentes(actividad):
+                if agente.ledger is not self.ledger:
+                    raise ValueError(
+                        f"El agente {agente.nombre} no usa el libro mayor del motor."
+                    )
+        resumen = {"grupos": 0, "paquetes": 0, "transacciones": 0, "producciones": 0}
+        if not actividades:
+            return resumen
+
+        n_grupos, paquete_de, n_paquetes = self._paquetes(actividades)
+
+        # Actividades y montos de cada paso, y la parte de cada paquete
+        pasos = []
+        tareas: List[List[Tuple[int, Optional[List[int]]]]] = [
+            [] for _ in range(n_paquetes)
+        ]
+        for k, (es_produccion, en_paso) in enumerate(self._pasos(actividades)):
+            lote = [actividades[i] for i in en_paso.tolist()]
+            if es_produccion:
+                pasos.append((lote, None))
+                tareas[paquete_de[en_paso[0]]].append((k, None))
+                continue
+            pasos.append((lote, montos_transacciones(lote)))
+            de_paso = paquete_de[en_paso]
+            orden = np.argsort(de_paso, kind="stable")
+            paquetes, inicios = np.unique(de_paso[orden], return_index=True)
+            for p, suyas in zip(paquetes.tolist(), np.split(orden, inicios[1:])):
+                tareas[p].append((k, suyas.tolist()))
+
+        resultados = self._mover(actividades, pasos, tareas)
+
+        # Contabilización en el orden de la corrida serial
+        resumen["grupos"], resumen["paquetes"] = n_grupos, n_paquetes
+        for k, (lote, montos) in enumerate(pasos):
+            partes = [r["movido"][k] for r in resultados if k in r["movido"]]
+            if montos is None:
+                if partes:
+                    self.produccion.contabilizar_ordenes(lote, partes[0])
+                    resumen["producciones"] += len(lote)
+                continue
+            movidas = np.zeros(len(lote), dtype=bool)
+            costos = np.zeros(len(lote), dtype=np.float64)
+            for suyas, costos_paquete in partes:
+                movidas[suyas] = True
+                costos[suyas] = costos_paquete
+            if not movidas.all():
+                if not movidas.any():
+                    continue
+                indices = np.flatnonzero(movidas)
+                lote = [lote[i] for i in indices]
+                montos = {
+                    nombre: valores[indices] for nombre, valores in montos.items()
+                }
+                costos = costos[indices]
+            self.liquidador.contabilizar_lote(lote, montos, costos)
+            resumen["transacciones"] += len(lote)
+
+        errores = [r["error"] for r in resultados if r["error"] is not None]
+        if errores:
+            raise min(errores, key=lambda e: e[:2])[2]
+        return resumen
+
+    def ejecutar_periodo(
+        self, fases: Sequence[Iterable], periodo: Optional[int] = None
+    ):
+        """
+        Ejecuta las fases de un periodo, una después de otra.
+
+        :param fases: Actividades de cada fase.
+        :param periodo: Periodo que se fija en el libro mayor; por defecto el actual.
+        :return: Resumen del periodo con el de cada fase.
+        """
+        if periodo is not None:
+            self.ledger.periodo = periodo
+        resumenes = [self.ejecutar_fase(fase) for fase in fases]
+        return {
+            "periodo": self.ledger.periodo,
+            "transacciones": sum(r["transacciones"] for r in resumenes),
+            "producciones": sum(r["producciones"] for r in resumenes),
+            "fases": resumenes,
+        }
+
+    def ejecutar(self, periodos: Iterable[Sequence[Iterable]]) -> Iterator[Dict]:
+        """
+        Ejecuta una secuencia de periodos (p. ej. un generador con las fases de
+        cada día), avanzando el periodo del libro mayor en cada uno.
+
+        :return: Un generador con el resumen de cada periodo.
+        """
+        primero = self.ledger.periodo
+        for i, fases in enumerate(periodos):
+            yield self.ejecutar_periodo(fases, primero + i)
@@ -0,0 +1,369 @@
+### Motor poblacional: todos los agentes de un tipo en estructura de arreglos
+
+"""
+
+Una Poblacion guarda N agentes ZF o NCT como columnas en lugar de objetos:
+
+agente_ids: Identificador de cada agente en el Ledger.
+
+cantidades: Matriz agentes x bienes con las unidades en inventario.
+
+valores: Matriz agentes x bienes con el valor del inventario a costo.
+
+Los saldos contables se leen del Ledger como una matriz agentes x cuentas.
+Los inventarios se valoran por promedio ponderado, que es el único método que
+se puede vectorizar sobre agentes; para FIFO o LIFO por lotes se usan los
+objetos Agent.
+
+Compras, producciones y ventas se ejecutan para todos los agentes a la vez y se
+contabilizan con el MotorContable en un solo lote por operación.
+
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from accounting_motor import MotorContable
+from ledger import Ledger, ledger_por_defecto
+from model import NCT, ZF, Agent, Good
+from plan_cuentas import PlanCuentas
+
+TIPOS_AGENTE = {"ZF": ZF, "NCT": NCT}
+
+
+class Poblacion:
+    """
+    Clase para simular en bloque a todos los agentes de un mismo tipo.
+    """
+
+    def __init__(
+        self,
+        tipo: str,
+        n_agentes: int,
+        plantillas_cuentas: Dict,
+        bienes_vendidos: List[Good],
+        bienes_producidos: List[Good],
+        ledger: Optional[Ledger] = None,
+        motor: Optional[MotorContable] = None,
+        nombres: Optional[List[str]] = None,
+    ):
+        """
+        Inicializa una población de agentes.
+
+        :param tipo: Tipo de los agentes, "ZF" o "NCT".
+        :param n_agentes: Número de agentes de la población.
+        :param plantillas_cuentas: Plan de cuentas compartido por los agentes.
+        :param bienes_vendidos: Bienes que venden los agentes.
+        :param bienes_producidos: Bienes que producen los agentes.
+        :param ledger: Libro mayor de la población. Si es None se usa el del motor
+                       o el libro mayor por defecto.
+        :param motor: Motor contable para contabilizar. Si es None se crea uno
+                      sobre el libro mayor.
+        :param nombres: Nombre de cada agente; por defecto "<tipo>_<i>".
+        """
+        if tipo not in TIPOS_AGENTE:
+            raise ValueError("El tipo de la población debe ser 'ZF' o 'NCT'.")
+        if motor is not None and ledger is None:
+            ledger = motor.ledger
+
+        self.tipo = tipo
+        self.ledger = ledger if ledger is not None else ledger_por_defecto()
+        self.motor = motor if motor is not None else MotorContable(ledger=self.ledger)
+        self.plantillas_cuentas = plantillas_cuentas
+        self.plan_cuentas = PlanCuentas.desde_plantillas(plantillas_cuentas)
+        self.codigos = np.array(self.plan_cuentas.codigos, dtype=np.int64)
+
+        primero = self.ledger.nuevos_agentes(n_agentes, tipo)
+        self.agente_ids = np.arange(primero, primero + n_agentes, dtype=np.int32)
+        self.nombres = (
+            nombres
+            if nombres is not None
+            else [f"{tipo}_{i}" for i in range(n_agentes)]
+        )
+        if len(self.nombres) != n_agentes:
+            raise ValueError("Debe haber un nombre por agente.")
+
+        self.bienes_vendidos = list(bienes_vendidos) if bienes_vendidos else []
+        self.bienes_producidos = list(bienes_producidos) if bienes_producidos else []
+        self._producidos = {bien.name for bien in self.bienes_producidos}
+
+        # Inventarios: una columna por bien, en el orden en que aparecen
+        self.bienes: Dict[str, Good] = {}
+        self._columna_bien: Dict[str, int] = {}
+        self.cantidades = np.zeros((n_agentes, 0), dtype=np.float64)
+        self.valores = np.zeros((n_agentes, 0), dtype=np.float64)
+        for bien in self.bienes_vendidos + self.bienes_producidos:
+            self.columna_bien(bien)
+
+    def __len__(self) -> int:
+        return len(self.agente_ids)
+
+    def columna_bien(self, bien: Good) -> int:
+        """Columna de las matrices de inventario del bien; la crea si no existe."""
+        columna = self._columna_bien.get(bien.name)
+        if columna is None:
+            columna = len(self._columna_bien)
+            self._columna_bien[bien.name] = columna
+            self.bienes[bien.name] = bien
+            ceros = np.zeros((len(self), 1), dtype=np.float64)
+            self.cantidades = np.hstack([self.cantidades, ceros])
+            self.valores = np.hstack([self.valores, ceros])
+        return columna
+
+    def _seleccion(self, agentes: Optional[np.ndarray], *arreglos):
+        """Posiciones de los agentes y arreglos difundidos al mismo tamaño."""
+        filas = (
+            np.arange(len(self))
+            if agentes is None
+            else np.asarray(agentes, dtype=np.intp)
+        )
+        arreglos = [
+            np.broadcast_to(np.asarray(a, dtype=np.float64), filas.shape)
+            for a in arreglos
+        ]
+        # Se descartan las filas sin cantidad para no contabilizar asientos vacíos
+        activas = arreglos[0] != 0
+        if np.any(arreglos[0] < 0):
+            raise ValueError("Las cantidades no pueden ser negativas.")
+        return [filas[activas]] + [a[activas] for a in arreglos]
+
+    def _verificar_existencias(self, filas, columna: int, requeridas, nombre: str):
+        faltantes = np.flatnonzero(self.cantidades[filas, columna] < requeridas)
+        if faltantes.size:
+            primero = filas[faltantes[0]]
+            raise ValueError(
+                f"No hay suficiente inventario de {nombre} para retirar en "
+                f"{faltantes.size} agente(s), p. ej. {self.nombres[primero]}."
+            )
+
+    def _costo_promedio(self, filas, columna: int) -> np.ndarray:
+        cantidades = self.cantidades[filas, columna]
+        return np.divide(
+            self.valores[filas, columna],
+            cantidades,
+            out=np.zeros_like(cantidades),
+            where=cantidades > 0,
+        )
+
+    def _retirar(self, filas, columna: int, cantidades) -> np.ndarray:
+        """Retira unidades a costo promedio ponderado y devuelve su costo."""
+        costo = cantidades * self._costo_promedio(filas, columna)
+        np.subtract.at(self.cantidades[:, columna], filas, cantidades)
+        np.subtract.at(self.valores[:, columna], filas, costo)
+        return costo
+
+    def comprar(
+        self,
+        bien: Good,
+        cantidades,
+        costos_unitarios,
+        agentes: Optional[np.ndarray] = None,
+        materia_prima: Optional[bool] = None,
+    ) -> np.ndarray:
+        """
+        Compra un bien para varios agentes y lo contabiliza en un solo lote.
+
+        :param bien: El bien comprado.
+        :param cantidades: Cantidad comprada por cada agente (escalar o arreglo).
+        :param costos_unitarios: Costo unitario sin IVA (escalar o arreglo).
+        :param agentes: Posiciones de los agentes en la población; por defecto todos.
+        :param materia_prima: Si el bien entra a materias primas (1405) o a mercancía
+                              comercializable (1435). Por defecto es materia prima
+                              si algún bien producido lo usa como insumo.
+        :return: Los identificadores de asiento contabilizados.
+        """
+        filas, cantidades, costos_unitarios = self._seleccion(
+            agentes, cantidades, costos_unitarios
+        )
+        columna = self.columna_bien(bien)
+        precio_total = cantidades * costos_unitarios
+        monto_iva = precio_total * bien.iva_rate
+
+        np.add.at(self.cantidades[:, columna], filas, cantidades)
+        np.add.at(self.valores[:, columna], filas, precio_total)
+
+        if materia_prima is None:
+            materia_prima = any(bien.name in b.insumos for b in self.bienes_producidos)
+        if not materia_prima:
+            plantilla = "compra_bien_final_comercializable"
+        elif bien.iva_rate:
+            plantilla = "compra_materia_prima"
+        else:
+            plantilla = "compra_materia_prima_sin_iva"
+
+        return self.motor.contabilizar(
+            plantilla,
+            self.agente_ids[filas],
+            {
+                "precio_total": precio_total,
+                "monto_iva": monto_iva,
+                "precio_con_iva": precio_total + monto_iva,
+            },
+            ledger=self.ledger,
+        )
+
+    def vender(
+        self,
+        bien: Good,
+        cantidades,
+        precios_unitarios,
+        agentes: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Vende un bien desde varios agentes a costo promedio ponderado.
+
+        :param bien: El bien vendido.
+        :param cantidades: Cantidad vendida por cada agente (escalar o arreglo).
+        :param precios_unitarios: Precio de venta unitario sin IVA.
+        :param agentes: Posiciones de los agentes en la población; por defecto todos.
+        :return: El costo de ventas de cada agente seleccionado con cantidad > 0.
+        :raises ValueError: Si algún agente no tiene inventario suficiente.
+        """
+        filas, cantidades, precios_unitarios = self._seleccion(
+            agentes, cantidades, precios_unitarios
+        )
+        columna = self.columna_bien(bien)
+        requeridas = np.bincount(filas, weights=cantidades, minlength=len(self))
+        unicas = np.unique(filas)
+        self._verificar_existencias(unicas, columna, requeridas[unicas], bien.name)
+
+        costo_total = self._retirar(filas, columna, cantidades)
+        precio_total = cantidades * precios_unitarios
+        monto_iva = precio_total * bien.iva_rate
+
+        if bien.name in self._producidos:
+            plantilla = "venta_mercancia_producida"
+        else:
+            plantilla = "venta_mercancia_no_producida"
+        if not bien.iva_rate:
+            plantilla += "_exenta"
+
+        self.motor.contabilizar(
+            plantilla,
+            self.agente_ids[filas],
+            {
+                "precio_total": precio_total,
+                "monto_iva": monto_iva,
+                "precio_con_iva": precio_total + monto_iva,
+                "costo_total": costo_total,
+            },
+            ledger=self.ledger,
+        )
+        return costo_total
+
+    def producir(
+        self,
+        bien: Good,
+        cantidades,
+        costo_indirecto=0.0,
+        agentes: Optional[np.ndarray] = None,
+        insumos: Optional[Dict[str, float]] = None,
+    ) -> np.ndarray:
+        """
+        Produce un bien en varios agentes consumiendo sus insumos.
+
+        :param bien: El bien producido.
+        :param cantidades: Unidades producidas por cada agente.
+        :param costo_indirecto: Costos indirectos de cada producción (cuenta 73).
+        :param agentes: Posiciones de los agentes en la población; por defecto todos.
+        :param insumos: Insumos por unidad producida; por defecto bien.insumos.
+        :return: El costo total de cada producción.
+        :raises ValueError: Si algún agente no tiene los insumos suficientes.
+        """
+        filas, cantidades, costo_indirecto = self._seleccion(
+            agentes, cantidades, costo_indirecto
+        )
+        insumos = insumos if insumos is not None else bien.insumos
+        columnas = []
+        for nombre, por_unidad in insumos.items():
+            if nombre not in self._columna_bien:
+                raise ValueError(f"No hay suficiente inventario de {nombre}.")
+            columnas.append((self._columna_bien[nombre], por_unidad, nombre))
+
+        # Se valida todo antes de modificar cualquier inventario
+        unicas = np.unique(filas)
+        for columna, por_unidad, nombre in columnas:
+            requeridas = np.bincount(
+                filas, weights=cantidades * por_unidad, minlength=len(self)
+            )
+            self._verificar_existencias(unicas, columna, requeridas[unicas], nombre)
+
+        costo_total_materiales = np.zeros(len(filas), dtype=np.float64)
+        for columna, por_unidad, _ in columnas:
+            costo_total_materiales += self._retirar(
+                filas, columna, cantidades * por_unidad
+            )
+        costo_total = costo_total_materiales + costo_indirecto
+
+        columna = self.columna_bien(bien)
+        np.add.at(self.cantidades[:, columna], filas, cantidades)
+        np.add.at(self.valores[:, columna], filas, costo_total)
+
+        self.motor.contabilizar(
+            "proceso_produccion",
+            self.agente_ids[filas],
+            {
+                "costo_total": costo_total,
+                "costo_total_materiales": costo_total_materiales,
+                "costo_indirecto": costo_indirecto,
+            },
+            ledger=self.ledger,
+        )
+        return costo_total
+
+    def ejecutar_periodo(
+        self,
+        compras: Iterable[Dict] = (),
+        producciones: Iterable[Dict] = (),
+        ventas: Iterable[Dict] = (),
+    ) -> None:
+        """
+        Ejecuta la actividad de un periodo: primero compras, luego producción y
+        por último ventas. Cada elemento es un diccionario con los argumentos de
+        comprar, producir o vender respectivamente.
+        """
+        for compra in compras:
+            self.comprar(**compra)
+        for produccion in producciones:
+            self.producir(**produccion)
+        for venta in ventas:
+            self.vender(**venta)
+
+    def saldos(self) -> np.ndarray:
+        """
+        Saldo (debe - haber) de cada agente en cada cuenta del plan.
+
+        :return: Matriz agentes x cuentas en el orden de self.codigos.
+        """
+        debe, haber, _ = self.ledger.totales_matriz(self.agente_ids, self.codigos)
+        return debe - haber
+
+    def agente(self, posicion: int) -> Agent:
+        """
+        Construye un Agent que ve las cuentas de un agente de la población.
+
+        Las cuentas leen directamente del libro mayor compartido; el inventario es
+        una copia con un lote por bien a costo promedio, útil para depurar.
+
+        :param posicion: Posición del agente en la población.
+        """
+        clase = TIPOS_AGENTE[self.tipo]
+        agente = clase(
+            self.nombres[posicion],
+            self.plantillas_cuentas,
+            self.bienes_vendidos,
+            self.bienes_producidos,
+            ledger=self.ledger,
+            agente_id=int(self.agente_ids[posicion]),
+        )
+        for nombre, columna in self._columna_bien.items():
+            cantidad = self.cantidades[posicion, columna]
+            if cantidad > 0:
+                agente.set_costing_method_for_good(nombre, "WeightedAverage")
+                agente.inventory.add_lote(
+                    self.bienes[nombre],
+                    float(cantidad),
+                    float(self.valores[posicion, columna] / cantidad),
+                )
+        return agente
@@ -0,0 +1,206 @@
+### Motor de producción: consume insumos, valora el producto y contabiliza
+
+"""
+
+Las órdenes de producción se ejecutan por lotes (ver agrupar_ordenes): las
+órdenes de un agente que siguen a otra del mismo bien, sin órdenes de otro bien
+del mismo agente en medio, forman un lote. Los agentes solo tocan su propio
+inventario, así que las órdenes de agentes distintos son independientes; entre
+las de un mismo agente se respeta el orden de envío, de modo que una orden que
+consume lo producido por una orden anterior siempre se ejecuta después. Cada
+lote:
+
+1. Se valida que el inventario del productor alcance para el consumo total de
+   cada insumo, antes de modificar nada.
+
+2. Orden por orden, en su orden, se retira cada insumo con el método de costeo
+   del bien (FIFO, LIFO o WeightedAverage) y el producto entra al inventario
+   como un lote propio con el costo de la orden. Los costos y los lotes son
+   los mismos que si cada orden se ejecutara sola.
+
+3. costo_total_materiales = sum(consumo * costo unitario) por orden, y
+   costo_total = costo_total_materiales + costo_indirecto.
+
+4. Se contabiliza la plantilla proceso_produccion (1430 / 1405 / 73) para
+   todas las órdenes del lote en una llamada al MotorContable; eso es lo que
+   ahorra el lote frente a ejecutar las órdenes una por una.
+
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from accounting_motor import MotorContable
+from model import Agent, Good, Production
+
+
+def agrupar_ordenes(producciones: Iterable[Production]) -> List[List[Production]]:
+    """
+    Lotes de órdenes de producción, en el orden en que se ejecutan.
+
+    Una orden se suma al último lote de su productor si es del mismo bien; si
+    no, abre un lote nuevo. Los lotes van en el orden de su primera orden.
+    """
+    lotes: List[List[Production]] = []
+    abiertos: Dict[int, Tuple[str, List[Production]]] = {}  # Productor -> lote
+    for produccion in producciones:
+        clave = id(produccion.producer)
+        abierto = abiertos.get(clave)
+        if abierto is not None and abierto[0] == produccion.good.name:
+            abierto[1].append(produccion)
+        else:
+            lote = [produccion]
+            abiertos[clave] = (produccion.good.name, lote)
+            lotes.append(lote)
+    return lotes
+
+
+class MotorProduccion:
+    """
+    Clase para ejecutar órdenes de producción por lotes.
+    """
+
+    def __init__(self, motor: MotorContable):
+        """
+        :param motor: Motor contable con el libro mayor de los productores.
+        """
+        self.motor = motor
+
+    def producir(
+        self,
+        producer: Agent,
+        good: Good,
+        cantidades,
+        insumos: Optional[Dict[str, float]] = None,
+        costo_indirecto=0.0,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Ejecuta varias órdenes de producción de un bien para un agente.
+
+        :param producer: El agente que produce.
+        :param good: El bien producido.
+        :param cantidades: Unidades producidas en cada orden (escalar o arreglo).
+        :param insumos: Insumos por unidad producida; por defecto good.insumos.
+        :param costo_indirecto: Costo indirecto de cada orden (escalar o arreglo).
+        :return: Diccionario con costo_total_materiales y costo_total por orden.
+        :raises ValueError: Si el inventario no alcanza para los insumos.
+        """
+        cantidades = np.atleast_1d(np.asarray(cantidades, dtype=np.float64))
+        insumos = insumos if insumos is not None else good.insumos
+        consumos = [
+            {nombre: cantidad * por_unidad for nombre, por_unidad in insumos.items()}
+            for cantidad in cantidades.tolist()
+        ]
+        resultado = self._mover_lote(
+            producer, good, cantidades, consumos, costo_indirecto
+        )
+        return self._contabilizar_lote(producer, resultado)
+
+    def ejecutar(
+        self, producciones: Iterable[Production], costo_indirecto: float = 0.0
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        Ejecuta objetos Production por lotes (ver agrupar_ordenes), respetando
+        el orden de envío de las órdenes de cada agente.
+
+        :param producciones: Órdenes de producción; sus inputs son cantidades
+                             totales por orden.
+        :param costo_indirecto: Costo indirecto de cada orden.
+        :return: El resultado de cada lote, en el orden de agrupar_ordenes.
+        :raises ValueError: Si el inventario no alcanza para un lote. Los lotes
+                            anteriores quedan ejecutados.
+        """
+        return [
+            self.contabilizar_ordenes(
+                ordenes, self.mover_ordenes(ordenes, costo_indirecto)
+            )
+            for ordenes in agrupar_ordenes(producciones)
+        ]
+
+    def mover_ordenes(
+        self, ordenes: List[Production], costo_indirecto: float = 0.0
+    ) -> Dict[str, np.ndarray]:
+        """
+        Primera etapa de la ejecución de un lote de agrupar_ordenes: valida y
+        mueve el inventario del productor sin contabilizar.
+
+        :param ordenes: Un lote de agrupar_ordenes.
+        :param costo_indirecto: Costo indirecto de cada orden.
+        :return: Costos del lote, para contabilizar_ordenes.
+        :raises ValueError: Si el inventario no alcanza para el lote; en ese
+                            caso no se mueve nada.
+        """
+        consumos = [orden.inputs for orden in ordenes]
+        cantidades = np.array([o.amount_good for o in ordenes], dtype=np.float64)
+        return self._mover_lote(
+            ordenes[0].producer, ordenes[0].good, cantidades, consumos, costo_indirecto
+        )
+
+    def contabilizar_ordenes(
+        self, ordenes: List[Production], resultado: Dict[str, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Segunda etapa de la ejecución de un lote: contabiliza lo movido por
+        mover_ordenes.
+
+        :return: Diccionario con costo_total_materiales y costo_total por orden.
+        """
+        return self._contabilizar_lote(ordenes[0].producer, resultado)
+
+    def _mover_lote(
+        self,
+        producer: Agent,
+        good: Good,
+        cantidades: np.ndarray,
+        consumos: List[Dict[str, float]],
+        costo_indirecto,
+    ) -> Dict[str, np.ndarray]:
+        # consumos: Cantidad total de cada insumo, por orden
+        if np.any(cantidades <= 0):
+            raise ValueError("La cantidad a producir debe ser positiva.")
+        if producer.ledger is not self.motor.ledger:
+            raise ValueError(
+                f"El agente {producer.nombre} no usa el libro mayor del motor."
+            )
+
+        inventario = producer.inventory
+        totales: Dict[str, float] = {}
+        for consumo in consumos:
+            for nombre, cantidad in consumo.items():
+                totales[nombre] = totales.get(nombre, 0.0) + cantidad
+        for nombre, total in totales.items():
+            if inventario.get_total_quantity(nombre) < total:
+                raise ValueError(
+                    f"No hay suficiente inventario de {nombre} en {producer.nombre} "
+                    f"para producir {good.name}."
+                )
+
+        costo_indirecto = np.broadcast_to(
+            np.asarray(costo_indirecto, dtype=np.float64), cantidades.shape
+        )
+        costo_total_materiales = np.zeros_like(cantidades)
+        # Orden por orden, como si cada una se ejecutara sola
+        for i, (consumo, unidades) in enumerate(zip(consumos, cantidades.tolist())):
+            for nombre, cantidad in consumo.items():
+                if cantidad > 0:
+                    costo_unitario = inventario.remove_lote(nombre, cantidad) / cantidad
+                    costo_total_materiales[i] += cantidad * costo_unitario
+            costo = costo_total_materiales[i] + costo_indirecto[i]
+            inventario.add_lote(good, unidades, costo / unidades)
+        costo_total = costo_total_materiales + costo_indirecto
+
+        return {
+            "costo_total": costo_total,
+            "costo_total_materiales": costo_total_materiales,
+            "costo_indirecto": costo_indirecto,
+        }
+
+    def _contabilizar_lote(
+        self, producer: Agent, resultado: Dict[str, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        self.motor.contabilizar("proceso_produccion", producer.agente_id, resultado)
+        return {
+            "costo_total_materiales": resultado["costo_total_materiales"],
+            "costo_total": resultado["costo_total"],
+        }
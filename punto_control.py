@@ -0,0 +1,511 @@
+### Puntos de control binarios del estado completo de una simulación
+
+"""
+
+guardar_punto_control escribe en un directorio el libro mayor, los agentes, sus
+bienes y los lotes de sus inventarios como arreglos NumPy contiguos, sin
+serializar el grafo de objetos:
+
+ledger_*: Las columnas y matrices de totales de Ledger.instantanea().
+
+agentes_*: Identificador en el libro mayor, tipo (posición en TIPOS_AGENTE) y
+nombre de cada agente.
+
+bienes_*: Nombre, estado de IVA (posición en ESTADOS_IVA), precio, iva_rate y
+tariff de cada bien vendido o producido por algún agente o con lotes en algún
+inventario (p. ej. insumos solo comprados); sus insumos en formato CSR
+(insumos_inicio, insumos_nombre, insumos_cantidad). vendidos_* y producidos_*
+dan, también en CSR, los bienes de cada agente.
+
+lotes_*: Agente, bien (posición en skus_nombre), cantidad y costo unitario de
+cada lote, en el orden de su deque. inventario_* guarda los agregados por
+(agente, bien) y metodos_* los métodos de costeo.
+
+El manifiesto punto_control.json lleva el formato, la versión, los escalares
+del libro mayor, los metadatos del usuario y el tipo y forma de cada arreglo.
+Sin compresión cada arreglo es un .npy que se abre con memoria mapeada (copia
+al escribir) al cargar: el libro mayor usa las columnas y matrices mapeadas sin
+copiarlas y cada inventario arma sus lotes la primera vez que se usa. Con
+comprimir=True todos van en un solo arreglos.npz comprimido, más pequeño pero
+que se descomprime al cargar.
+
+El punto de control se escribe en un directorio temporal que reemplaza al
+destino al final, así que una interrupción nunca deja uno a medio escribir.
+
+"""
+
+import json
+import os
+import shutil
+from collections import deque
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from catalogo import ESTADOS_IVA, CatalogoBienes
+from ledger import TIPOS_AGENTE, Ledger
+from model import (
+    NCT,
+    ZF,
+    Agent,
+    BienExcluido,
+    BienExento,
+    BienGravado,
+    Good,
+    Inventory,
+    Lote,
+)
+
+FORMATO = "punto_control"
+VERSION_PUNTO_CONTROL = 1
+MANIFIESTO = "punto_control.json"
+ARCHIVO_COMPRIMIDO = "arreglos.npz"
+
+CLASES_AGENTE = {"ZF": ZF, "NCT": NCT}
+METODOS_COSTEO = ("FIFO", "LIFO", "WeightedAverage")
+
+# Arreglos de Ledger.instantanea() y escalares que van al manifiesto
+_ARREGLOS_LEDGER = (
+    "tipo_agente",
+    "_agente",
+    "_codigo",
+    "_transaccion",
+    "_debe",
+    "_haber",
+    "_tot_debe",
+    "_tot_haber",
+    "_conteo",
+    "_comp_debe",
+    "_comp_haber",
+)
+_ESCALARES_LEDGER = (
+    "compensado",
+    "conservar_movimientos",
+    "periodo",
+    "siguiente_agente",
+    "siguiente_transaccion",
+    "codigos_columna",
+)
+
+
+class PuntoControl(NamedTuple):
+    ledger: Ledger
+    agentes: List[Agent]
+    bienes: List[Good]
+    metadatos: Dict
+
+
+def _textos(valores: List[str]) -> np.ndarray:
+    # Arreglo de texto de ancho fijo; np.array([]) sería de tipo float
+    return np.array(valores, dtype=str) if valores else np.empty(0, dtype="<U1")
+
+
+def _csr(listas: List[List], dtype) -> tuple:
+    inicio = np.zeros(len(listas) + 1, dtype=np.int64)
+    inicio[1:] = np.cumsum([len(lista) for lista in listas])
+    valores = [valor for lista in listas for valor in lista]
+    if dtype is str:
+        return inicio, _textos(valores)
+    return inicio, np.array(valores, dtype=dtype)
+
+
+def _bien_de_fila(catalogo: CatalogoBienes, fila: int) -> Good:
+    atributos = catalogo.atributos([fila])
+    nombre = catalogo.nombres[int(atributos["sku"][0])]
+    precio, tariff = float(atributos["precio"][0]), float(atributos["tariff"][0])
+    estado = ESTADOS_IVA[atributos["estado_iva"][0]]
+    if estado == "gravado":
+        iva_rate = float(atributos["iva_rate"][0])
+        return BienGravado(nombre, precio, iva_rate, tariff, catalogo=catalogo)
+    if estado == "exento":
+        return BienExento(nombre, precio, tariff, catalogo=catalogo)
+    return BienExcluido(nombre, precio, catalogo=catalogo)
+
+
+def _arreglos(agentes: List[Agent], instantanea: Dict) -> Dict[str, np.ndarray]:
+    arreglos: Dict[str, np.ndarray] = {}
+    for nombre in _ARREGLOS_LEDGER:
+        if nombre in instantanea:
+            arreglos["ledger" + (nombre if nombre[0] == "_" else "_" + nombre)] = (
+                instantanea[nombre]
+            )
+
+    arreglos["agentes_id"] = np.array([a.agente_id for a in agentes], dtype=np.int64)
+    arreglos["agentes_tipo"] = np.array(
+        [TIPOS_AGENTE.index(a.type) for a in agentes], dtype=np.int8
+    )
+    arreglos["agentes_nombre"] = _textos([a.nombre for a in agentes])
+
+    # Bienes por objeto: dos copias de un bien con distintas tasas son dos filas
+    bienes: Dict[int, int] = {}
+    tabla: List[Good] = []
+    for agente in agentes:
+        for bien in (*agente.bienes_vendidos, *agente.bienes_producidos):
+            if id(bien) not in bienes:
+                bienes[id(bien)] = len(tabla)
+                tabla.append(bien)
+
+    # Inventarios: los bienes se identifican por nombre entre catálogos
+    skus: Dict[str, int] = {}
+    catalogos: Dict[str, tuple] = {}  # Nombre -> (catálogo, sku)
+    lotes = {"agente": [], "bien": [], "cantidad": [], "costo": []}
+    totales = {"agente": [], "bien": [], "cantidad": [], "valor": []}
+    metodos = {"agente": [], "bien": [], "metodo": []}
+    for i, agente in enumerate(agentes):
+        inventario = agente.inventory
+        nombres = inventario.catalogo.nombres
+        for sku, cola in inventario.lotes.items():
+            j = skus.setdefault(nombres[sku], len(skus))
+            catalogos.setdefault(nombres[sku], (inventario.catalogo, sku))
+            lotes["agente"].extend(repeat(i, len(cola)))
+            lotes["bien"].extend(repeat(j, len(cola)))
+            lotes["cantidad"].extend(lote.quantity for lote in cola)
+            lotes["costo"].extend(lote.unit_cost for lote in cola)
+            totales["agente"].append(i)
+            totales["bien"].append(j)
+            totales["cantidad"].append(inventario._total_quantity[sku])
+            totales["valor"].append(inventario._total_value[sku])
+        for sku, metodo in inventario.costing_methods.items():
+            metodos["agente"].append(i)
+            metodos["bien"].append(skus.setdefault(nombres[sku], len(skus)))
+            metodos["metodo"].append(METODOS_COSTEO.index(metodo))
+
+    # Bienes que solo aparecen en los inventarios (p. ej. insumos comprados):
+    # se guardan con los atributos de una fila en uso de su catálogo
+    nombres_tabla = {b.name for b in tabla}
+    for nombre, (catalogo, sku) in catalogos.items():
+        if nombre in nombres_tabla:
+            continue
+        fila = catalogo.fila_en_uso(sku)
+        if fila is not None:
+            tabla.append(_bien_de_fila(catalogo, fila))
+            nombres_tabla.add(nombre)
+
+    arreglos["bienes_nombre"] = _textos([b.name for b in tabla])
+    arreglos["bienes_estado"] = np.array(
+        [ESTADOS_IVA.index(b.status_iva) for b in tabla], dtype=np.int8
+    )
+    for atributo in ("price", "iva_rate", "tariff"):
+        arreglos[f"bienes_{atributo}"] = np.array(
+            [getattr(b, atributo) for b in tabla], dtype=np.float64
+        )
+    insumos = [list(b.insumos.items()) for b in tabla]
+    arreglos["insumos_inicio"], arreglos["insumos_nombre"] = _csr(
+        [[nombre for nombre, _ in lista] for lista in insumos], str
+    )
+    arreglos["insumos_cantidad"] = np.array(
+        [cantidad for lista in insumos for _, cantidad in lista], dtype=np.float64
+    )
+    for nombre in ("vendidos", "producidos"):
+        arreglos[f"{nombre}_inicio"], arreglos[f"{nombre}_bien"] = _csr(
+            [
+                [bienes[id(b)] for b in getattr(agente, f"bienes_{nombre}")]
+                for agente in agentes
+            ],
+            np.int32,
+        )
+
+    arreglos["skus_nombre"] = _textos(list(skus))
+    tipos = {"agente": np.int32, "bien": np.int32, "metodo": np.int8}
+    for prefijo, columnas in (
+        ("lotes", lotes),
+        ("inventario", totales),
+        ("metodos", metodos),
+    ):
+        for nombre, valores in columnas.items():
+            arreglos[f"{prefijo}_{nombre}"] = np.array(
+                valores, dtype=tipos.get(nombre, np.float64)
+            )
+    return arreglos
+
+
+def guardar_punto_control(
+    ruta: Union[str, Path],
+    agentes: Iterable[Agent],
+    ledger: Optional[Ledger] = None,
+    comprimir: bool = False,
+    metadatos: Optional[Dict] = None,
+) -> Path:
+    """
+    Escribe el estado de una simulación en un directorio.
+
+    :param ruta: Directorio del punto de control; si existe se reemplaza.
+    :param agentes: Agentes a guardar; deben compartir el libro mayor.
+    :param ledger: Libro mayor; por defecto el de los agentes.
+    :param comprimir: Si es True los arreglos se guardan comprimidos en un .npz
+                      (no se pueden mapear en memoria al cargar).
+    :param metadatos: Diccionario serializable en JSON que se guarda tal cual
+                      (p. ej. periodo, escenario, autor).
+    :return: La ruta del punto de control.
+    :raises ValueError: Si algún agente usa otro libro mayor.
+    """
+    agentes = list(agentes)
+    if ledger is None:
+        if not agentes:
+            raise ValueError("Se necesita un libro mayor o al menos un agente.")
+        ledger = agentes[0].ledger
+    for agente in agentes:
+        if agente.ledger is not ledger:
+            raise ValueError(
+                f"El agente {agente.nombre} no usa el libro mayor del punto de control."
+            )
+
+    instantanea = ledger.instantanea()
+    arreglos = _arreglos(agentes, instantanea)
+    manifiesto = {
+        "formato": FORMATO,
+        "version": VERSION_PUNTO_CONTROL,
+        "comprimido": comprimir,
+        "ledger": {
+            nombre: (
+                list(instantanea[nombre])
+                if nombre == "codigos_columna"
+                else instantanea[nombre]
+            )
+            for nombre in _ESCALARES_LEDGER
+        },
+        "tipos_agente": list(TIPOS_AGENTE),
+        "estados_iva": list(ESTADOS_IVA),
+        "metodos_costeo": list(METODOS_COSTEO),
+        "metadatos": metadatos or {},
+        "arreglos": {
+            nombre: {"dtype": arreglo.dtype.str, "forma": list(arreglo.shape)}
+            for nombre, arreglo in arreglos.items()
+        },
+    }
+
+    ruta = Path(ruta)
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    shutil.rmtree(temporal, ignore_errors=True)
+    temporal.mkdir(parents=True)
+    if comprimir:
+        np.savez_compressed(temporal / ARCHIVO_COMPRIMIDO, **arreglos)
+    else:
+        for nombre, arreglo in arreglos.items():
+            np.save(temporal / f"{nombre}.npy", arreglo)
+    with open(temporal / MANIFIESTO, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, indent=1)
+
+    # El destino anterior se reemplaza solo cuando el nuevo está completo
+    anterior = ruta.with_name(ruta.name + ".old")
+    if ruta.exists():
+        shutil.rmtree(anterior, ignore_errors=True)
+        os.replace(ruta, anterior)
+    os.replace(temporal, ruta)
+    shutil.rmtree(anterior, ignore_errors=True)
+    return ruta
+
+
+def leer_manifiesto(ruta: Union[str, Path]) -> Dict:
+    """
+    Lee y valida el manifiesto de un punto de control.
+
+    :raises ValueError: Si no es un punto de control o su versión no se soporta.
+    """
+    with open(Path(ruta) / MANIFIESTO, encoding="utf-8") as archivo:
+        manifiesto = json.load(archivo)
+    if manifiesto.get("formato") != FORMATO:
+        raise ValueError(f"{ruta} no es un punto de control.")
+    if manifiesto["version"] != VERSION_PUNTO_CONTROL:
+        raise ValueError(
+            f"Versión de punto de control no soportada: {manifiesto['version']}."
+        )
+    return manifiesto
+
+
+def _leer_arreglos(ruta: Path, manifiesto: Dict) -> Dict[str, np.ndarray]:
+    if manifiesto["comprimido"]:
+        with np.load(ruta / ARCHIVO_COMPRIMIDO) as archivo:
+            return {nombre: archivo[nombre] for nombre in manifiesto["arreglos"]}
+    return {
+        # Copia al escribir: el libro mayor puede modificarlos sin tocar el archivo
+        nombre: np.load(ruta / f"{nombre}.npy", mmap_mode="c")
+        for nombre in manifiesto["arreglos"]
+    }
+
+
+def cargar_punto_control(
+    ruta: Union[str, Path],
+    plantillas_cuentas: Dict,
+    catalogo: Optional[CatalogoBienes] = None,
+) -> PuntoControl:
+    """
+    Reconstruye el libro mayor, los agentes y sus bienes desde un directorio.
+
+    :param ruta: Directorio escrito por guardar_punto_control.
+    :param plantillas_cuentas: Plan de cuentas de los agentes.
+    :param catalogo: Catálogo donde se registran los bienes; por defecto el
+                     catálogo compartido.
+    :return: PuntoControl con el libro mayor, los agentes y los bienes en el
+             orden en que se guardaron, y los metadatos.
+    """
+    ruta = Path(ruta)
+    manifiesto = leer_manifiesto(ruta)
+    arreglos = _leer_arreglos(ruta, manifiesto)
+
+    instantanea = dict(manifiesto["ledger"])
+    for nombre in _ARREGLOS_LEDGER:
+        clave = "ledger" + (nombre if nombre[0] == "_" else "_" + nombre)
+        if clave in arreglos:
+            instantanea[nombre] = arreglos[clave]
+    ledger = Ledger.desde_instantanea(instantanea, adoptar=True)
+
+    inicio = arreglos["insumos_inicio"].tolist()
+    nombres_insumo = arreglos["insumos_nombre"].tolist()
+    cantidades_insumo = arreglos["insumos_cantidad"].tolist()
+    bienes: List[Good] = []
+    for i, (nombre, estado, precio, iva_rate, tariff) in enumerate(
+        zip(
+            arreglos["bienes_nombre"].tolist(),
+            arreglos["bienes_estado"].tolist(),
+            arreglos["bienes_price"].tolist(),
+            arreglos["bienes_iva_rate"].tolist(),
+            arreglos["bienes_tariff"].tolist(),
+        )
+    ):
+        insumos = dict(
+            zip(
+                nombres_insumo[inicio[i] : inicio[i + 1]],
+                cantidades_insumo[inicio[i] : inicio[i + 1]],
+            )
+        )
+        estado = ESTADOS_IVA[estado]
+        if estado == "gravado":
+            bien = BienGravado(nombre, precio, iva_rate, tariff, insumos, catalogo)
+        elif estado == "exento":
+            bien = BienExento(nombre, precio, tariff, insumos, catalogo)
+        else:
+            bien = BienExcluido(nombre, precio, insumos, catalogo)
+        bienes.append(bien)
+
+    vendidos = [
+        arreglos["vendidos_inicio"].tolist(),
+        arreglos["vendidos_bien"].tolist(),
+    ]
+    producidos = [
+        arreglos["producidos_inicio"].tolist(),
+        arreglos["producidos_bien"].tolist(),
+    ]
+    agentes: List[Agent] = []
+    for i, (agente_id, tipo, nombre) in enumerate(
+        zip(
+            arreglos["agentes_id"].tolist(),
+            arreglos["agentes_tipo"].tolist(),
+            arreglos["agentes_nombre"].tolist(),
+        )
+    ):
+        agente = CLASES_AGENTE[TIPOS_AGENTE[tipo]](
+            nombre,
+            plantillas_cuentas,
+            [bienes[j] for j in vendidos[1][vendidos[0][i] : vendidos[0][i + 1]]],
+            [bienes[j] for j in producidos[1][producidos[0][i] : producidos[0][i + 1]]],
+            ledger=ledger,
+            agente_id=agente_id,
+        )
+        agentes.append(agente)
+
+    _cargar_inventarios(agentes, arreglos, catalogo)
+    return PuntoControl(ledger, agentes, bienes, manifiesto["metadatos"])
+
+
+def _cargar_inventarios(
+    agentes: List[Agent],
+    arreglos: Dict[str, np.ndarray],
+    catalogo: Optional[CatalogoBienes],
+) -> None:
+    # Las filas de cada tabla están ordenadas por agente: cada uno recibe su
+    # tramo y arma sus lotes la primera vez que se usa su inventario
+    posiciones = np.arange(len(agentes) + 1)
+    limites = [
+        np.searchsorted(arreglos[f"{prefijo}_agente"], posiciones).tolist()
+        for prefijo in ("lotes", "inventario", "metodos")
+    ]
+    fuente = (arreglos, arreglos["skus_nombre"].tolist())
+    for i, agente in enumerate(agentes):
+        tramos = tuple((inicio[i], inicio[i + 1]) for inicio in limites)
+        if any(fin > inicio for inicio, fin in tramos):
+            agente.inventory = _InventarioDiferido(
+                catalogo if catalogo is not None else agente.inventory.catalogo,
+                fuente,
+                tramos,
+            )
+        elif catalogo is not None:
+            agente.inventory = Inventory(catalogo)
+
+
+class _InventarioDiferido(Inventory):
+    """
+    Inventario cargado de un punto de control que arma sus lotes al primer uso.
+
+    Hasta entonces solo guarda sus tramos de los arreglos, que siguen mapeados
+    en memoria. Al primer acceso a un atributo de Inventory se llena y pasa a
+    ser un Inventory común, sin costo en los accesos siguientes.
+    """
+
+    def __init__(self, catalogo: CatalogoBienes, fuente: tuple, tramos: tuple):
+        self.catalogo = catalogo
+        self._fuente = fuente
+        self._tramos = tramos
+
+    def __getattr__(self, nombre: str):
+        # Solo se llama para los atributos que todavía no existen
+        if nombre.startswith("__") or "_tramos" not in self.__dict__:
+            raise AttributeError(nombre)
+        (arreglos, nombres), tramos = self._fuente, self._tramos
+        del self._fuente, self._tramos
+        self.__class__ = Inventory
+        Inventory.__init__(self, self.catalogo)
+        _llenar_inventario(self, arreglos, nombres, *tramos)
+        return getattr(self, nombre)
+
+
+def _llenar_inventario(
+    inventario: Inventory,
+    arreglos: Dict[str, np.ndarray],
+    nombres: List[str],
+    lotes: tuple,
+    totales: tuple,
+    metodos: tuple,
+) -> None:
+    internar = inventario.catalogo.internar
+    skus: Dict[int, int] = {}  # Posición en skus_nombre -> sku en el catálogo
+
+    def sku(j: int) -> int:
+        valor = skus.get(j)
+        if valor is None:
+            valor = skus[j] = internar(nombres[j])
+        return valor
+
+    # Los lotes del agente están agrupados por bien: se cortan en tramos
+    tramo = slice(*lotes)
+    bien = np.asarray(arreglos["lotes_bien"][tramo])
+    cortes = np.flatnonzero(np.diff(bien) != 0) + 1
+    limites = [0, *cortes.tolist(), len(bien)] if len(bien) else [0]
+    cantidades = arreglos["lotes_cantidad"][tramo].tolist()
+    costos = arreglos["lotes_costo"][tramo].tolist()
+    for inicio, fin in zip(limites[:-1], limites[1:]):
+        s = sku(int(bien[inicio]))
+        inventario.lotes[s] = deque(
+            map(Lote, repeat(s), cantidades[inicio:fin], costos[inicio:fin])
+        )
+
+    tramo = slice(*totales)
+    for j, cantidad, valor in zip(
+        arreglos["inventario_bien"][tramo].tolist(),
+        arreglos["inventario_cantidad"][tramo].tolist(),
+        arreglos["inventario_valor"][tramo].tolist(),
+    ):
+        s = sku(j)
+        # Bienes que tuvieron lotes y se vendieron por completo: deque vacío
+        inventario.lotes.setdefault(s, deque())
+        inventario._total_quantity[s] = cantidad
+        inventario._total_value[s] = valor
+
+    tramo = slice(*metodos)
+    for j, metodo in zip(
+        arreglos["metodos_bien"][tramo].tolist(),
+        arreglos["metodos_metodo"][tramo].tolist(),
+    ):
+        inventario.costing_methods[sku(j)] = METODOS_COSTEO[metodo]
@@ -0,0 +1,399 @@
+### Red de comercio entre agentes en matrices dispersas por bien y periodo
+
+"""
+
+RedComercial acumula los flujos vendedor -> comprador en matrices dispersas
+(CSR, con su transpuesta CSC para consultar por comprador), una por bien,
+periodo y dirección del flujo:
+
+NCT->NCT, NCT->ZF, ZF->NCT y ZF->ZF: según el tipo del vendedor y del comprador.
+NCT->ZF y ZF->NCT son los flujos que cruzan la frontera de la zona franca.
+
+Cada celda guarda, sumadas, las medidas de MEDIDAS: valor (precio_total),
+cantidad, iva (IVA cobrado en la transacción), arancel, iva_teorico (el IVA que
+causaría la misma venta entre empresas nacionales, valor * iva_rate) y el
+número de transacciones.
+
+Los registros se acumulan en listas pendientes y se compactan a CSR, sumando
+duplicados, la primera vez que se consulta. Las consultas solo recorren las
+filas o columnas de las matrices seleccionadas:
+
+contrapartes: Principales compradores o proveedores de un agente.
+
+flujos_frontera: Totales que cruzan la frontera por bien, periodo y dirección.
+
+fuga_iva: Diferencia entre el IVA teórico y el cobrado, por dirección.
+
+fuga_cadena: Fuga de IVA aguas abajo de un agente: en cada eslabón se atribuye
+a la cadena la fracción de sus compras que proviene del eslabón anterior.
+
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from model import Transaction
+from transacciones import montos_transacciones
+
+MEDIDAS = ("valor", "cantidad", "iva", "arancel", "iva_teorico", "transacciones")
+FLUJOS = ("NCT->NCT", "NCT->ZF", "ZF->NCT", "ZF->ZF")  # 2 * vendedor_zf + comprador_zf
+FLUJOS_FRONTERA = ("NCT->ZF", "ZF->NCT")
+
+
+class MatrizFlujos:
+    """
+    Matriz dispersa vendedor x comprador en formato CSR y CSC.
+    """
+
+    def __init__(
+        self, vendedores: np.ndarray, compradores: np.ndarray, datos: np.ndarray, n: int
+    ):
+        """
+        Construye la matriz a partir de tripletas, sumando las repetidas.
+
+        :param vendedores: Filas (identificador del vendedor).
+        :param compradores: Columnas (identificador del comprador).
+        :param datos: Matriz (registros, len(MEDIDAS)) con las medidas.
+        :param n: Número de agentes (dimensión de la matriz).
+        """
+        self.n = n
+        planas, inversos = np.unique(
+            vendedores.astype(np.int64) * n + compradores, return_inverse=True
+        )
+        inversos = inversos.ravel()
+        sumados = np.zeros((len(planas), datos.shape[1]), dtype=np.float64)
+        np.add.at(sumados, inversos, datos)
+        filas, columnas = np.divmod(planas, n)
+
+        # CSR: las celdas ya están ordenadas por (vendedor, comprador)
+        self.indptr = np.searchsorted(filas, np.arange(n + 1)).astype(np.intp)
+        self.columnas = columnas.astype(np.intp)
+        self.datos = sumados
+
+        # CSC: las mismas celdas ordenadas por (comprador, vendedor)
+        orden = np.lexsort((filas, columnas))
+        self.indptr_t = np.searchsorted(columnas[orden], np.arange(n + 1)).astype(
+            np.intp
+        )
+        self.filas_t = filas[orden].astype(np.intp)
+        self.datos_t = sumados[orden]
+
+    def __len__(self) -> int:
+        return len(self.columnas)
+
+    def tripletas(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        filas = np.repeat(np.arange(self.n), np.diff(self.indptr))
+        return filas, self.columnas, self.datos
+
+    def fila(self, vendedor: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Compradores y medidas de las ventas de un agente."""
+        if vendedor >= self.n:
+            return self.columnas[:0], self.datos[:0]
+        inicio, fin = self.indptr[vendedor], self.indptr[vendedor + 1]
+        return self.columnas[inicio:fin], self.datos[inicio:fin]
+
+    def columna(self, comprador: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Vendedores y medidas de las compras de un agente."""
+        if comprador >= self.n:
+            return self.filas_t[:0], self.datos_t[:0]
+        inicio, fin = self.indptr_t[comprador], self.indptr_t[comprador + 1]
+        return self.filas_t[inicio:fin], self.datos_t[inicio:fin]
+
+    def multiplicar_izquierda(self, vector: np.ndarray, pesos: np.ndarray):
+        """vector @ M, con M[i, j] = pesos de cada celda (una medida por celda)."""
+        filas = np.repeat(np.arange(self.n), np.diff(self.indptr))
+        return np.bincount(
+            self.columnas, weights=vector[filas] * pesos, minlength=len(vector)
+        )
+
+
+class RedComercial:
+    """
+    Clase para acumular y consultar los flujos de comercio entre agentes.
+    """
+
+    def __init__(self):
+        self._matrices: Dict[Tuple[str, int, str], MatrizFlujos] = {}
+        self._pendientes: Dict[Tuple[str, int, str], List[tuple]] = {}
+        self._n_agentes = 0
+
+    def registrar(
+        self,
+        bien: str,
+        periodo: int,
+        vendedores,
+        compradores,
+        vendedor_zf,
+        comprador_zf,
+        valores,
+        cantidades,
+        iva=0.0,
+        arancel=0.0,
+        iva_teorico=0.0,
+    ) -> None:
+        """
+        Registra un lote de flujos de un bien en un periodo.
+
+        Los argumentos por transacción pueden ser escalares o arreglos.
+        """
+        vendedores, compradores, vendedor_zf, comprador_zf, *medidas = (
+            np.broadcast_arrays(
+                np.asarray(vendedores, dtype=np.int64),
+                np.asarray(compradores, dtype=np.int64),
+                np.asarray(vendedor_zf, dtype=bool),
+                np.asarray(comprador_zf, dtype=bool),
+                np.asarray(valores, dtype=np.float64),
+                np.asarray(cantidades, dtype=np.float64),
+                np.asarray(iva, dtype=np.float64),
+                np.asarray(arancel, dtype=np.float64),
+                np.asarray(iva_teorico, dtype=np.float64),
+            )
+        )
+        vendedores = np.atleast_1d(vendedores)
+        if vendedores.size == 0:
+            return
+        datos = np.column_stack(
+            [np.atleast_1d(m).astype(np.float64) for m in medidas]
+            + [np.ones(vendedores.size)]
+        )
+        compradores = np.atleast_1d(compradores)
+        flujo = 2 * np.atleast_1d(vendedor_zf) + np.atleast_1d(comprador_zf)
+        self._n_agentes = max(
+            self._n_agentes, int(vendedores.max()) + 1, int(compradores.max()) + 1
+        )
+        for codigo in np.unique(flujo).tolist():
+            filas = flujo == codigo
+            clave = (bien, int(periodo), FLUJOS[codigo])
+            self._pendientes.setdefault(clave, []).append(
+                (vendedores[filas], compradores[filas], datos[filas])
+            )
+
+    def registrar_transacciones(
+        self,
+        transacciones: List[Transaction],
+        periodo: int,
+        montos: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
+        """
+        Registra objetos Transaction.
+
+        :param montos: Resultado de transacciones.montos_transacciones para las
+                       mismas transacciones; si es None se calcula.
+        """
+        if not transacciones:
+            return
+        if montos is None:
+            montos = montos_transacciones(transacciones)
+        n = len(transacciones)
+        tasas = np.array(
+            [getattr(t.good, "iva_rate", 0.0) for t in transacciones], dtype=np.float64
+        )
+        por_bien: Dict[str, List[int]] = {}
+        for i, transaccion in enumerate(transacciones):
+            por_bien.setdefault(transaccion.good.name, []).append(i)
+        for bien, posiciones in por_bien.items():
+            filas = np.array(posiciones, dtype=np.intp)
+            self.registrar(
+                bien,
+                periodo,
+                [transacciones[i].seller.agente_id for i in posiciones],
+                [transacciones[i].buyer.agente_id for i in posiciones],
+                [transacciones[i].seller.type == "ZF" for i in posiciones],
+                [transacciones[i].buyer.type == "ZF" for i in posiciones],
+                montos["precio_total"][:n][filas],
+                [transacciones[i].amount for i in posiciones],
+                montos["monto_iva"][:n][filas],
+                montos["monto_arancel"][:n][filas],
+                montos["precio_total"][:n][filas] * tasas[filas],
+            )
+
+    def _compactar(self) -> None:
+        if not self._pendientes:
+            return
+        n = self._n_agentes
+        for clave, partes in self._pendientes.items():
+            anterior = self._matrices.get(clave)
+            if anterior is not None:
+                partes = [anterior.tripletas()] + partes
+            self._matrices[clave] = MatrizFlujos(
+                np.concatenate([p[0] for p in partes]),
+                np.concatenate([p[1] for p in partes]),
+                np.concatenate([p[2] for p in partes]),
+                n,
+            )
+        self._pendientes = {}
+
+    def _seleccion(
+        self,
+        bien: Optional[str] = None,
+        periodos: Optional[Iterable[int]] = None,
+        flujos: Optional[Iterable[str]] = None,
+    ) -> Iterator[Tuple[Tuple[str, int, str], MatrizFlujos]]:
+        self._compactar()
+        periodos = None if periodos is None else set(periodos)
+        flujos = None if flujos is None else set(flujos)
+        for clave, matriz in self._matrices.items():
+            if bien is not None and clave[0] != bien:
+                continue
+            if periodos is not None and clave[1] not in periodos:
+                continue
+            if flujos is not None and clave[2] not in flujos:
+                continue
+            yield clave, matriz
+
+    def bienes(self) -> List[str]:
+        self._compactar()
+        return sorted({clave[0] for clave in self._matrices})
+
+    def periodos(self) -> List[int]:
+        self._compactar()
+        return sorted({clave[1] for clave in self._matrices})
+
+    # Consultas
+
+    def contrapartes(
+        self,
+        agente: int,
+        n: int = 10,
+        rol: str = "vendedor",
+        medida: str = "valor",
+        bien: Optional[str] = None,
+        periodos: Optional[Iterable[int]] = None,
+        flujos: Optional[Iterable[str]] = None,
+    ):
+        """
+        Principales contrapartes de un agente.
+
+        :param rol: "vendedor" para sus compradores, "comprador" para sus
+                    proveedores.
+        :param medida: Medida por la que se ordena (ver MEDIDAS).
+        :return: DataFrame indexado por contraparte con todas las medidas.
+        """
+        import pandas as pd
+
+        if rol not in ("vendedor", "comprador"):
+            raise ValueError("El rol debe ser 'vendedor' o 'comprador'.")
+        if medida not in MEDIDAS:
+            raise ValueError(f"Medida desconocida: {medida}.")
+        indices, datos = [], []
+        for _, matriz in self._seleccion(bien, periodos, flujos):
+            if rol == "vendedor":
+                contrapartes, valores = matriz.fila(agente)
+            else:
+                contrapartes, valores = matriz.columna(agente)
+            indices.append(contrapartes)
+            datos.append(valores)
+        nombre_indice = "comprador" if rol == "vendedor" else "vendedor"
+        if not indices:
+            return pd.DataFrame(columns=MEDIDAS, index=pd.Index([], name=nombre_indice))
+
+        unicas, inversos = np.unique(np.concatenate(indices), return_inverse=True)
+        sumados = np.zeros((len(unicas), len(MEDIDAS)))
+        np.add.at(sumados, inversos.ravel(), np.concatenate(datos))
+        tabla = pd.DataFrame(
+            sumados, columns=MEDIDAS, index=pd.Index(unicas, name=nombre_indice)
+        )
+        return tabla.nlargest(n, medida)
+
+    def _totales(self, claves_matrices, por_agente: Optional[str] = None):
+        import pandas as pd
+
+        filas = []
+        for (bien, periodo, flujo), matriz in claves_matrices:
+            if por_agente is None:
+                filas.append((bien, periodo, flujo, *matriz.datos.sum(axis=0)))
+                continue
+            vendedores, compradores, datos = matriz.tripletas()
+            agentes = vendedores if por_agente == "vendedor" else compradores
+            unicos, inversos = np.unique(agentes, return_inverse=True)
+            sumados = np.zeros((len(unicos), len(MEDIDAS)))
+            np.add.at(sumados, inversos.ravel(), datos)
+            for agente, valores in zip(unicos.tolist(), sumados):
+                filas.append((bien, periodo, flujo, agente, *valores))
+        columnas = ["bien", "periodo", "flujo"]
+        if por_agente is not None:
+            columnas.append(por_agente)
+        return pd.DataFrame(filas, columns=columnas + list(MEDIDAS))
+
+    def flujos_frontera(
+        self,
+        bien: Optional[str] = None,
+        periodos: Optional[Iterable[int]] = None,
+        por_agente: Optional[str] = None,
+    ):
+        """
+        Flujos que cruzan la frontera de la zona franca (NCT->ZF y ZF->NCT).
+
+        :param por_agente: "vendedor" o "comprador" para desagregar por agente.
+        :return: DataFrame con bien, periodo, flujo (y agente) y las medidas.
+        """
+        return self._totales(
+            self._seleccion(bien, periodos, FLUJOS_FRONTERA), por_agente
+        )
+
+    def fuga_iva(
+        self, bien: Optional[str] = None, periodos: Optional[Iterable[int]] = None
+    ):
+        """
+        IVA teórico, cobrado y fuga (teórico - cobrado) por dirección del flujo.
+        """
+        tabla = self._totales(self._seleccion(bien, periodos))
+        resumen = tabla.groupby("flujo")[["valor", "iva_teorico", "iva"]].sum()
+        resumen["fuga"] = resumen["iva_teorico"] - resumen["iva"]
+        return resumen.reindex(FLUJOS, fill_value=0.0)
+
+    def fuga_cadena(
+        self,
+        agente: int,
+        saltos: int = 3,
+        bien: Optional[str] = None,
+        periodos: Optional[Iterable[int]] = None,
+    ):
+        """
+        Fuga de IVA aguas abajo de un agente.
+
+        En el primer salto se toman todas las ventas del agente. En cada salto
+        siguiente, de cada comprador se atribuye a la cadena la fracción de sus
+        compras que vino del salto anterior, y esa misma fracción de sus ventas.
+
+        :return: DataFrame por salto con el valor, el IVA teórico, el IVA cobrado
+                 y la fuga atribuidos a la cadena.
+        """
+        import pandas as pd
+
+        matrices = [matriz for _, matriz in self._seleccion(bien, periodos)]
+        n = self._n_agentes
+        comprado = np.zeros(n)
+        for matriz in matrices:
+            _, compradores, datos = matriz.tripletas()
+            comprado += np.bincount(compradores, weights=datos[:, 0], minlength=n)
+
+        fraccion = np.zeros(n)
+        if agente < n:
+            fraccion[agente] = 1.0
+        filas = []
+        for salto in range(1, saltos + 1):
+            recibido = np.zeros(n)
+            totales = np.zeros(len(MEDIDAS))
+            for matriz in matrices:
+                vendedores, _, datos = matriz.tripletas()
+                totales += fraccion[vendedores] @ datos
+                recibido += matriz.multiplicar_izquierda(fraccion, datos[:, 0])
+            valor, _, iva, _, iva_teorico, _ = totales
+            filas.append(
+                {
+                    "salto": salto,
+                    "valor": valor,
+                    "iva_teorico": iva_teorico,
+                    "iva": iva,
+                    "fuga": iva_teorico - iva,
+                }
+            )
+            fraccion = np.minimum(
+                np.divide(recibido, comprado, out=np.zeros(n), where=comprado > 0),
+                1.0,
+            )
+            if not fraccion.any():
+                break
+        return pd.DataFrame(filas).set_index("salto")
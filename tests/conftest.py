@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Los módulos del modelo viven en la raíz del repositorio
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
@@ -0,0 +1,35 @@
+from benchmarks.suite import ejecutar, regresiones
+
+
+def _registro(nombre, ops_por_segundo, umbral=None):
+    return {
+        "nombre": nombre,
+        "operaciones": 1,
+        "segundos": 1 / ops_por_segundo,
+        "ops_por_segundo": ops_por_segundo,
+        "umbral": umbral,
+    }
+
+
+def test_regresiones_por_umbral_y_linea_base():
+    registros = [
+        _registro("rapido", 1_000.0, umbral=500),
+        _registro("lento", 100.0, umbral=500),
+        _registro("sin_umbral", 70.0),
+    ]
+    linea_base = {"resultados": [_registro("sin_umbral", 100.0)]}
+    problemas = regresiones(registros, linea_base, tolerancia=0.25)
+    assert len(problemas) == 2
+    assert problemas[0].startswith("lento:")
+    assert problemas[1].startswith("sin_umbral:")
+    assert regresiones(registros, linea_base, tolerancia=0.5) == [problemas[0]]
+
+
+def test_suite_a_escala_reducida():
+    registros = ejecutar(escala=0.001, solo="remove_lote")
+    assert [r["nombre"] for r in registros] == [
+        "remove_lote_FIFO",
+        "remove_lote_LIFO",
+        "remove_lote_WeightedAverage",
+    ]
+    assert all(r["operaciones"] > 0 and r["umbral"] for r in registros)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from bom import ResolutorInsumos
+from model import BienExento, BienGravado
+
+
+def _bienes():
+    camisa = BienExento("camisa_bom", 40, 0.0, insumos={"tela_bom": 2, "boton_bom": 4})
+    tela = BienGravado("tela_bom", 10, 0.19, 0.0, insumos={"hilo_bom": 3})
+    return camisa, tela
+
+
+def test_requerimientos_de_todos_los_niveles():
+    resolutor = ResolutorInsumos(_bienes())
+    assert resolutor.requerimientos_totales("camisa_bom", 2) == {
+        "tela_bom": 4.0,
+        "boton_bom": 8.0,
+        "hilo_bom": 12.0,
+    }
+    assert resolutor.materias_primas("camisa_bom") == {
+        "boton_bom": 4.0,
+        "hilo_bom": 6.0,
+    }
+    orden = resolutor.orden_topologico()
+    assert orden.index("hilo_bom") < orden.index("tela_bom") < orden.index("camisa_bom")
+    np.testing.assert_array_equal(
+        resolutor.requerimientos_lote(["camisa_bom", "tela_bom"], [1, 2]),
+        [0.0, 2.0, 4.0, 12.0],
+    )
+
+
+def test_ciclo_al_construir():
+    camisa, tela = _bienes()
+    tela.insumos["camisa_bom"] = 0.5
+    with pytest.raises(ValueError, match=r"ciclo: \['camisa_bom', 'tela_bom'\]"):
+        ResolutorInsumos([camisa, tela])
+
+
+def test_ciclo_introducido_despues():
+    camisa, tela = _bienes()
+    resolutor = ResolutorInsumos([camisa, tela])
+    resolutor.requerimientos_totales("camisa_bom")
+
+    tela.insumos["camisa_bom"] = 1
+    for _ in range(2):
+        with pytest.raises(ValueError, match="ciclo"):
+            resolutor.requerimientos_totales("camisa_bom")
+
+    # Al romper el ciclo el resolutor vuelve a responder
+    del tela.insumos["camisa_bom"]
+    assert resolutor.requerimientos_totales("camisa_bom")["hilo_bom"] == 6.0
+
+
+def test_cache_se_invalida_al_cambiar_insumos():
+    camisa, tela = _bienes()
+    resolutor = ResolutorInsumos([camisa, tela])
+    assert resolutor.requerimientos_totales("camisa_bom")["hilo_bom"] == 6.0
+    tela.insumos["hilo_bom"] = 5
+    assert resolutor.requerimientos_totales("camisa_bom")["hilo_bom"] == 10.0
+    assert resolutor.requerimientos_directos("tela_bom", 2) == {"hilo_bom": 10.0}
+
+
+def test_bien_desconocido():
+    with pytest.raises(ValueError, match="no está en el resolutor"):
+        ResolutorInsumos(_bienes()).requerimientos_totales("pantalon_bom")
@@ -0,0 +1,59 @@
+import copy
+import gc
+
+import numpy as np
+
+from catalogo import CatalogoBienes
+from model import BienExento, BienGravado
+
+
+def test_bienes_iguales_comparten_fila():
+    catalogo = CatalogoBienes()
+    a = BienGravado("pan", 10, 0.19, 0.0, catalogo=catalogo)
+    b = BienGravado("pan", 10, 0.19, 0.0, catalogo=catalogo)
+    c = BienExento("pan", 10, 0.0, catalogo=catalogo)
+    assert a.id == b.id != c.id
+    assert a.sku == c.sku
+    assert len(catalogo) == 2
+
+
+def test_copia_al_escribir():
+    catalogo = CatalogoBienes()
+    original = BienGravado("leche", 10, 0.19, 0.0, catalogo=catalogo)
+    copia = copy.copy(original)
+    assert copia.id == original.id
+    copia.price = 12
+    assert copia.id != original.id
+    assert (original.price, copia.price) == (10.0, 12.0)
+
+
+def test_renombrar_bien_compartido():
+    catalogo = CatalogoBienes()
+    original = BienGravado("arroz", 10, 0.19, 0.05, catalogo=catalogo)
+    copia = copy.copy(original)
+    copia.name = "arroz_integral"
+    assert original.name == "arroz"
+    assert copia.name == "arroz_integral"
+    assert copia.sku == catalogo.sku("arroz_integral") != original.sku
+    assert (copia.price, copia.iva_rate, copia.tariff) == (10.0, 0.19, 0.05)
+
+    # De vuelta al nombre original comparte otra vez la fila
+    copia.name = "arroz"
+    assert copia.id == original.id
+    assert len(catalogo) == 1
+
+
+def test_atributos_por_defecto_excluye_filas_libres():
+    catalogo = CatalogoBienes()
+    bienes = [BienGravado(f"b{i}", i, 0.19, 0.0, catalogo=catalogo) for i in range(4)]
+    libre = bienes.pop(1).id
+    gc.collect()
+
+    atributos = catalogo.atributos()
+    assert libre not in atributos["id"].tolist()
+    np.testing.assert_array_equal(atributos["id"], [b.id for b in bienes])
+    np.testing.assert_array_equal(atributos["precio"], [0.0, 2.0, 3.0])
+
+    # Con ids explícitos se lee cualquier fila del catálogo
+    explicitos = catalogo.atributos([libre, bienes[0].id])
+    np.testing.assert_array_equal(explicitos["id"], [libre, bienes[0].id])
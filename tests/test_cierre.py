@@ -0,0 +1,83 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import model
+from accounting_motor import MotorContable
+from cierre import CierrePeriodos
+from ledger import Ledger
+
+
+def _venta(motor, agentes, precio, costo):
+    motor.contabilizar(
+        "venta_mercancia_no_producida",
+        agentes,
+        {
+            "precio_total": precio,
+            "monto_iva": 0.19 * precio,
+            "precio_con_iva": 1.19 * precio,
+            "costo_total": costo,
+        },
+    )
+
+
+def _periodos(registrar=False):
+    """Compra y venta en el periodo 0; otra venta de un solo agente en el 1."""
+    ledger = Ledger()
+    agentes = [ledger.nuevo_agente("NCT"), ledger.nuevo_agente("ZF")]
+    motor = MotorContable(ledger=ledger)
+    motor.contabilizar(
+        "compra_bien_final_comercializable",
+        agentes,
+        {"precio_total": 100.0, "monto_iva": 19.0, "precio_con_iva": 119.0},
+    )
+    _venta(motor, agentes, 60.0, 40.0)
+    cierre = CierrePeriodos(ledger, model.plantilla_1, agentes, registrar=registrar)
+    primero = cierre.cerrar()
+    ledger.periodo = 1
+    _venta(motor, agentes[0], 100.0, 50.0)
+    return ledger, agentes, primero, cierre.cerrar()
+
+
+def test_cierre_incremental():
+    _, _, primero, segundo = _periodos()
+    # El estado de resultados solo ve los movimientos de cada periodo
+    assert primero["estado_resultados"]["utilidad"].tolist() == [20.0, 20.0]
+    assert segundo["estado_resultados"]["utilidad"].tolist() == [50.0, 0.0]
+    assert segundo["estado_resultados"]["periodo"].tolist() == [1, 1]
+
+    # El balance acumula la utilidad en el patrimonio y cuadra
+    balance = segundo["balance_clases"]
+    assert balance["patrimonio"].tolist() == pytest.approx([70.0, 20.0])
+    assert balance["diferencia"].tolist() == pytest.approx([0.0, 0.0])
+
+    # El IVA a favor del primer periodo se descuenta en el segundo
+    iva = segundo["liquidacion_iva"]
+    assert primero["liquidacion_iva"]["saldo_a_favor"].tolist() == pytest.approx(
+        [7.6, 7.6]
+    )
+    assert iva["saldo_a_favor_anterior"].tolist() == pytest.approx([7.6, 7.6])
+    assert iva["saldo_a_pagar"].tolist() == pytest.approx([11.4, 0.0])
+    assert iva["saldo_a_favor"].tolist() == pytest.approx([0.0, 7.6])
+
+
+def test_incremental_igual_a_un_solo_cierre():
+    ledger, agentes, _, segundo = _periodos()
+    completo = CierrePeriodos(ledger, model.plantilla_1, agentes).cerrar()
+    for tabla in ("balance_clases", "balance_grupos"):
+        pd.testing.assert_frame_equal(segundo[tabla], completo[tabla])
+
+
+def test_asientos_de_cierre_saldan_los_resultados():
+    ledger, agentes, primero, segundo = _periodos(registrar=True)
+    _, _, primero_sin, segundo_sin = _periodos(registrar=False)
+    for con, sin in ((primero, primero_sin), (segundo, segundo_sin)):
+        for tabla in con:
+            pd.testing.assert_frame_equal(con[tabla], sin[tabla])
+
+    for agente, utilidad in zip(agentes, (70.0, 20.0)):
+        for codigo in (4120, 6120):
+            debe, haber, _ = ledger.totales(agente, codigo)
+            assert debe - haber == pytest.approx(0.0)
+        debe, haber, _ = ledger.totales(agente, 3605)
+        assert haber - debe == pytest.approx(utilidad)
@@ -0,0 +1,39 @@
+import pytest
+
+from ledger import Ledger
+from model import Account
+
+
+def _cuenta():
+    return Account("CAJA", 1, codigo=1105, ledger=Ledger())
+
+
+def test_historial_desde_el_libro_mayor():
+    cuenta = _cuenta()
+    cuenta.registrar_transaccion(debe=100)
+    cuenta.registrar_transaccion(haber=30)
+    assert cuenta.historial == {
+        1: {"debe": 100.0, "haber": 0.0},
+        2: {"debe": 0.0, "haber": 30.0},
+    }
+    assert isinstance(cuenta.historial[1]["debe"], float)
+    assert cuenta.calcular_totales()["Neto"] == {"debe": 70.0}
+
+
+def test_historial_es_instantanea_de_solo_lectura():
+    cuenta = _cuenta()
+    cuenta.registrar_transaccion(debe=10)
+    historial = cuenta.historial
+    with pytest.raises(TypeError):
+        historial[2] = {"debe": 1.0, "haber": 0.0}
+    with pytest.raises(TypeError):
+        historial[1]["debe"] = 0.0
+
+    cuenta.registrar_transaccion(haber=5)
+    assert len(historial) == 1
+    assert len(cuenta.historial) == 2
+
+
+def test_registrar_rechaza_valores_no_numericos():
+    with pytest.raises(ValueError):
+        _cuenta().registrar_transaccion(debe="10")
@@ -0,0 +1,69 @@
+import pytest
+
+import model
+from ledger import Ledger
+from model import NCT, Account
+
+
+def _agente():
+    return NCT("cuentas", model.plantilla_1, [], [], ledger=Ledger())
+
+
+def _como_diccionario(agente):
+    plan = agente.plan_cuentas
+    return {codigo: plan.nombre(codigo) for codigo in plan.codigos}
+
+
+def test_cuentas_se_crean_al_primer_acceso():
+    agente = _agente()
+    assert agente.cuentas.creadas == 0
+    assert len(agente.cuentas) == len(agente.plan_cuentas)
+
+    codigo = agente.plan_cuentas.codigos[0]
+    cuenta = agente.cuentas[codigo]
+    assert agente.cuentas.creadas == 1
+    assert agente.cuentas[codigo] is cuenta
+    assert agente.get_account_by_name(cuenta.name) is cuenta
+    assert agente.get_account_by_code(-1) is None
+    with pytest.raises(KeyError):
+        agente.cuentas[-1]
+    # Consultar pertenencia o recorrer los códigos no crea cuentas
+    assert codigo in agente.cuentas and -1 not in agente.cuentas
+    assert list(agente.cuentas) == list(agente.plan_cuentas.codigos)
+    assert agente.cuentas.creadas == 1
+
+
+def test_cuenta_creada_tarde_ve_los_saldos_del_libro():
+    agente = _agente()
+    codigo = agente.plan_cuentas.codigos[0]
+    agente.ledger.registrar(agente.agente_id, codigo, debe=25.0)
+    cuenta = agente.cuentas[codigo]
+    assert cuenta.calcular_totales()["Debe"] == 25.0
+
+
+def test_asignar_y_borrar_como_un_diccionario():
+    agente = _agente()
+    esperado = _como_diccionario(agente)
+    primero, segundo = agente.plan_cuentas.codigos[:2]
+    nueva = Account("NUEVA", 1, codigo=999999, ledger=agente.ledger)
+    reemplazo = Account("REEMPLAZO", 1, codigo=segundo, ledger=agente.ledger)
+
+    agente.cuentas[999999] = nueva
+    esperado[999999] = "NUEVA"
+    agente.cuentas[segundo] = reemplazo
+    esperado[segundo] = "REEMPLAZO"
+    del agente.cuentas[primero]
+    del esperado[primero]
+    with pytest.raises(KeyError):
+        del agente.cuentas[primero]
+
+    assert list(agente.cuentas) == list(esperado)
+    assert len(agente.cuentas) == len(esperado)
+    assert {c: cuenta.name for c, cuenta in agente.cuentas.items()} == esperado
+    assert agente.cuentas[999999] is nueva
+    assert agente.get_account_by_name("REEMPLAZO") is reemplazo
+
+    # Volver a asignar una borrada la agrega al final
+    agente.cuentas[primero] = nueva
+    esperado[primero] = "NUEVA"
+    assert list(agente.cuentas) == list(esperado)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from accounting_motor import MotorContable
+from diario import DiarioColumnar, LectorDiario
+from ledger import Ledger
+
+
+def _ventas(motor, agentes, precios):
+    precios = np.asarray(precios, dtype=np.float64)
+    motor.contabilizar(
+        "venta_mercancia_no_producida",
+        agentes,
+        {
+            "precio_total": precios,
+            "monto_iva": precios * 0.19,
+            "precio_con_iva": precios * 1.19,
+            "costo_total": precios * 0.5,
+        },
+    )
+
+
+def _diario(directorio):
+    ledger = Ledger()
+    zf = ledger.nuevo_agente("ZF")
+    nct = ledger.nuevo_agente("NCT")
+    motor = MotorContable(ledger=ledger)
+    with DiarioColumnar(directorio, filas_por_bloque=7).conectar(ledger):
+        _ventas(motor, [zf, nct, zf], [100.0, 200.0, 50.0])
+        ledger.periodo = 1
+        _ventas(motor, nct, 10.0)
+    return ledger, zf, nct
+
+
+def test_lectura_por_bloques_igual_al_libro_mayor(tmp_path):
+    ledger, zf, nct = _diario(tmp_path)
+    lector = LectorDiario(tmp_path)
+    assert len(lector) == len(ledger)
+    bloques = list(lector.bloques())
+    assert len(bloques) > 1
+    assert all(len(b["agente"]) <= 7 for b in bloques)
+    assert isinstance(bloques[0]["debe"], np.memmap)
+    assert lector.plantillas[0] == "venta_mercancia_no_producida"
+
+    for agente in (zf, nct):
+        debe, haber = ledger.movimientos(agente, 1105)
+        movimientos = lector.movimientos(agente, 1105)
+        np.testing.assert_array_equal(movimientos["debe"], debe)
+        np.testing.assert_array_equal(movimientos["haber"], haber)
+    np.testing.assert_array_equal(lector.movimientos(nct, 1105)["periodo"], [0, 1])
+
+
+def test_balance_de_comprobacion(tmp_path):
+    pytest.importorskip("pandas")
+    ledger, zf, nct = _diario(tmp_path)
+    balance = LectorDiario(tmp_path).balance_comprobacion()
+    for fila in balance.itertuples():
+        debe, haber, _ = ledger.totales(fila.agente, fila.codigo)
+        assert (fila.debe, fila.haber) == pytest.approx((debe, haber))
+    assert set(balance["tipo"]) == {"ZF", "NCT"}
+
+    hasta_cero = LectorDiario(tmp_path).balance_comprobacion(hasta_periodo=0)
+    caja = hasta_cero.set_index(["agente", "codigo"]).loc[(nct, 1105)]
+    assert caja["debe"] == pytest.approx(200 * 1.19)
+
+
+def test_version_desconocida(tmp_path):
+    _diario(tmp_path)
+    manifiesto = tmp_path / "diario.json"
+    manifiesto.write_text(
+        manifiesto.read_text().replace('"version": 1', '"version": 99')
+    )
+    with pytest.raises(ValueError, match="no soportada"):
+        LectorDiario(tmp_path)
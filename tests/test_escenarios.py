@@ -0,0 +1,57 @@
+import pytest
+
+import model
+from escenarios import EjecutorEscenarios, muestra_aleatoria, rejilla, simular_escenario
+from model import BienExento, BienGravado
+
+
+def _bienes():
+    return [
+        BienGravado("cafe_esc", 100, 0.19, 0.1),
+        BienExento("libro_esc", 50, 0.05),
+    ]
+
+
+def test_rejilla_y_muestra_reproducible():
+    assert rejilla(iva_rate=[0.05, 0.19], tariff=[0, 0.1]) == [
+        {"iva_rate": 0.05, "tariff": 0},
+        {"iva_rate": 0.05, "tariff": 0.1},
+        {"iva_rate": 0.19, "tariff": 0},
+        {"iva_rate": 0.19, "tariff": 0.1},
+    ]
+    muestra = muestra_aleatoria(5, semilla=3, iva_rate=(0.0, 0.2), national_VAT=[0, 1])
+    assert muestra == muestra_aleatoria(
+        5, semilla=3, iva_rate=(0.0, 0.2), national_VAT=[0, 1]
+    )
+    assert all(0.0 <= e["iva_rate"] <= 0.2 for e in muestra)
+
+
+def test_simulacion_zona_franca_contra_nacional():
+    bienes = _bienes()
+    contexto = {"plantillas_cuentas": model.plantilla_1, "bienes": bienes}
+    resumen = simular_escenario({}, contexto)
+    # Desde la ZF se paga arancel y el IVA de importación lo incluye en la base
+    assert resumen["arancel_ZF"] == pytest.approx(100 * 100 * 0.1 + 100 * 50 * 0.05)
+    assert resumen["iva_ZF"] == pytest.approx(11_000 * 0.19)
+    assert resumen["arancel_NCT"] == 0.0
+    assert resumen["iva_NCT"] == pytest.approx(10_000 * 0.19)
+    assert resumen["margen_ZF"] == resumen["margen_NCT"] == pytest.approx(6_000)
+
+    sin_arancel = simular_escenario({"iva_rate": 0.05, "tariff": 0.0}, contexto)
+    assert sin_arancel["arancel_ZF"] == 0.0
+    assert sin_arancel["iva_ZF"] == pytest.approx(500)
+    # Los bienes del contexto no cambian
+    assert (bienes[0].iva_rate, bienes[0].tariff) == (0.19, 0.1)
+
+
+def test_ejecutor_igual_a_la_simulacion_directa():
+    bienes = _bienes()
+    contexto = {"plantillas_cuentas": model.plantilla_1, "bienes": bienes}
+    escenarios = rejilla(iva_rate=[0.05, 0.19], tariff=[0, 0.1])
+    ejecutor = EjecutorEscenarios(model.plantilla_1, bienes, procesos=2)
+    resultados = sorted(ejecutor.ejecutar(escenarios), key=lambda r: r["escenario"])
+    assert [r["escenario"] for r in resultados] == [0, 1, 2, 3]
+    for resultado, parametros in zip(resultados, escenarios):
+        assert resultado["parametros"] == parametros
+        esperado = simular_escenario(parametros, contexto)
+        assert {k: resultado[k] for k in esperado} == pytest.approx(esperado)
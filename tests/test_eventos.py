@@ -0,0 +1,86 @@
+import copy
+
+import pytest
+
+import model
+from eventos import BitacoraEventos
+from model import BienGravado
+
+
+def _bitacora():
+    cafe = BienGravado("cafe_ev", 100, 0.19, 0.1)
+    bitacora = BitacoraEventos(model.plantilla_1, [cafe])
+    bitacora.agregar_agente("ZF", "zf", ["cafe_ev"])
+    bitacora.agregar_agente("NCT", "nct")
+    bitacora.comprar("zf", "cafe_ev", 10, 60.0)
+    bitacora.transaccion("zf", "nct", "cafe_ev", 4)
+    bitacora.avanzar_periodo()
+    bitacora.transaccion("zf", "nct", "cafe_ev", 3)
+    return bitacora, cafe
+
+
+def _existencias(estado, agente="zf"):
+    return estado.agente(agente).inventory.get_total_quantity("cafe_ev")
+
+
+def _iva(estado, agente="nct"):
+    return estado.ledger.totales(estado.agente(agente).agente_id, 2408)[:2]
+
+
+def test_estado_en_un_periodo_anterior():
+    bitacora, _ = _bitacora()
+    anterior = bitacora.estado_en(0)
+    assert _existencias(anterior) == 6
+    assert _iva(anterior) == pytest.approx((440 * 0.19, 0.0))
+    assert anterior.ledger.periodo == 0
+    # Reconstruir no cambia la bitácora
+    assert _existencias(bitacora.estado) == 3
+    with pytest.raises(ValueError, match="aún no ha ocurrido"):
+        bitacora.estado_en(5)
+
+
+def test_bifurcacion_con_otros_bienes():
+    bitacora, cafe = _bitacora()
+    eventos = len(bitacora)
+    cafe_reducido = copy.copy(cafe)
+    cafe_reducido.iva_rate = 0.05
+
+    rama = bitacora.bifurcar(0, [cafe_reducido])
+    assert len(rama) == eventos - 1
+    assert _existencias(rama.estado) == 6
+    resumen = rama.transaccion("zf", "nct", "cafe_ev", 2)
+    assert resumen["monto_iva"] == pytest.approx(220 * 0.05)
+
+    # La bitácora de origen no cambia y la rama conserva su historia
+    assert len(bitacora) == eventos
+    assert _existencias(bitacora.estado) == 3
+    assert _existencias(rama.estado) == 4
+    assert _iva(rama.estado) == pytest.approx((440 * 0.19 + 220 * 0.05, 0.0))
+    assert [e.tipo for e in rama.eventos()][-1] == "transaccion"
+
+
+def test_evento_fallido_se_revierte():
+    bitacora, _ = _bitacora()
+    eventos = len(bitacora)
+    agente = bitacora.agente("zf")
+    iva = _iva(bitacora.estado)
+
+    # Validado pero imposible de aplicar: el asiento no cuadra
+    with pytest.raises(ValueError, match="no cuadran"):
+        bitacora.contabilizar(
+            "compra_bien_final_comercializable",
+            "nct",
+            {"precio_total": 100.0, "monto_iva": 19.0, "precio_con_iva": 1.0},
+        )
+    assert len(bitacora) == eventos
+    # El estado se reconstruye desde la última instantánea y los eventos
+    assert bitacora.agente("zf") is not agente
+    assert _existencias(bitacora.estado) == 3
+    assert _iva(bitacora.estado) == pytest.approx(iva)
+
+    # Los errores de validación no llegan a registrarse
+    with pytest.raises(ValueError, match="No hay suficiente inventario"):
+        bitacora.transaccion("zf", "nct", "cafe_ev", 5)
+    with pytest.raises(ValueError, match="No existe el bien"):
+        bitacora.comprar("zf", "te_ev", 1, 1.0)
+    assert len(bitacora) == eventos
@@ -0,0 +1,65 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import RAIZ
+
+MODULOS_PESADOS = ("pandas", "openpyxl")
+
+PROGRAMA = """
+import json, sys
+import {modulo}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+@pytest.mark.parametrize(
+    "modulo", ["model", "planificador", "cierre", "impuestos", "red_comercial"]
+)
+def test_importar_no_carga_pandas(modulo):
+    salida = subprocess.run(
+        [sys.executable, "-c", PROGRAMA.format(modulo=modulo)],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cargados = set(json.loads(salida.stdout))
+    assert not cargados & set(MODULOS_PESADOS)
+
+
+def test_importar_clases_sin_efectos():
+    programa = (
+        "import model\n"
+        "from model import Account, Agent, Good, Inventory, Transaction\n"
+        "print('plantilla_1' in vars(model))"
+    )
+    salida = subprocess.run(
+        [sys.executable, "-c", programa],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # La plantilla solo se carga cuando se pide
+    assert salida.stdout.strip() == "False"
+
+
+def test_importar_modelo_dentro_del_presupuesto():
+    from benchmarks.suite import PROGRAMA_IMPORTACION, UMBRALES
+
+    presupuesto = 1 / UMBRALES["importar_modelo"]
+    # La mejor de varias corridas, para no fallar por una máquina ocupada
+    segundos = []
+    for _ in range(3):
+        salida = subprocess.run(
+            [sys.executable, "-c", PROGRAMA_IMPORTACION],
+            cwd=RAIZ,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        segundos.append(json.loads(salida.stdout)["segundos"])
+    assert min(segundos) < presupuesto
@@ -0,0 +1,97 @@
+import pytest
+
+from catalogo import ESTADOS_IVA
+from impuestos import MotorImpuestos
+from ledger import Ledger
+
+pytest.importorskip("pandas")
+
+GRAVADA, EXENTA, EXCLUIDA = (
+    ESTADOS_IVA.index(e) for e in ("gravado", "exento", "excluido")
+)
+
+
+def _motor(**opciones):
+    ledger = Ledger()
+    mixto, exportador, sin_ventas, proveedor = (
+        ledger.nuevo_agente("NCT") for _ in range(4)
+    )
+    motor = MotorImpuestos(ledger, [mixto, exportador, sin_ventas], **opciones)
+    return motor, mixto, exportador, sin_ventas, proveedor
+
+
+def _comprar(motor, comprador, proveedor, iva, periodo):
+    motor.registrar(
+        proveedor, comprador, GRAVADA, iva / 0.19, iva, iva, 0.0, False, periodo
+    )
+
+
+def _vender(motor, vendedor, estado, valor, iva, periodo, comprador):
+    motor.registrar(vendedor, comprador, estado, valor, iva, iva, 0.0, False, periodo)
+
+
+def _periodo_0(motor, mixto, exportador, sin_ventas, proveedor):
+    _comprar(motor, mixto, proveedor, 100.0, 0)
+    _comprar(motor, exportador, proveedor, 50.0, 0)
+    _comprar(motor, sin_ventas, proveedor, 10.0, 0)
+    _vender(motor, mixto, GRAVADA, 600.0, 114.0, 0, proveedor)
+    _vender(motor, mixto, EXCLUIDA, 400.0, 0.0, 0, proveedor)
+    _vender(motor, exportador, EXENTA, 500.0, 0.0, 0, proveedor)
+
+
+def test_prorrata_del_iva_descontable():
+    motor, mixto, exportador, sin_ventas, proveedor = _motor()
+    _periodo_0(motor, mixto, exportador, sin_ventas, proveedor)
+    tabla = motor.liquidar(0)
+
+    # El proveedor no se liquida aunque aparezca en las transacciones
+    assert tabla.index.tolist() == [mixto, exportador, sin_ventas]
+    assert tabla.loc[mixto, "prorrata"] == pytest.approx(0.6)
+    assert tabla.loc[mixto, "iva_descontable"] == pytest.approx(60.0)
+    assert tabla.loc[mixto, "iva_no_descontable"] == pytest.approx(40.0)
+    assert tabla.loc[mixto, "iva_a_pagar"] == pytest.approx(54.0)
+    # Las exentas dan derecho; sin ventas se descuenta todo
+    assert tabla.loc[exportador, "prorrata"] == 1.0
+    assert tabla.loc[sin_ventas, "prorrata"] == 1.0
+    assert tabla.loc[sin_ventas, "saldo_a_favor"] == pytest.approx(10.0)
+
+
+def test_prorrata_segun_el_tratamiento():
+    motor, mixto, exportador, sin_ventas, proveedor = _motor(
+        exentos_descontables=False, excluidos_descontables=True
+    )
+    _periodo_0(motor, mixto, exportador, sin_ventas, proveedor)
+    tabla = motor.liquidar(0)
+    assert tabla.loc[mixto, "prorrata"] == 1.0
+    assert tabla.loc[mixto, "iva_a_pagar"] == pytest.approx(14.0)
+    assert tabla.loc[exportador, "prorrata"] == 0.0
+    assert tabla.loc[exportador, "iva_no_descontable"] == pytest.approx(50.0)
+    assert tabla.loc[exportador, "saldo_a_favor"] == 0.0
+
+
+def test_saldo_a_favor_se_arrastra():
+    motor, mixto, exportador, sin_ventas, proveedor = _motor()
+    _periodo_0(motor, mixto, exportador, sin_ventas, proveedor)
+    assert motor.liquidar(0).loc[exportador, "saldo_a_favor"] == pytest.approx(50.0)
+
+    _vender(motor, exportador, GRAVADA, 157.9, 30.0, 1, proveedor)
+    primero = motor.liquidar(1)
+    assert primero.loc[exportador, "saldo_a_favor_anterior"] == pytest.approx(50.0)
+    assert primero.loc[exportador, "iva_a_pagar"] == 0.0
+    assert primero.loc[exportador, "saldo_a_favor"] == pytest.approx(20.0)
+
+    # Un periodo sin transacciones conserva el saldo
+    vacio = motor.liquidar(2)
+    assert vacio.loc[exportador, "saldo_a_favor"] == pytest.approx(20.0)
+    assert vacio.loc[mixto, "iva_a_pagar"] == 0.0
+
+    _vender(motor, exportador, GRAVADA, 157.9, 30.0, 3, proveedor)
+    segundo = motor.liquidar(3)
+    assert segundo.loc[exportador, "iva_a_pagar"] == pytest.approx(10.0)
+    assert segundo.loc[exportador, "saldo_a_favor"] == 0.0
+    assert motor.periodos == [0, 1, 2, 3]
+
+    with pytest.raises(ValueError):
+        motor.liquidar(3)
+    with pytest.raises(ValueError):
+        _vender(motor, exportador, GRAVADA, 1.0, 0.19, 2, proveedor)
@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+import model
+from accounting_motor import MotorContable
+from ingesta import IngestaTransacciones, validar_fila
+from ledger import Ledger
+from transacciones import LiquidadorTransacciones
+
+ENCABEZADO = (
+    "vendedor,tipo_vendedor,comprador,tipo_comprador,bien,precio,iva_rate,cantidad"
+)
+
+
+@pytest.fixture
+def ingesta():
+    liquidador = LiquidadorTransacciones(MotorContable(ledger=Ledger()), tamano_lote=4)
+    return IngestaTransacciones(model.plantilla_1, liquidador=liquidador, tamano_lote=3)
+
+
+@pytest.mark.parametrize(
+    "fila",
+    [
+        {"bien": "b", "precio": 1, "cantidad": 1},
+        {
+            "comprador": "A",
+            "tipo_comprador": "XX",
+            "bien": "b",
+            "precio": 1,
+            "cantidad": 1,
+        },
+        {"comprador": "A", "tipo_comprador": "ZF", "precio": 1, "cantidad": 1},
+        {
+            "comprador": "A",
+            "tipo_comprador": "ZF",
+            "bien": "b",
+            "precio": 1,
+            "cantidad": 0,
+        },
+        {
+            "comprador": "A",
+            "tipo_comprador": "ZF",
+            "bien": "b",
+            "precio": -1,
+            "cantidad": 1,
+        },
+        {
+            "comprador": "A",
+            "tipo_comprador": "ZF",
+            "bien": "b",
+            "precio": 1,
+            "cantidad": 1,
+            "iva_rate": 19,
+        },
+        {
+            "comprador": "A",
+            "tipo_comprador": "ZF",
+            "bien": "b",
+            "status_iva": "otro",
+            "precio": 1,
+            "cantidad": 1,
+        },
+    ],
+)
+def test_validar_fila_rechaza(fila):
+    with pytest.raises(ValueError):
+        validar_fila(fila, "f", 1)
+
+
+def test_rechazos_con_archivo_y_linea(tmp_path, ingesta):
+    csv = tmp_path / "a.csv"
+    csv.write_text(
+        "\n".join(
+            [
+                ENCABEZADO,
+                ",,A,ZF,lana,10,0.19,5",  # Compra a un proveedor externo
+                "A,ZF,B,NCT,lana,12,0.19,3",
+                "A,ZF,B,NCT,lana,12,0.19,3",  # Ya no hay inventario
+                "A,ZF,B,XX,lana,12,0.19,1",  # Tipo inválido
+            ]
+        )
+        + "\n"
+    )
+    jsonl = tmp_path / "b.jsonl"
+    jsonl.write_text(
+        "\n".join(
+            [
+                json.dumps([1, 2]),
+                json.dumps(
+                    {
+                        "comprador": "C",
+                        "tipo_comprador": "NCT",
+                        "bien": "lana",
+                        "precio": 1,
+                        "cantidad": 2,
+                    }
+                ),
+                "{no es json",
+            ]
+        )
+        + "\n"
+    )
+
+    resumen = ingesta.ejecutar([csv, jsonl])
+
+    assert resumen["leidos"] == 7
+    assert resumen["aplicados"] == 3
+    assert resumen["rechazados"] == 4
+    rechazos = {(archivo, linea): motivo for archivo, linea, motivo in ingesta.rechazos}
+    assert set(rechazos) == {
+        (str(csv), 4),
+        (str(csv), 5),
+        (str(jsonl), 1),
+        (str(jsonl), 3),
+    }
+    assert "inventario" in rechazos[(str(csv), 4)]
+    assert rechazos[(str(jsonl), 1)] == "La fila no es un objeto JSON."
+    assert ingesta.agentes["A"].inventory.get_total_quantity("lana") == 2
+    assert ingesta.agentes["B"].inventory.get_total_quantity("lana") == 3
+    assert ingesta.agentes["C"].inventory.get_total_quantity("lana") == 2
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import model
+from instrumentacion import Instrumentacion, Metrica
+from ledger import Ledger
+from model import NCT, ZF, Agent, BienGravado, Inventory
+
+
+def _comercio():
+    ledger = Ledger()
+    bien = BienGravado("bien_ins", 10, 0.19, 0.0)
+    zf = ZF("zf_ins", model.plantilla_1, [], [], ledger=ledger)
+    nct = NCT("nct_ins", model.plantilla_1, [], [], ledger=ledger)
+    for costo in (1.0, 2.0, 3.0):
+        zf.purchase_good(bien, 5, costo)
+    zf.sell_good("bien_ins", 7, 10.0)
+    nct.purchase_good(bien, 1, 4.0)
+    return zf, nct
+
+
+def test_metricas_por_punto_tipo_y_bien(tmp_path):
+    with Instrumentacion() as instrumentacion:
+        _comercio()
+    metricas = instrumentacion.metricas
+    assert metricas["agente.purchase_good", "ZF", "bien_ins"].llamadas == 3
+    assert metricas["agente.purchase_good", "NCT", "bien_ins"].llamadas == 1
+    assert metricas["inventario.add_lote", "ZF", "bien_ins"].llamadas == 3
+    # Vender 7 unidades de lotes de 5 consume un lote completo
+    assert metricas["inventario.remove_lote", "ZF", "bien_ins"].unidades == 1
+
+    reporte = instrumentacion.reporte()
+    profundo = reporte["inventarios_profundos"][0]
+    assert (profundo["agente"], profundo["lotes"], profundo["maximo_lotes"]) == (
+        "zf_ins",
+        2,
+        3,
+    )
+    ruta = tmp_path / "reporte.json"
+    instrumentacion.exportar(ruta)
+    assert json.loads(ruta.read_text())["metricas"][0]["llamadas"] > 0
+
+
+def test_desactivar_restaura_los_metodos():
+    originales = (Inventory.add_lote, Inventory.remove_lote, Agent.sell_good)
+    with Instrumentacion():
+        assert Inventory.add_lote is not originales[0]
+        with pytest.raises(RuntimeError):
+            Instrumentacion().activar()
+    assert (Inventory.add_lote, Inventory.remove_lote, Agent.sell_good) == originales
+    with Instrumentacion() as otra:
+        pass
+    assert otra.metricas == {}
+
+
+def test_percentiles_del_histograma():
+    metrica = Metrica()
+    for nanosegundos in [100] * 98 + [5_000, 1_000_000]:
+        metrica.agregar(nanosegundos)
+    assert metrica.percentil(0.5) == 128
+    assert metrica.percentil(0.99) == 8192
+    assert metrica.maximo == 1_000_000
@@ -0,0 +1,45 @@
+import pytest
+
+from model import BienGravado, Inventory
+
+
+@pytest.fixture
+def bien():
+    return BienGravado("tela", 10, 0.19, 0.0)
+
+
+def _inventario(bien, metodo):
+    inventario = Inventory()
+    inventario.set_costing_method("tela", metodo)
+    inventario.add_lote(bien, 10, 2.0)
+    inventario.add_lote(bien, 10, 4.0)
+    return inventario
+
+
+@pytest.mark.parametrize(
+    "metodo, costo, valor_restante",
+    [
+        ("FIFO", 10 * 2.0 + 5 * 4.0, 5 * 4.0),
+        ("LIFO", 10 * 4.0 + 5 * 2.0, 5 * 2.0),
+        # Cobra el costo promedio, pero los lotes salen físicamente en orden FIFO
+        ("WeightedAverage", 15 * 3.0, 5 * 4.0),
+    ],
+)
+def test_costo_de_retiro(bien, metodo, costo, valor_restante):
+    inventario = _inventario(bien, metodo)
+    assert inventario.remove_lote("tela", 15) == pytest.approx(costo)
+    assert inventario.get_total_quantity("tela") == 5
+    assert inventario.get_total_value("tela") == pytest.approx(valor_restante)
+
+
+@pytest.mark.parametrize("metodo", ["FIFO", "LIFO", "WeightedAverage"])
+def test_retiro_completo_deja_agregados_en_cero(bien, metodo):
+    inventario = _inventario(bien, metodo)
+    inventario.remove_lote("tela", 20)
+    assert inventario.get_total_quantity("tela") == 0.0
+    assert inventario.get_total_value("tela") == 0.0
+
+
+def test_metodo_invalido(bien):
+    with pytest.raises(ValueError):
+        Inventory().set_costing_method("tela", "PEPS")
@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+import pytest
+
+from ledger import Ledger
+
+CODIGOS = np.array([1105, 1435, 2408, 4135])
+
+
+def _lotes(semilla, n_lotes=5, n=2_000, agentes=50):
+    generador = np.random.default_rng(semilla)
+    for _ in range(n_lotes):
+        yield (
+            generador.integers(0, agentes, n),
+            generador.choice(CODIGOS, n),
+            np.round(generador.lognormal(4.0, 1.0, n), 2),
+            np.round(generador.lognormal(4.0, 1.0, n), 2),
+        )
+
+
+@pytest.mark.parametrize("conservar", [True, False])
+def test_totales_iguales_a_suma_directa(conservar):
+    ledger = Ledger(conservar_movimientos=conservar)
+    debe = np.zeros((50, len(CODIGOS)))
+    haber = np.zeros((50, len(CODIGOS)))
+    conteo = np.zeros((50, len(CODIGOS)), dtype=np.int64)
+    for agentes, codigos, d, h in _lotes(1):
+        ledger.registrar_lote(agentes, codigos, d, h)
+        columnas = np.searchsorted(CODIGOS, codigos)
+        np.add.at(debe, (agentes, columnas), d)
+        np.add.at(haber, (agentes, columnas), h)
+        np.add.at(conteo, (agentes, columnas), 1)
+    ledger.registrar(3, 1105, debe=7.5)
+    debe[3, 0] += 7.5
+    conteo[3, 0] += 1
+
+    t_debe, t_haber, t_conteo = ledger.totales_matriz(np.arange(50), CODIGOS)
+    np.testing.assert_allclose(t_debe, debe, rtol=1e-12)
+    np.testing.assert_allclose(t_haber, haber, rtol=1e-12)
+    np.testing.assert_array_equal(t_conteo, conteo)
+    assert ledger.totales(3, 1105) == (t_debe[3, 0], t_haber[3, 0], t_conteo[3, 0])
+    if conservar:
+        assert len(ledger) == conteo.sum()
+        assert ledger.debe.sum() == pytest.approx(debe.sum())
+
+
+def test_totales_compensados_dentro_del_lote():
+    ledger = Ledger(compensado=True)
+    valores = np.tile([1e16, 1.0, -1e16], 100)
+    ledger.registrar_lote(np.zeros(valores.size, dtype=np.int64), 1105, valores, 0.0)
+    ledger.registrar_lote(np.zeros(3, dtype=np.int64), 2408, valores[:3], 0.0)
+    assert ledger.totales(0, 1105)[0] == 100.0
+    assert ledger.totales(0, 2408)[0] == 1.0
+
+
+def test_totales_compensados_frente_a_fsum():
+    generador = np.random.default_rng(2)
+    ledger = Ledger(compensado=True, conservar_movimientos=False)
+    valores_celda = {}
+    for _ in range(4):
+        agentes = generador.integers(0, 20, 3_000)
+        codigos = generador.choice(CODIGOS, 3_000)
+        debe = generador.choice([1e16, -1e16, 0.1, 3.3], 3_000) * generador.random(
+            3_000
+        ).round(1)
+        ledger.registrar_lote(agentes, codigos, debe, 0.0)
+        for agente, codigo, valor in zip(agentes.tolist(), codigos.tolist(), debe):
+            valores_celda.setdefault((agente, codigo), []).append(valor)
+    for (agente, codigo), valores in valores_celda.items():
+        exacto = math.fsum(valores)
+        assert abs(ledger.totales(agente, codigo)[0] - exacto) <= 2 * np.spacing(
+            abs(exacto)
+        )
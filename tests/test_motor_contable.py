@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from accounting_motor import MotorContable
+from ledger import Ledger
+
+PLANTILLAS = {
+    "venta": {
+        "debe": [(1105, "precio_con_iva")],
+        "haber": [(4120, "precio_total"), (2408, "monto_iva")],
+    }
+}
+
+
+def _motor():
+    ledger = Ledger()
+    ledger.nuevos_agentes(3)
+    return MotorContable(PLANTILLAS, ledger=ledger)
+
+
+def test_lote_cuadrado_se_contabiliza():
+    motor = _motor()
+    motor.contabilizar(
+        "venta",
+        [0, 1, 2],
+        {
+            "precio_total": np.array([100.0, 200.0, 0.1]),
+            "monto_iva": np.array([19.0, 38.0, 0.2]),
+            "precio_con_iva": np.array([119.0, 238.0, 0.1 + 0.2]),
+        },
+    )
+    assert len(motor.ledger) == 9
+    assert motor.ledger.debe.sum() == pytest.approx(motor.ledger.haber.sum())
+
+
+@pytest.mark.parametrize(
+    "precio_con_iva",
+    [120.0, np.nan, np.inf],
+    ids=["descuadre", "nan", "inf"],
+)
+def test_asiento_descuadrado_no_se_contabiliza(precio_con_iva):
+    motor = _motor()
+    with pytest.raises(ValueError, match="1 asiento\\(s\\) de 'venta' no cuadran"):
+        motor.contabilizar(
+            "venta",
+            [0, 1],
+            {
+                "precio_total": 100.0,
+                "monto_iva": np.array([19.0, 19.0]),
+                "precio_con_iva": np.array([119.0, precio_con_iva]),
+            },
+        )
+    assert len(motor.ledger) == 0
+
+
+def test_variables_faltantes():
+    with pytest.raises(ValueError, match="Faltan variables"):
+        _motor().calcular_lineas("venta", {"precio_total": 1.0})
+
+
+def test_tolerancia_relativa():
+    motor = _motor()
+    debe, haber = motor.calcular_lineas(
+        "venta",
+        {"precio_total": 1e9, "monto_iva": 0.0, "precio_con_iva": 1e9 + 1e-3},
+    )
+    assert debe.sum() == pytest.approx(haber.sum())
@@ -0,0 +1,40 @@
+from plan_cuentas import PlanCuentas
+
+PLANTILLAS = {
+    1105: {"codigo_tipo_cuenta": 1, "cuenta": "CAJA"},
+    1435: {"codigo_tipo_cuenta": 1, "cuenta": "MERCANCIAS NO FABRICADAS"},
+    2408: {"codigo_tipo_cuenta": 2, "cuenta": "IVA POR PAGAR"},
+}
+
+
+def test_mismo_contenido_comparte_indice():
+    copia = {codigo: dict(plantilla) for codigo, plantilla in PLANTILLAS.items()}
+    assert PlanCuentas.desde_plantillas(PLANTILLAS) is PlanCuentas.desde_plantillas(
+        copia
+    )
+
+
+def test_otro_orden_recibe_otro_indice():
+    plan = PlanCuentas.desde_plantillas(PLANTILLAS)
+    invertidas = dict(reversed(list(PLANTILLAS.items())))
+    assert invertidas == PLANTILLAS
+    otro = PlanCuentas.desde_plantillas(invertidas)
+    assert otro is not plan
+    assert otro.codigos == (2408, 1435, 1105)
+    assert otro.posicion(2408) == 0
+    assert PlanCuentas.desde_plantillas(PLANTILLAS).codigos == plan.codigos
+
+
+def test_plantillas_modificadas_reciben_indice_nuevo():
+    plan = PlanCuentas.desde_plantillas(PLANTILLAS)
+    modificadas = {codigo: dict(plantilla) for codigo, plantilla in PLANTILLAS.items()}
+    modificadas[1105]["cuenta"] = "CAJA GENERAL"
+    assert PlanCuentas.desde_plantillas(modificadas).codigo("CAJA GENERAL") == 1105
+    assert plan.codigo("CAJA") == 1105
+
+
+def test_prefijos():
+    plan = PlanCuentas.desde_plantillas(PLANTILLAS)
+    assert plan.codigos_con_prefijo(1) == (1105, 1435)
+    assert plan.codigos_con_prefijo("14") == (1435,)
+    assert plan.codigos_con_prefijo(9) == ()
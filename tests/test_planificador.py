@@ -0,0 +1,162 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import model
+from accounting_motor import MotorContable
+from impuestos import MotorImpuestos
+from ledger import Ledger
+from model import NCT, ZF, BienExento, BienGravado, Production, Transaction
+from planificador import PlanificadorPeriodos, agrupar
+from produccion import MotorProduccion
+from red_comercial import RedComercial
+from transacciones import LiquidadorTransacciones
+
+PROCESOS = [1]
+if "fork" in multiprocessing.get_all_start_methods():
+    PROCESOS.append(3)
+
+
+def _escenario(falta=False):
+    generador = np.random.default_rng(7)
+    ledger = Ledger()
+    motor = MotorContable(ledger=ledger)
+    insumo = BienGravado("insumo_plan", 10, 0.19, 0.05)
+    final = BienExento("final_plan", 40, 0.1, insumos={"insumo_plan": 2})
+    agentes = [
+        (ZF if i % 3 == 0 else NCT)(
+            f"a{i}", model.plantilla_1, [final], [final], ledger=ledger
+        )
+        for i in range(60)
+    ]
+    for i, agente in enumerate(agentes):
+        cantidad = 5 if falta and i % 20 == 7 else 1000
+        agente.purchase_good(insumo, cantidad, 8.0 + i % 4)
+
+    fases = []
+    for _ in range(2):
+        produccion = [Production(a, final, 10, {"insumo_plan": 20}) for a in agentes]
+        # Mercados de 10 agentes: grupos independientes
+        pares = generador.integers(0, 10, size=(200, 2)) + 10 * generador.integers(
+            0, 6, size=(200, 1)
+        )
+        comercio = [
+            Transaction(agentes[i], agentes[j], insumo if k % 2 else final, 1.0, 0)
+            for k, (i, j) in enumerate(pares.tolist())
+            if i != j
+        ]
+        fases += [produccion, comercio[:50] + produccion[:10] + comercio[50:]]
+    red = RedComercial()
+    impuestos = MotorImpuestos(ledger, [a.agente_id for a in agentes])
+    return ledger, motor, agentes, fases, red, impuestos
+
+
+def _serial(escenario):
+    ledger, motor, agentes, fases, red, impuestos = escenario
+    liquidador = LiquidadorTransacciones(motor, 16, red, impuestos)
+    produccion = MotorProduccion(motor)
+    for fase in fases:
+        inicio = 0
+        while inicio < len(fase):
+            es_produccion = isinstance(fase[inicio], Production)
+            fin = inicio
+            while (
+                fin < len(fase) and isinstance(fase[fin], Production) == es_produccion
+            ):
+                fin += 1
+            if es_produccion:
+                produccion.ejecutar(fase[inicio:fin])
+            else:
+                list(liquidador.liquidar(fase[inicio:fin]))
+            inicio = fin
+
+
+def _firma(escenario):
+    ledger, _, agentes, _, red, impuestos = escenario
+    red._compactar()
+    return {
+        "columnas": [
+            getattr(ledger, c).copy()
+            for c in ("agentes", "codigos", "transacciones", "debe", "haber")
+        ],
+        "inventarios": [
+            (
+                a.inventory.get_total_quantity("insumo_plan"),
+                a.inventory.get_total_value("insumo_plan"),
+                a.inventory.get_total_value("final_plan"),
+            )
+            for a in agentes
+        ],
+        "red": {k: m.tripletas() for k, m in red._matrices.items()},
+        "impuestos": dict(impuestos._bases),
+    }
+
+
+def _assert_iguales(a, b):
+    for x, y in zip(a["columnas"], b["columnas"]):
+        np.testing.assert_array_equal(x, y)
+    assert a["inventarios"] == b["inventarios"]
+    assert a["red"].keys() == b["red"].keys()
+    for clave in a["red"]:
+        for x, y in zip(a["red"][clave], b["red"][clave]):
+            np.testing.assert_array_equal(x, y)
+    assert a["impuestos"].keys() == b["impuestos"].keys()
+    for clave in a["impuestos"]:
+        np.testing.assert_array_equal(a["impuestos"][clave], b["impuestos"][clave])
+
+
+def _planificado(procesos, falta=False):
+    escenario = _escenario(falta)
+    _, motor, _, fases, red, impuestos = escenario
+    planificador = PlanificadorPeriodos(
+        motor,
+        procesos=procesos,
+        actividades_por_paquete=20,
+        tamano_lote=16,
+        red=red,
+        impuestos=impuestos,
+    )
+    errores = []
+    for fase in fases:
+        try:
+            planificador.ejecutar_fase(fase)
+        except ValueError as error:
+            errores.append(str(error))
+    return _firma(escenario), errores
+
+
+def test_agrupar_separa_agentes_independientes():
+    agentes = [NCT(f"g{i}", model.plantilla_1, [], []) for i in range(5)]
+    bien = BienGravado("bien_grupos", 10, 0.19, 0.0)
+    transacciones = [
+        Transaction(agentes[3], agentes[4], bien, 1, 0),
+        Transaction(agentes[0], agentes[1], bien, 1, 0),
+        Transaction(agentes[1], agentes[2], bien, 1, 0),
+        Transaction(agentes[4], agentes[3], bien, 1, 0),
+        Transaction(agentes[2], agentes[0], bien, 1, 0),
+    ]
+    assert agrupar(transacciones) == [[0, 3], [1, 2, 4]]
+
+
+@pytest.mark.parametrize("procesos", PROCESOS)
+def test_igual_a_la_corrida_serial(procesos):
+    serial = _escenario()
+    _serial(serial)
+    firma, errores = _planificado(procesos)
+    assert errores == []
+    _assert_iguales(firma, _firma(serial))
+
+
+def test_errores_independientes_del_numero_de_procesos():
+    resultados = [_planificado(procesos, falta=True) for procesos in PROCESOS]
+    firma, errores = resultados[0]
+    assert errores and "a7" in errores[0]
+    for otra_firma, otros_errores in resultados[1:]:
+        assert otros_errores == errores
+        _assert_iguales(otra_firma, firma)
+
+
+def test_procesos_invalidos():
+    with pytest.raises(ValueError):
+        PlanificadorPeriodos(MotorContable(ledger=Ledger()), procesos=0)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import model
+from ledger import Ledger
+from model import BienExento, BienGravado
+from poblacion import Poblacion
+
+
+def _poblacion():
+    insumo = BienGravado("insumo_pob", 10, 0.19, 0.0)
+    final = BienExento("final_pob", 40, 0.0, insumos={"insumo_pob": 2})
+    poblacion = Poblacion("ZF", 3, model.plantilla_1, [final], [final], ledger=Ledger())
+    poblacion.comprar(insumo, [10, 0, 10], [2.0, 1.0, 3.0])
+    poblacion.comprar(insumo, 10, 4.0)
+    return poblacion, insumo, final
+
+
+def test_promedio_ponderado_en_bloque():
+    poblacion, insumo, final = _poblacion()
+    columna = poblacion.columna_bien(insumo)
+    np.testing.assert_array_equal(poblacion.cantidades[:, columna], [20, 10, 20])
+    np.testing.assert_array_equal(poblacion.valores[:, columna], [60, 40, 70])
+
+    costos = poblacion.producir(final, [5, 0, 2], costo_indirecto=1.0)
+    np.testing.assert_allclose(costos, [31.0, 15.0])
+    np.testing.assert_allclose(poblacion.vender(final, [1, 0, 1], 40.0), [6.2, 7.5])
+
+    saldos = dict(zip(poblacion.codigos.tolist(), poblacion.saldos().T))
+    np.testing.assert_allclose(saldos[1405], [30.0, 40.0, 56.0])
+    np.testing.assert_allclose(saldos[1430], [24.8, 0.0, 7.5])
+    np.testing.assert_allclose(saldos[4120], [-40.0, 0.0, -40.0])
+
+
+def test_inventario_insuficiente_no_cambia_nada():
+    poblacion, insumo, final = _poblacion()
+    cantidades, valores = poblacion.cantidades.copy(), poblacion.valores.copy()
+    movimientos = len(poblacion.ledger)
+    with pytest.raises(ValueError, match="ZF_1"):
+        poblacion.producir(final, [1, 6, 1])
+    with pytest.raises(ValueError, match="final_pob"):
+        poblacion.vender(final, 1, 40.0)
+    np.testing.assert_array_equal(poblacion.cantidades, cantidades)
+    np.testing.assert_array_equal(poblacion.valores, valores)
+    assert len(poblacion.ledger) == movimientos
+
+
+def test_agente_ve_el_libro_mayor_de_la_poblacion():
+    poblacion, insumo, _ = _poblacion()
+    agente = poblacion.agente(2)
+    assert agente.nombre == "ZF_2"
+    assert agente.inventory.get_total_quantity("insumo_pob") == 20
+    assert agente.inventory.get_total_value("insumo_pob") == pytest.approx(70)
+    assert agente.cuentas[1405].calcular_totales()["Neto"] == {"debe": 70.0}
+
+
+def test_cantidades_negativas():
+    poblacion, insumo, _ = _poblacion()
+    with pytest.raises(ValueError, match="negativas"):
+        poblacion.comprar(insumo, [-1, 0, 0], 1.0)
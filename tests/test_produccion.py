@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import model
+from accounting_motor import MotorContable
+from ledger import Ledger
+from model import NCT, BienExento, BienGravado, Production
+from produccion import MotorProduccion, agrupar_ordenes
+
+
+def _lotes(agente, nombre):
+    inventario = agente.inventory
+    return [
+        (lote.quantity, lote.unit_cost)
+        for lote in inventario.lotes.get(inventario.id_bien(nombre), ())
+    ]
+
+
+def _fabrica(metodo):
+    ledger = Ledger()
+    tela = BienGravado("tela_prod", 10, 0.19, 0.0)
+    camisa = BienExento("camisa_prod", 40, 0.0)
+    boton = BienGravado("boton_prod", 1, 0.19, 0.0)
+    fabrica = NCT("fabrica", model.plantilla_1, [camisa], [camisa], ledger=ledger)
+    fabrica.set_costing_method_for_good("tela_prod", metodo)
+    fabrica.set_costing_method_for_good("camisa_prod", metodo)
+    fabrica.purchase_good(tela, 10, 1.0)
+    fabrica.purchase_good(tela, 10, 2.0)
+    fabrica.purchase_good(tela, 7, 3.5)
+    fabrica.purchase_good(boton, 100, 0.3)
+    motor = MotorProduccion(MotorContable(ledger=ledger))
+    return motor, fabrica, (tela, camisa, boton)
+
+
+def _ordenes(fabrica, camisa):
+    return [
+        Production(fabrica, camisa, 10, {"tela_prod": 10}),
+        Production(fabrica, camisa, 10, {"boton_prod": 20, "tela_prod": 10}),
+        Production(fabrica, camisa, 4, {"tela_prod": 3.5, "boton_prod": 8}),
+    ]
+
+
+@pytest.mark.parametrize("metodo", ["FIFO", "LIFO"])
+def test_lote_igual_a_ejecucion_secuencial(metodo):
+    motor, fabrica, bienes = _fabrica(metodo)
+    ordenes = _ordenes(fabrica, bienes[1])
+    assert len(agrupar_ordenes(ordenes)) == 1
+    (en_lote,) = motor.ejecutar(ordenes, costo_indirecto=0.5)
+
+    motor_s, fabrica_s, bienes_s = _fabrica(metodo)
+    uno_a_uno = [
+        motor_s.ejecutar([orden], costo_indirecto=0.5)[0]
+        for orden in _ordenes(fabrica_s, bienes_s[1])
+    ]
+
+    for clave in ("costo_total_materiales", "costo_total"):
+        np.testing.assert_array_equal(
+            en_lote[clave], np.concatenate([r[clave] for r in uno_a_uno])
+        )
+    for nombre in ("tela_prod", "boton_prod", "camisa_prod"):
+        assert _lotes(fabrica, nombre) == _lotes(fabrica_s, nombre)
+        assert fabrica.inventory.get_total_value(nombre) == (
+            fabrica_s.inventory.get_total_value(nombre)
+        )
+    for codigo in (1405, 1430):
+        totales = fabrica.cuentas[codigo].calcular_totales()
+        esperados = fabrica_s.cuentas[codigo].calcular_totales()
+        assert totales["Debe"] == pytest.approx(esperados["Debe"])
+        assert totales["Haber"] == pytest.approx(esperados["Haber"])
+
+
+def test_cada_orden_recibe_su_propio_costo():
+    motor, fabrica, (tela, camisa, _) = _fabrica("FIFO")
+    ordenes = [Production(fabrica, camisa, 10, {"tela_prod": 10}) for _ in range(2)]
+    (resultado,) = motor.ejecutar(ordenes)
+    np.testing.assert_array_equal(resultado["costo_total"], [10.0, 20.0])
+    # La venta FIFO de 10 camisas sale del lote de la primera orden
+    assert fabrica.sell_good("camisa_prod", 10, 40.0) == 10.0
+
+
+def test_inventario_insuficiente_no_mueve_nada():
+    motor, fabrica, (tela, camisa, _) = _fabrica("FIFO")
+    antes = _lotes(fabrica, "tela_prod")
+    ordenes = [Production(fabrica, camisa, 10, {"tela_prod": 20}) for _ in range(2)]
+    with pytest.raises(ValueError):
+        motor.ejecutar(ordenes)
+    assert _lotes(fabrica, "tela_prod") == antes
+    assert _lotes(fabrica, "camisa_prod") == []
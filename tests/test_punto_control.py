@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import model
+from accounting_motor import MotorContable
+from ledger import Ledger
+from model import NCT, ZF, BienExento, BienGravado
+from punto_control import cargar_punto_control, guardar_punto_control
+
+COLUMNAS = ("agentes", "codigos", "transacciones", "debe", "haber")
+
+
+def _lotes(agente, nombre):
+    inventario = agente.inventory
+    return [
+        (lote.quantity, lote.unit_cost)
+        for lote in inventario.lotes.get(inventario.id_bien(nombre), ())
+    ]
+
+
+@pytest.fixture
+def simulacion():
+    ledger = Ledger()
+    motor = MotorContable(ledger=ledger)
+    insumo = BienGravado("insumo_pc", 10, 0.19, 0.05)
+    final = BienExento("final_pc", 40, 0.1, insumos={"insumo_pc": 2})
+    agentes = [
+        (ZF if i % 2 else NCT)(
+            f"pc{i}", model.plantilla_1, [final], [final], ledger=ledger
+        )
+        for i in range(6)
+    ]
+    for i, agente in enumerate(agentes):
+        agente.purchase_good(insumo, 10, 8.0)
+        agente.purchase_good(insumo, 5, 9.0 + i)
+        if i % 3 == 0:
+            agente.set_costing_method_for_good("insumo_pc", "LIFO")
+        agente.sell_good("insumo_pc", 12, 15.0)
+    ids = np.array([agente.agente_id for agente in agentes])
+    motor.contabilizar(
+        "compra_materia_prima",
+        ids,
+        {
+            "precio_total": np.full(len(ids), 100.0),
+            "monto_iva": 19.0,
+            "precio_con_iva": 119.0,
+        },
+    )
+    ledger.periodo = 3
+    # Los bienes siguen vivos, como en una simulación
+    return ledger, agentes, (insumo, final)
+
+
+@pytest.mark.parametrize("comprimir", [False, True])
+def test_ida_y_vuelta(tmp_path, simulacion, comprimir):
+    ledger, agentes, _ = simulacion
+    guardar_punto_control(
+        tmp_path / "pc", agentes, comprimir=comprimir, metadatos={"escenario": 1}
+    )
+    punto = cargar_punto_control(tmp_path / "pc", model.plantilla_1)
+
+    assert punto.metadatos == {"escenario": 1}
+    assert punto.ledger.periodo == 3
+    for columna in COLUMNAS:
+        np.testing.assert_array_equal(
+            getattr(punto.ledger, columna), getattr(ledger, columna)
+        )
+    for original, cargado in zip(agentes, punto.agentes):
+        assert (cargado.nombre, cargado.agente_id, cargado.type) == (
+            original.nombre,
+            original.agente_id,
+            original.type,
+        )
+        assert _lotes(cargado, "insumo_pc") == _lotes(original, "insumo_pc")
+        assert (
+            cargado.inventory.instantanea()["metodos"]
+            == original.inventory.instantanea()["metodos"]
+        )
+        assert cargado.cuentas[1105].calcular_totales() == (
+            original.cuentas[1105].calcular_totales()
+        )
+    # Los bienes que solo están en inventario también se restauran
+    assert {bien.name for bien in punto.bienes} >= {"insumo_pc", "final_pc"}
+
+
+def test_escribir_sobre_lo_cargado_no_toca_el_archivo(tmp_path, simulacion):
+    ledger, agentes, _ = simulacion
+    guardar_punto_control(tmp_path / "pc", agentes)
+    punto = cargar_punto_control(tmp_path / "pc", model.plantilla_1)
+    punto.agentes[0].cuentas[1105].registrar_transaccion(5, 0)
+    punto.agentes[0].purchase_good(punto.bienes[0], 1, 1.0)
+
+    de_nuevo = cargar_punto_control(tmp_path / "pc", model.plantilla_1)
+    assert len(de_nuevo.ledger) == len(ledger)
+    assert _lotes(de_nuevo.agentes[0], punto.bienes[0].name) == _lotes(
+        agentes[0], punto.bienes[0].name
+    )
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from red_comercial import FLUJOS, RedComercial
+
+pd = pytest.importorskip("pandas")
+
+
+def _red():
+    # 0 y 3 son NCT, 1 y 2 son ZF. 0 -> 1 -> 2, y 3 también le vende a 1.
+    red = RedComercial()
+    red.registrar("cafe", 0, [0, 0, 3], [1, 1, 1], False, True, [100, 50, 50], 1)
+    red.registrar("cafe", 1, 0, 1, False, True, 50.0, 2)
+    red.registrar(
+        "cafe",
+        1,
+        1,
+        [2, 0],
+        True,
+        [True, False],
+        [80.0, 40.0],
+        1,
+        iva=[0.0, 7.6],
+        iva_teorico=[15.2, 7.6],
+    )
+    return red
+
+
+def test_contrapartes_suma_periodos_y_duplicados():
+    red = _red()
+    proveedores = red.contrapartes(1, rol="comprador")
+    assert proveedores.index.name == "vendedor"
+    assert proveedores.index.tolist() == [0, 3]
+    assert proveedores.loc[0, "valor"] == 200
+    assert proveedores.loc[0, "cantidad"] == 4
+    assert proveedores.loc[0, "transacciones"] == 3
+
+    solo_periodo_1 = red.contrapartes(0, periodos=[1])
+    assert solo_periodo_1.index.tolist() == [1]
+    assert solo_periodo_1.loc[1, "valor"] == 50
+
+    # Los registros posteriores a una consulta se suman a la matriz compactada
+    red.registrar("cafe", 0, 0, 2, False, True, 500.0, 1)
+    compradores = red.contrapartes(0, n=1, medida="valor")
+    assert compradores.index.tolist() == [2]
+    assert red.contrapartes(0).loc[1, "valor"] == 200
+
+    assert red.contrapartes(0, bien="te").empty
+    with pytest.raises(ValueError):
+        red.contrapartes(0, rol="otro")
+    with pytest.raises(ValueError):
+        red.contrapartes(0, medida="precio")
+
+
+def test_flujos_frontera_y_fuga_iva():
+    red = _red()
+    frontera = red.flujos_frontera()
+    assert set(frontera["flujo"]) == {"NCT->ZF", "ZF->NCT"}
+    assert frontera["valor"].sum() == 290
+
+    por_vendedor = red.flujos_frontera(periodos=[0], por_agente="vendedor")
+    assert dict(zip(por_vendedor["vendedor"], por_vendedor["valor"])) == {
+        0: 150,
+        3: 50,
+    }
+
+    fuga = red.fuga_iva()
+    assert fuga.index.tolist() == list(FLUJOS)
+    assert fuga.loc["ZF->ZF", "fuga"] == pytest.approx(15.2)
+    assert fuga.loc["ZF->NCT", "fuga"] == pytest.approx(0.0)
+    assert fuga.loc["NCT->NCT", "valor"] == 0
+
+
+def test_fuga_cadena_atribuye_la_fraccion_de_compras():
+    red = _red()
+    cadena = red.fuga_cadena(0, saltos=3)
+    # Salto 1: todas las ventas de 0 (sin IVA teórico registrado)
+    assert cadena.loc[1, "valor"] == 200
+    # Salto 2: 1 compró 250, de los que 200 vinieron de 0
+    fraccion = 200 / 250
+    assert cadena.loc[2, "valor"] == pytest.approx(120 * fraccion)
+    assert cadena.loc[2, "fuga"] == pytest.approx(15.2 * fraccion)
+    # Todo lo que 0 le compró a 1 vino de la cadena: vuelve a 0 en el tercer salto
+    assert cadena.loc[3, "valor"] == pytest.approx(200 * fraccion)
+    np.testing.assert_array_equal(red.fuga_cadena(9).to_numpy(), 0.0)
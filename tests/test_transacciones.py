@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import model
+from accounting_motor import MotorContable
+from ledger import Ledger
+from model import NCT, ZF, BienGravado, Transaction
+from transacciones import LiquidadorTransacciones, calcular_montos
+
+
+def test_montos_importacion_desde_zona_franca():
+    montos = calcular_montos(
+        precios=[10.0, 10.0],
+        cantidades=[2.0, 2.0],
+        iva_rates=0.19,
+        tariffs=0.1,
+        vendedor_zf=[True, False],
+        comprador_zf=[False, False],
+    )
+    np.testing.assert_allclose(montos["monto_arancel"], [2.0, 0.0])
+    np.testing.assert_allclose(montos["monto_iva"], [22 * 0.19, 20 * 0.19])
+    # En la importación el IVA lo paga el comprador, no lo factura el vendedor
+    np.testing.assert_allclose(montos["iva_vendedor"], [0.0, 20 * 0.19])
+
+
+@pytest.mark.parametrize("cantidad", [0.0, -1.0, np.nan])
+def test_cantidad_no_positiva(cantidad):
+    with pytest.raises(ValueError, match="posición 1"):
+        calcular_montos(
+            precios=10.0,
+            cantidades=[1.0, cantidad],
+            iva_rates=0.19,
+            tariffs=0.0,
+            vendedor_zf=False,
+            comprador_zf=False,
+        )
+
+
+def test_transaccion_sin_cantidad_no_mueve_inventario():
+    ledger = Ledger()
+    bien = BienGravado("bien_tx", 10, 0.19, 0.0)
+    vendedor = ZF("vendedor_tx", model.plantilla_1, [], [], ledger=ledger)
+    comprador = NCT("comprador_tx", model.plantilla_1, [], [], ledger=ledger)
+    vendedor.purchase_good(bien, 5, 4.0)
+    liquidador = LiquidadorTransacciones(MotorContable(ledger=ledger))
+    movimientos = len(ledger)
+    with pytest.raises(ValueError, match="cantidad no positiva"):
+        liquidador.liquidar_lote(
+            [
+                Transaction(vendedor, comprador, bien, 1, 0),
+                Transaction(vendedor, comprador, bien, 0, 0),
+            ]
+        )
+    assert vendedor.inventory.get_total_quantity("bien_tx") == 5
+    assert comprador.inventory.get_total_quantity("bien_tx") == 0
+    assert len(ledger) == movimientos
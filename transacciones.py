@@ -0,0 +1,430 @@
+### Ejecución de transacciones: impuestos vectorizados y liquidación por lotes
+
+"""
+
+Las tasas de los bienes (iva_rate, tariff) se expresan como fracción: 0.19 es
+un IVA del 19 %.
+
+Tratamiento por tipo de operación:
+
+precio_total: price * amount, con el precio pactado en la transacción si lo
+tiene o, si no, el del bien.
+
+monto_arancel: Solo cuando el bien entra al territorio aduanero nacional desde
+la zona franca (vendedor ZF, comprador NCT) y no es exportación temporal;
+precio_total * tariff.
+
+monto_iva: IVA sobre precio_total + monto_arancel. No aplica si el bien o la
+transacción no son gravados, si es exportación temporal, ni a las ventas hacia
+una zona franca (NCT -> ZF y ZF -> ZF) salvo que se nacionalice el IVA
+(national_VAT).
+
+En las ventas ZF -> NCT el IVA es de importación: lo paga el comprador en la
+nacionalización y el vendedor factura sin IVA.
+
+"""
+
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from accounting_motor import MotorContable
+from catalogo import ESTADOS_IVA
+from model import Transaction
+
+
+class ErrorLiquidacion(ValueError):
+    """
+    Error al liquidar un lote. Las transacciones anteriores a la que falló
+    quedan liquidadas; las demás no se tocaron.
+    """
+
+    def __init__(self, mensaje: str, liquidadas: int):
+        """
+        :param liquidadas: Número de transacciones del lote que se liquidaron.
+        """
+        super().__init__(mensaje)
+        self.liquidadas = liquidadas
+
+    def __reduce__(self):
+        # Para que viaje entre procesos (ver planificador.py)
+        return type(self), (self.args[0], self.liquidadas)
+
+
+def codificar_estados_iva(estados: Iterable[str]) -> np.ndarray:
+    """Convierte estados de IVA en códigos (posición en ESTADOS_IVA)."""
+    posiciones = {estado: i for i, estado in enumerate(ESTADOS_IVA)}
+    try:
+        return np.array([posiciones[estado] for estado in estados], dtype=np.int8)
+    except KeyError as error:
+        raise ValueError(
+            f"Estado de IVA inválido: {error.args[0]}. Debe ser 'gravado', "
+            "'exento' o 'excluido'."
+        ) from None
+
+
+def calcular_montos(
+    precios,
+    cantidades,
+    iva_rates,
+    tariffs,
+    vendedor_zf,
+    comprador_zf,
+    temporal_export=False,
+    national_VAT=False,
+    estados_iva=0,
+) -> Dict[str, np.ndarray]:
+    """
+    Calcula de forma vectorizada los montos de un arreglo de transacciones.
+
+    :param precios: Precio unitario sin impuestos de cada transacción.
+    :param cantidades: Cantidad transaccionada.
+    :param iva_rates: Tasa de IVA del bien.
+    :param tariffs: Tasa de arancel del bien.
+    :param vendedor_zf: True si el vendedor es un usuario de zona franca.
+    :param comprador_zf: True si el comprador es un usuario de zona franca.
+    :param temporal_export: True si es exportación temporal.
+    :param national_VAT: True si se nacionaliza el IVA en operaciones con ZF.
+    :param estados_iva: Código del estado de IVA efectivo (ver codificar_estados_iva).
+    :return: Diccionario con precio_total, monto_arancel, monto_iva,
+             precio_con_iva, iva_vendedor (IVA que factura el vendedor) y
+             estado_iva.
+    :raises ValueError: Si alguna cantidad no es positiva (el costo unitario
+                        del comprador se obtiene dividiendo por ella).
+    """
+    cantidades = np.asarray(cantidades, dtype=np.float64)
+    invalidas = np.flatnonzero(~(cantidades > 0))
+    if invalidas.size:
+        i = invalidas[0]
+        raise ValueError(
+            f"{invalidas.size} transacción(es) con cantidad no positiva; la "
+            f"primera (posición {i}) tiene cantidad {cantidades.flat[i]}."
+        )
+    precio_total = np.asarray(precios, dtype=np.float64) * cantidades
+    vendedor_zf = np.asarray(vendedor_zf, dtype=bool)
+    comprador_zf = np.asarray(comprador_zf, dtype=bool)
+    temporal_export = np.asarray(temporal_export, dtype=bool)
+    national_VAT = np.asarray(national_VAT, dtype=bool)
+
+    # Ingreso de mercancía de la zona franca al territorio nacional
+    importacion = vendedor_zf & ~comprador_zf
+    monto_arancel = np.where(
+        importacion & ~temporal_export, precio_total * np.asarray(tariffs), 0.0
+    )
+
+    aplica_iva = (
+        (np.asarray(estados_iva) == 0)
+        & ~temporal_export
+        & (~comprador_zf | national_VAT)
+    )
+    monto_iva = np.where(
+        aplica_iva, (precio_total + monto_arancel) * np.asarray(iva_rates), 0.0
+    )
+
+    return {
+        "precio_total": precio_total,
+        "monto_arancel": monto_arancel,
+        "monto_iva": monto_iva,
+        "precio_con_iva": precio_total + monto_iva,
+        "iva_vendedor": np.where(importacion, 0.0, monto_iva),
+        "estado_iva": np.broadcast_to(
+            np.asarray(estados_iva, dtype=np.int8), precio_total.shape
+        ),
+    }
+
+
+def montos_transacciones(transacciones: List[Transaction]) -> Dict[str, np.ndarray]:
+    """
+    Extrae los atributos de una lista de Transaction y calcula sus montos.
+
+    Si todos los bienes están en el mismo catálogo, sus precios y tasas se leen
+    de los arreglos del catálogo por id en lugar de bien por bien.
+
+    :raises ValueError: Si alguna transacción tiene cantidad no positiva.
+    """
+    n = len(transacciones)
+    catalogo = transacciones[0].good.catalogo if n else None
+    if catalogo is not None and all(t.good.catalogo is catalogo for t in transacciones):
+        ids = np.fromiter((t.good.id for t in transacciones), dtype=np.intp, count=n)
+        bienes = catalogo.atributos(ids)
+        precios, iva_rates, tariffs = (
+            bienes["precio"],
+            bienes["iva_rate"],
+            bienes["tariff"],
+        )
+        for i, transaccion in enumerate(transacciones):
+            if transaccion.price is not None:
+                precios[i] = transaccion.price
+        # El estado de la transacción solo cuenta para los bienes gravados
+        estados = np.where(
+            bienes["estado_iva"] == 0,
+            codificar_estados_iva(t.iva_status_transaccion for t in transacciones),
+            bienes["estado_iva"],
+        )
+    else:
+        estados = codificar_estados_iva(
+            (
+                t.iva_status_transaccion
+                if t.good.status_iva == "gravado"
+                else t.good.status_iva
+            )
+            for t in transacciones
+        )
+        precios = [t.precio_unitario for t in transacciones]
+        iva_rates = [t.good.iva_rate for t in transacciones]
+        tariffs = [t.good.tariff for t in transacciones]
+    return calcular_montos(
+        precios=precios,
+        cantidades=[t.amount for t in transacciones],
+        iva_rates=iva_rates,
+        tariffs=tariffs,
+        vendedor_zf=[t.seller.type == "ZF" for t in transacciones],
+        comprador_zf=[t.buyer.type == "ZF" for t in transacciones],
+        temporal_export=[t.temporal_export for t in transacciones],
+        national_VAT=[t.national_VAT for t in transacciones],
+        estados_iva=estados,
+    )
+
+
+def _plantilla_venta(transaccion: Transaction, iva_vendedor: float) -> str:
+    producidos = {bien.name for bien in transaccion.seller.bienes_producidos}
+    if transaccion.good.name in producidos:
+        plantilla = "venta_mercancia_producida"
+    else:
+        plantilla = "venta_mercancia_no_producida"
+    return plantilla if iva_vendedor else plantilla + "_exenta"
+
+
+def _plantilla_compra(transaccion: Transaction, monto_iva: float) -> str:
+    materia_prima = any(
+        transaccion.good.name in bien.insumos
+        for bien in transaccion.buyer.bienes_producidos
+    )
+    if not materia_prima:
+        return "compra_bien_final_comercializable"
+    return "compra_materia_prima" if monto_iva else "compra_materia_prima_sin_iva"
+
+
+class LiquidadorTransacciones:
+    """
+    Clase para ejecutar flujos de transacciones por lotes de tamaño fijo.
+    """
+
+    def __init__(
+        self,
+        motor: MotorContable,
+        tamano_lote: int = 10_000,
+        red=None,
+        impuestos=None,
+    ):
+        """
+        :param motor: Motor contable con el libro mayor de los agentes.
+        :param tamano_lote: Número de transacciones que se procesan a la vez; la
+                            memoria usada depende de este valor y no del tamaño
+                            del flujo.
+        :param red: RedComercial donde se registran los flujos liquidados, con el
+                    periodo del libro mayor.
+        :param impuestos: MotorImpuestos donde se registran las transacciones
+                          liquidadas, con el periodo del libro mayor.
+        """
+        self.motor = motor
+        self.tamano_lote = tamano_lote
+        self.red = red
+        self.impuestos = impuestos
+
+    def liquidar(self, transacciones: Iterable[Transaction]) -> Iterator[Dict]:
+        """
+        Ejecuta un flujo de transacciones lote por lote.
+
+        Por cada transacción se retira el bien del inventario del vendedor (al
+        costo de su método de costeo), se agrega al del comprador con el arancel
+        capitalizado, y se contabilizan la venta y la compra. Los asientos de cada
+        lote se agrupan por plantilla y se contabilizan en una sola llamada.
+
+        :param transacciones: Iterable (p. ej. un generador) de Transaction.
+        :return: Un generador con un resumen por lote.
+        :raises ErrorLiquidacion: Si un vendedor no tiene inventario suficiente.
+                                  Las transacciones anteriores del lote quedan
+                                  liquidadas (ver su atributo liquidadas).
+        """
+        iterador = iter(transacciones)
+        while True:
+            lote = list(islice(iterador, self.tamano_lote))
+            if not lote:
+                return
+            yield self.liquidar_lote(lote)
+
+    def liquidar_lote(self, lote: List[Transaction]) -> Dict:
+        montos = montos_transacciones(lote)
+        self.validar_agentes(lote)
+        costos, liquidadas, error = self.mover_inventarios(lote, montos)
+        if liquidadas < len(lote):
+            montos = {
+                nombre: valores[:liquidadas] for nombre, valores in montos.items()
+            }
+        resumen = self.contabilizar_lote(lote[:liquidadas], montos, costos[:liquidadas])
+        if error is not None:
+            raise error
+        return resumen
+
+    def validar_agentes(self, transacciones: Iterable[Transaction]) -> None:
+        """
+        :raises ValueError: Si algún agente no usa el libro mayor del motor.
+        """
+        for transaccion in transacciones:
+            for agente in (transaccion.seller, transaccion.buyer):
+                if agente.ledger is not self.motor.ledger:
+                    raise ValueError(
+                        f"El agente {agente.nombre} no usa el libro mayor del motor."
+                    )
+
+    def mover_inventarios(
+        self,
+        lote: List[Transaction],
+        montos: Dict[str, np.ndarray],
+        posiciones: Optional[Sequence[int]] = None,
+    ) -> Tuple[np.ndarray, int, Optional[ErrorLiquidacion]]:
+        """
+        Primera etapa de liquidar_lote: mueve los inventarios sin contabilizar.
+
+        Solo toca los inventarios del vendedor y del comprador de cada
+        transacción.
+
+        :param montos: montos_transacciones(lote).
+        :param posiciones: Posiciones del lote a mover, en orden; por defecto
+                           todas.
+        :return: Costo de ventas por posición del lote, número de posiciones
+                 movidas y el error de la primera que no se pudo mover (o None).
+        """
+        if posiciones is None:
+            posiciones = range(len(lote))
+        costo_ventas = np.zeros(len(lote), dtype=np.float64)
+        for movidas, i in enumerate(posiciones):
+            transaccion = lote[i]
+            vendedor, comprador, bien = (
+                transaccion.seller,
+                transaccion.buyer,
+                transaccion.good,
+            )
+            if vendedor.inventory.get_total_quantity(bien.name) < transaccion.amount:
+                error = ErrorLiquidacion(
+                    f"No hay suficiente inventario de {bien.name} en "
+                    f"{vendedor.nombre} para la transacción {i} del lote.",
+                    i,
+                )
+                return costo_ventas, movidas, error
+
+            costo_ventas[i] = vendedor.sell_good(
+                bien.name, transaccion.amount, transaccion.precio_unitario
+            )
+            # El arancel se capitaliza en el costo del inventario del comprador
+            comprador.purchase_good(
+                bien,
+                transaccion.amount,
+                (montos["precio_total"][i] + montos["monto_arancel"][i])
+                / transaccion.amount,
+            )
+        return costo_ventas, len(posiciones), None
+
+    def contabilizar_lote(
+        self,
+        lote: List[Transaction],
+        montos: Dict[str, np.ndarray],
+        costo_ventas: np.ndarray,
+    ) -> Dict:
+        """
+        Segunda etapa de liquidar_lote: contabiliza transacciones ya movidas y
+        las registra en la red y en el motor de impuestos.
+
+        :param montos: montos_transacciones(lote).
+        :param costo_ventas: Costo de ventas de cada transacción, de
+                             mover_inventarios.
+        :return: Resumen del lote.
+        """
+        precio_total = montos["precio_total"]
+        monto_iva = montos["monto_iva"]
+        iva_vendedor = montos["iva_vendedor"]
+        costo_compra = precio_total + montos["monto_arancel"]
+
+        # La plantilla depende del bien y de lo que produce cada agente
+        ventas: Dict[tuple, str] = {}
+        compras: Dict[tuple, str] = {}
+        plantillas_venta, plantillas_compra = [], []
+        for i, transaccion in enumerate(lote):
+            clave = (
+                id(transaccion.seller),
+                transaccion.good.name,
+                bool(iva_vendedor[i]),
+            )
+            plantilla = ventas.get(clave)
+            if plantilla is None:
+                plantilla = ventas[clave] = _plantilla_venta(
+                    transaccion, iva_vendedor[i]
+                )
+            plantillas_venta.append(plantilla)
+            clave = (id(transaccion.buyer), transaccion.good.name, bool(monto_iva[i]))
+            plantilla = compras.get(clave)
+            if plantilla is None:
+                plantilla = compras[clave] = _plantilla_compra(
+                    transaccion, monto_iva[i]
+                )
+            plantillas_compra.append(plantilla)
+
+        vendedores = np.fromiter(
+            (t.seller.agente_id for t in lote), dtype=np.int64, count=len(lote)
+        )
+        compradores = np.fromiter(
+            (t.buyer.agente_id for t in lote), dtype=np.int64, count=len(lote)
+        )
+        variables_venta = {
+            "precio_total": precio_total,
+            "monto_iva": iva_vendedor,
+            "precio_con_iva": precio_total + iva_vendedor,
+            "costo_total": costo_ventas,
+        }
+        variables_compra = {
+            "precio_total": costo_compra,
+            "monto_iva": monto_iva,
+            "precio_con_iva": costo_compra + monto_iva,
+        }
+
+        lados = {
+            "venta": (
+                np.array(plantillas_venta, dtype=object),
+                vendedores,
+                variables_venta,
+            ),
+            "compra": (
+                np.array(plantillas_compra, dtype=object),
+                compradores,
+                variables_compra,
+            ),
+        }
+        # Una llamada por plantilla, en el orden en que aparecen la venta y la
+        # compra de cada transacción; ninguna plantilla es de venta y de compra
+        intercaladas = [None] * (2 * len(lote))
+        intercaladas[::2], intercaladas[1::2] = plantillas_venta, plantillas_compra
+        for plantilla in dict.fromkeys(intercaladas):
+            nombres, agentes, variables = lados[plantilla.split("_")[0]]
+            filas = np.flatnonzero(nombres == plantilla)
+            self.motor.contabilizar(
+                plantilla,
+                agentes[filas],
+                {nombre: valores[filas] for nombre, valores in variables.items()},
+            )
+
+        if self.red is not None:
+            self.red.registrar_transacciones(lote, self.motor.ledger.periodo, montos)
+        if self.impuestos is not None:
+            self.impuestos.registrar_transacciones(
+                lote, self.motor.ledger.periodo, montos
+            )
+
+        return {
+            "transacciones": len(lote),
+            "precio_total": float(montos["precio_total"].sum()),
+            "monto_iva": float(montos["monto_iva"].sum()),
+            "monto_arancel": float(montos["monto_arancel"].sum()),
+            "costo_ventas": float(costo_ventas.sum()),
+        }
@@ -1,30 +1,132 @@
-import pandas as pd
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Optional, Union
 
-ruta = r"C:\Users\andre\OneDrive\Documentos\Repositories\MIT_Tax_Avoidance\FTZ_Model\directorio_cuentas.xlsx"
+# Ruta del directorio de cuentas: parámetro > variable de entorno > junto al código
+VARIABLE_RUTA_CUENTAS = "FTZ_DIRECTORIO_CUENTAS"
+RUTA_CUENTAS_POR_DEFECTO = Path(__file__).resolve().parent / "directorio_cuentas.xlsx"
 
+SUFIJO_CACHE = ".cache"
+VERSION_CACHE = 1
 
-def cargar_plantillas_cuentas(archivo_excel: str) -> dict:
+
+def ruta_directorio_cuentas(archivo_excel: Optional[Union[str, Path]] = None) -> Path:
     """
-    Función para cargar los tipos de cuenta que funcionaran en el modelo
+    Resuelve la ruta del archivo Excel con el directorio de cuentas.
+
+    :param archivo_excel: Ruta explícita. Si es None se usa la variable de entorno
+                          FTZ_DIRECTORIO_CUENTAS o, en su defecto, el archivo
+                          directorio_cuentas.xlsx del repositorio.
+    """
+    if archivo_excel is None:
+        archivo_excel = os.environ.get(VARIABLE_RUTA_CUENTAS, RUTA_CUENTAS_POR_DEFECTO)
+    return Path(archivo_excel)
+
+
+def _hash_archivo(ruta: Path) -> str:
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _leer_cache(ruta: Path, ruta_cache: Path) -> Optional[dict]:
+    """Devuelve las plantillas guardadas si la cache corresponde al Excel actual."""
+    try:
+        with open(ruta_cache, "rb") as archivo:
+            cache = pickle.load(archivo)
+        estado = ruta.stat()
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+    if not isinstance(cache, dict) or cache.get("version") != VERSION_CACHE:
+        return None
+
+    # Si la fecha de modificación y el tamaño coinciden no hace falta leer el Excel
+    if cache["mtime_ns"] == estado.st_mtime_ns and cache["tamano"] == estado.st_size:
+        return cache["plantillas"]
+
+    # El archivo se tocó: solo se invalida si su contenido cambió
+    if cache["sha256"] == _hash_archivo(ruta):
+        _escribir_cache(ruta, ruta_cache, cache["plantillas"], cache["sha256"])
+        return cache["plantillas"]
+    return None
+
 
+def _escribir_cache(
+    ruta: Path, ruta_cache: Path, plantillas: dict, sha256: Optional[str] = None
+) -> None:
+    estado = ruta.stat()
+    cache = {
+        "version": VERSION_CACHE,
+        "mtime_ns": estado.st_mtime_ns,
+        "tamano": estado.st_size,
+        "sha256": sha256 if sha256 is not None else _hash_archivo(ruta),
+        "plantillas": plantillas,
+    }
+    temporal = ruta_cache.with_name(f"{ruta_cache.name}.{os.getpid()}.tmp")
+    try:
+        with open(temporal, "wb") as archivo:
+            pickle.dump(cache, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, ruta_cache)
+    except OSError:
+        # Sin permisos de escritura la cache simplemente no se usa
+        try:
+            temporal.unlink()
+        except OSError:
+            pass
+
+
+def leer_plantillas_excel(archivo_excel: Union[str, Path]) -> dict:
+    """
+    Lee la hoja "cuentas_modelo" del Excel y arma el diccionario de plantillas.
     """
-    # Cargar el archivo Excel en un DataFrame
+    # pandas (y openpyxl, que usa para leer el Excel) solo se carga aquí
+    import pandas as pd
+
     df = pd.read_excel(archivo_excel, sheet_name="cuentas_modelo")
+    df.columns = df.columns.str.strip()
+
+    # Acceso por columnas en lugar de recorrer las filas
+    return {
+        codigo_cuenta: {"codigo_tipo_cuenta": codigo_tipo, "cuenta": cuenta}
+        for codigo_cuenta, codigo_tipo, cuenta in zip(
+            df["codigo_cuenta"].tolist(),
+            df["tipo_de_cuenta"].tolist(),
+            df["cuenta"].tolist(),
+        )
+    }
+
+
+def cargar_plantillas_cuentas(
+    archivo_excel: Optional[Union[str, Path]] = None, usar_cache: bool = True
+) -> dict:
+    """
+    Función para cargar los tipos de cuenta que funcionaran en el modelo
+
+    El resultado se guarda en un archivo binario junto al Excel
+    (directorio_cuentas.xlsx.cache) que se invalida cuando cambia el contenido del
+    Excel, de modo que las cargas siguientes no tienen que leerlo.
+
+    :param archivo_excel: Ruta del Excel. Ver ruta_directorio_cuentas.
+    :param usar_cache: Si es False siempre se lee el Excel y no se escribe la cache.
+    :return: Diccionario {codigo_cuenta: {"codigo_tipo_cuenta": ..., "cuenta": ...}}.
+    """
+    ruta = ruta_directorio_cuentas(archivo_excel)
+    ruta_cache = ruta.with_name(ruta.name + SUFIJO_CACHE)
 
-    # Inicializar el diccionario para almacenar las plantillas
-    plantillas_cuentas = {}
+    if usar_cache:
+        plantillas_cuentas = _leer_cache(ruta, ruta_cache)
+        if plantillas_cuentas is not None:
+            return plantillas_cuentas
 
-    # Iterar sobre las filas del DataFrame
-    for _, row in df.iterrows():
-        codigo_cuenta = row["codigo_cuenta"]
-        codigo_tipo = row["tipo_de_cuenta "]
-        cuenta = row["cuenta"]
+    plantillas_cuentas = leer_plantillas_excel(ruta)
 
-        # Guardar los datos en el diccionario
-        plantillas_cuentas[codigo_cuenta] = {
-            "codigo_tipo_cuenta": codigo_tipo,
-            "cuenta": cuenta,
-        }
+    if usar_cache:
+        _escribir_cache(ruta, ruta_cache, plantillas_cuentas)
 
     # Devolver el diccionario con la estructura cargada
     return plantillas_cuentas